@@ -0,0 +1,53 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.db_connectors import PostgresConnector
+from src.data_engineering.mart_pipeline import MartPipeline, MART_STEPS
+
+
+def main():
+    """Build RIS marts in dependency order"""
+    parser = argparse.ArgumentParser(description='Build RIS data marts')
+    parser.add_argument(
+        'steps',
+        nargs='*',
+        help=f"Steps to build with their dependencies (default: all). "
+             f"Available: {', '.join(step.name for step in MART_STEPS)}"
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue the last run, skipping steps that already succeeded'
+    )
+    parser.add_argument('--workers', type=int, default=4, help='Steps running in parallel')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("BUILDING MARTS")
+
+    pg = PostgresConnector()
+    pipeline = MartPipeline(pg, max_workers=args.workers)
+
+    statuses = pipeline.run(targets=args.steps or None, resume=args.resume)
+
+    print("\nStep statuses:")
+    for name, status in statuses.items():
+        print(f"   {name:<20} {status}")
+
+    failed = [name for name, status in statuses.items() if status != 'success']
+
+    print("\n" + "=" * 70)
+    if failed:
+        print(f"BUILD FAILED ({', '.join(failed)}). Fix and rerun with --resume")
+        return 1
+
+    print("BUILD COMPLETE")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
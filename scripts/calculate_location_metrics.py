@@ -11,13 +11,24 @@ sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
 from utils.db_connectors import PostgresConnector, MongoConnector
 
-CLUB_COORDINATES = {
-    'HJ Colibri': {'lat': 43.2398083, 'lon': 76.9527295},
-    'HJ Promenade': {'lat': 43.2397899, 'lon': 76.9240991},
-    'HJ Villa': {'lat': 43.2116139, 'lon': 76.9180874},
-    'HJ Nurly Orda': {'lat': 51.1403179, 'lon': 71.4102712},
-    'HJ Europe City': {'lat': 51.1208937, 'lon': 71.4206657}
-}
+CLUB_COORDINATES_QUERY = """
+SELECT
+    club_name,
+    latitude,
+    longitude
+FROM ris.ref_club_history
+WHERE valid_during @> CURRENT_DATE
+  AND latitude IS NOT NULL
+  AND longitude IS NOT NULL
+"""
+
+
+def load_club_coordinates(pg: PostgresConnector) -> Dict[str, Dict[str, float]]:
+    rows = pg.execute_query(CLUB_COORDINATES_QUERY)
+    return {
+        row['club_name']: {'lat': float(row['latitude']), 'lon': float(row['longitude'])}
+        for row in rows
+    }
 
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -90,7 +101,8 @@ def determine_home_location(df_locations: pd.DataFrame, user_id: str) -> Optiona
 def calculate_user_metrics(
     user_id: str,
     club_name: str,
-    df_locations: pd.DataFrame
+    df_locations: pd.DataFrame,
+    club_coordinates: Dict[str, Dict[str, float]]
 ) -> Dict:
     metrics = {
         'user_id': user_id,
@@ -107,7 +119,7 @@ def calculate_user_metrics(
         'location_data_quality': 'none'
     }
 
-    club_coords = CLUB_COORDINATES.get(club_name)
+    club_coords = club_coordinates.get(club_name)
     if not club_coords:
         metrics['location_data_quality'] = 'no_club_coords'
         return metrics
@@ -213,6 +225,9 @@ def main():
     pg = PostgresConnector()
     mongo = MongoConnector()
 
+    club_coordinates = load_club_coordinates(pg)
+    print(f"Clubs with coordinates: {len(club_coordinates)}")
+
     collection = mongo.get_collection('userslocations')
     mongo_user_ids = collection.distinct('userId')
     mongo_user_ids_str = [str(uid) for uid in mongo_user_ids]
@@ -270,7 +285,8 @@ def main():
         metrics = calculate_user_metrics(
             user_id=row['user_id'],
             club_name=row['club_name'],
-            df_locations=df_locations
+            df_locations=df_locations,
+            club_coordinates=club_coordinates
         )
         results.append(metrics)
 
@@ -289,7 +305,8 @@ def main():
 
     mongo.close()
     print("Complete.")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
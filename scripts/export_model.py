@@ -0,0 +1,45 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.scoring.compiled_model import export_pickle, CompiledModel, COMPILED_DIR
+
+
+def main():
+    """Export pickled tree models to compiled node tables for scoring"""
+    parser = argparse.ArgumentParser(description='Compile trained tree ensembles for scoring')
+    parser.add_argument('models', nargs='+', help='Pickled models (models/<model>_w<window>_v<N>.pkl)')
+    parser.add_argument('--out', default=str(COMPILED_DIR), help='Output directory')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("EXPORTING MODELS")
+
+    failed = []
+    for model_path in args.models:
+        try:
+            path = export_pickle(Path(model_path), Path(args.out))
+            compiled = CompiledModel.load(path)
+        except Exception as e:
+            print(f"\nERROR ({model_path}): {e}")
+            failed.append(model_path)
+            continue
+
+        meta = compiled.meta
+        print(f"\n{compiled.version}: {meta['library']}, {meta['n_trees']} trees, "
+              f"depth {meta['max_depth']}, {len(compiled.nodes)} nodes -> {path}")
+
+    print("\n" + "=" * 70)
+    if failed:
+        print(f"EXPORT FAILED ({', '.join(failed)})")
+        return 1
+
+    print("EXPORT COMPLETE")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import sys
+import argparse
+from datetime import date
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.db_connectors import PostgresConnector
+from src.scoring.score_users import BatchScorer
+
+
+def main():
+    """Score active HeroPass holders into ris.model_scores_daily"""
+    parser = argparse.ArgumentParser(description='Generate daily retention scores')
+    parser.add_argument('--window', type=int, default=None, help='Target window, days (default: from model metadata)')
+    parser.add_argument('--model', default=None, help='Compiled model (.npy) or pickle (default: latest compiled for the window)')
+    parser.add_argument('--date', type=date.fromisoformat, default=None, help='Score date, YYYY-MM-DD (default: today)')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Users per chunk')
+    parser.add_argument('--full', action='store_true', help='Recompute features and rescore every user instead of reusing unchanged ones')
+    parser.add_argument('--no-explain', action='store_true', help='Skip TreeSHAP explanations of new feature fingerprints')
+    args = parser.parse_args()
+
+    if args.model is None and args.window is None:
+        parser.error('--window is required without --model')
+
+    print("\n" + "=" * 70)
+    print("GENERATING SCORES")
+
+    try:
+        pg = PostgresConnector()
+        scorer = BatchScorer(
+            pg,
+            model_path=args.model,
+            window_days=args.window,
+            chunk_size=args.chunk_size,
+            incremental=not args.full,
+            explain=not args.no_explain
+        )
+        stats = scorer.run(args.date)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        return 1
+
+    print(f"\nModel: {stats['model_version']} (window {stats['window_days']}d)")
+    print(f"Scored {stats['users']} users for {stats['score_date']} in {stats['seconds']}s")
+    print(f"   Rescored: {stats['rescored']}, carried forward: {stats['carried_forward']}")
+    print(f"   Features computed: {stats['features_computed']}, reused: {stats['users'] - stats['features_computed']}")
+    print(f"   New explanations: {stats['explained']}")
+    print("\nRisk bands:")
+    for band, count in sorted(stats['risk_bands'].items(), key=lambda item: -item[1]):
+        print(f"   {band:<12} {count}")
+
+    print("\n" + "=" * 70)
+    print("SCORES GENERATED SUCCESSFULLY")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,66 @@
-
-
 import sys
+import argparse
 from pathlib import Path
 
 # Add src to path
-sys.path.insert(0, str(Path(__file__).parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
 
 from utils.db_connectors import PostgresConnector
 
 
+def count_rows(pg: PostgresConnector, tables: list) -> int:
+    """Total row count over the given tables"""
+    total = 0
+    with pg.get_cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"SELECT COUNT(*) as cnt FROM {table};")
+            total += cursor.fetchone()['cnt']
+    return total
+
+
 def main():
-    """Clear all data from core_hp_period table"""
+    """Clear all data from core_hp_period table (or the partitions of one year)"""
+    parser = argparse.ArgumentParser(description='Clear ris.core_hp_period')
+    parser.add_argument(
+        '--year',
+        type=int,
+        help='Truncate only the partitions holding periods that start in this year'
+    )
+    args = parser.parse_args()
+
     print("\n" + "=" * 70)
     print("CLEARING CORE_HP_PERIOD TABLE")
-    
 
     pg = PostgresConnector()
 
-        with pg.get_cursor() as cursor:
-        cursor.execute("SELECT COUNT(*) as cnt FROM ris.core_hp_period;")
-        count_before = cursor.fetchone()['cnt']
+    if args.year:
+        # Yearly (core_hp_period_2024) or quarterly (core_hp_period_2024q1) partitions
+        partitions = [
+            row['partition_name'] for row in pg.execute_query("""
+                SELECT child.relname AS partition_name
+                FROM pg_inherits i
+                JOIN pg_class child ON child.oid = i.inhrelid
+                JOIN pg_class parent ON parent.oid = i.inhparent
+                JOIN pg_namespace n ON n.oid = parent.relnamespace
+                WHERE n.nspname = 'ris'
+                  AND parent.relname = 'core_hp_period'
+                  AND child.relname ~ %s;
+            """, (f"^core_hp_period_{args.year}(q[1-4])?$",))
+        ]
+        if not partitions:
+            print(f"\nNo partitions for {args.year}. Nothing to clear.")
+            return 0
+        targets = [f"ris.{name}" for name in partitions]
+    else:
+        targets = ["ris.core_hp_period"]
+
+    count_before = count_rows(pg, targets)
 
     print(f"\nCurrent rows in table: {count_before:,}")
 
     if count_before == 0:
         print("\nTable is already empty. Nothing to clear.")
-        
-        return
+        return 0
 
     # Clear table
     print("\nClearing table...")
@@ -34,23 +68,21 @@ def main():
     try:
         with pg.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("TRUNCATE TABLE ris.core_hp_period;")
+                cursor.execute(f"TRUNCATE TABLE {', '.join(targets)};")
                 conn.commit()
         print("   SUCCESS: Table cleared")
     except Exception as e:
         print(f"   ERROR: {str(e)}")
-        return
+        return 1
 
-        with pg.get_cursor() as cursor:
-        cursor.execute("SELECT COUNT(*) as cnt FROM ris.core_hp_period;")
-        count_after = cursor.fetchone()['cnt']
+    count_after = count_rows(pg, targets)
 
     print(f"\nRows after clearing: {count_after:,}")
 
     print("\n" + "=" * 70)
     print("CLEARED SUCCESSFULLY")
-    
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
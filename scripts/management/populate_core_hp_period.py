@@ -1,48 +1,37 @@
-
-
 import sys
+import argparse
 from pathlib import Path
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent / 'src'))
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from utils.db_connectors import PostgresConnector
+from src.utils.db_connectors import PostgresConnector
+from src.data_engineering.postgres_loader import PostgresLoader
+from src.data_engineering.meta_store import MetaStore
 
 
-def main():
-    """Populate core_hp_period table"""
-    print("\n" + "=" * 70)
-    print("POPULATING CORE_HP_PERIOD TABLE")
-    
+JOB_NAME = 'core_hp_period'
 
-    pg = PostgresConnector()
+# Partition size of ris.core_hp_period by hp_start: 'year' or 'quarter'
+# (must match the partitions already attached to the table)
+PARTITION_GRANULARITY = 'year'
 
-        print("\n1. Loading HeroPass data from PostgreSQL...")
+INTEGER_COLUMNS = [
+    'freeze_days_total', 'freeze_count', 'freeze_longest_days', 'freeze_attempt_number',
+    'hp_length_days', 'days_to_next_hp', 'gap_days',
+]
 
-        base_query = r"""
+BASE_QUERY = r"""
     with hp_raw as (
-        select
+        select distinct
             uhp.id as hp_period_id,
             uhp."user" as user_id,
             uhp.starttime::date  as hp_start,
             uhp.endtime::date as hp_end,
-            uft.starttime::date as freezing_start,
-            uft.endtime::date as freezing_end,
             hp.name as hp_type,
-            case
-              when coalesce(c.name, c2.name) = 'HJ Villa'
-                   and uhp.starttime::date < date '2025-06-01'
-                then 'HJ Colibri'
-              when coalesce(c.name, c2.name) = 'HJ Promenade'
-                   and uhp.starttime::date < date '2025-04-01'
-                then 'HJ Colibri'
-              when coalesce(c.name, c2.name) = 'HJ Europe City'
-                   and uhp.starttime::date < date '2025-02-01'
-                then 'HJ Nurly Orda'
-              else coalesce(c.name, c2.name)
-            end as hp_club_corr
+            coalesce(ch.club_corr, c.name, c2.name) as hp_club_corr
         from raw.userheropass uhp
         left join raw.heropass hp
                on uhp.heropass = hp.id
@@ -52,67 +41,298 @@ def main():
                on uhp.club = c.id
         left join raw.club c2
                on u.club = c2.id
-        left join raw.userfreezingtime uft
-               on uhp."user" = uft."user"
-              and uhp.id = uft.userheropass
+        left join ris.ref_club_history ch
+               on ch.club_name = coalesce(c.name, c2.name)
+              and ch.valid_during @> uhp.starttime::date
         where hp.name in ('Годовой Hero`s Pass', 'Полугодовой Hero`s Pass')
+          -- Both are NOT NULL in core_hp_period; hp_start also picks the partition
+          and uhp.starttime is not null
+          and uhp.endtime is not null
     ),
-    hp_agg as (
+    freeze_raw as (
+        -- Duplicated freeze records collapse here
+        select distinct
+            h.hp_period_id,
+            uft.starttime::date as freezing_start,
+            uft.endtime::date as freezing_end
+        from raw.userfreezingtime uft
+        join hp_raw h
+          on h.user_id = uft."user"
+         and h.hp_period_id = uft.userheropass
+        where uft.starttime is not null
+          and uft.endtime is not null
+          and uft.endtime::date >= uft.starttime::date
+    ),
+    freeze_sweep as (
+        -- Linear sweep over the period's freezes sorted by start: a freeze opens
+        -- a new island unless it starts before the running max end of the earlier ones
+        select
+            f.*,
+            case
+              when f.freezing_start <= max(f.freezing_end) over (
+                     partition by f.hp_period_id
+                     order by f.freezing_start, f.freezing_end
+                     rows between unbounded preceding and 1 preceding
+                   )
+                then 0
+              else 1
+            end as is_island_start
+        from freeze_raw f
+    ),
+    freeze_islands as (
+        select
+            hp_period_id,
+            freezing_start,
+            freezing_end,
+            sum(is_island_start) over (
+                partition by hp_period_id
+                order by freezing_start, freezing_end
+                rows unbounded preceding
+            ) as island_id
+        from freeze_sweep
+    ),
+    freeze_merged as (
         select
             hp_period_id,
-            user_id,
-            hp_type,
-            hp_club_corr,
-            hp_start,
-            hp_end,
-            coalesce(
-              sum(
-                case
-                  when freezing_start is not null
-                       and freezing_end   is not null
-                    then (freezing_end - freezing_start + 1)
-                  else 0
-                end
-              )::int,
-              0
-            ) as freeze_days_total
-        from hp_raw
-        group by
+            island_id,
+            (max(freezing_end) - min(freezing_start) + 1) as island_days,
+            count(*) as island_freezes
+        from freeze_islands
+        group by hp_period_id, island_id
+    ),
+    freeze_agg as (
+        select
             hp_period_id,
-            user_id,
-            hp_type,
-            hp_club_corr,
-            hp_start,
-            hp_end
+            sum(island_days)::int as freeze_days_total,
+            sum(island_freezes)::int as freeze_count,
+            max(island_days)::int as freeze_longest_days
+        from freeze_merged
+        group by hp_period_id
+    ),
+    hp_agg as (
+        select
+            h.hp_period_id,
+            h.user_id,
+            h.hp_type,
+            h.hp_club_corr,
+            h.hp_start,
+            h.hp_end,
+            coalesce(fa.freeze_days_total, 0) as freeze_days_total,
+            coalesce(fa.freeze_count, 0) as freeze_count,
+            coalesce(fa.freeze_longest_days, 0) as freeze_longest_days
+        from hp_raw h
+        left join freeze_agg fa
+               on fa.hp_period_id = h.hp_period_id
+    ),
+    hp_periods as (
+        select
+            h.hp_period_id,
+            h.user_id,
+            h.hp_type,
+            h.hp_club_corr,
+            h.hp_start,
+            h.hp_end,
+            h.freeze_days_total,
+            h.freeze_count,
+            h.freeze_longest_days,
+            sum(h.freeze_count) over (
+                partition by h.user_id
+                order by h.hp_start
+                rows unbounded preceding
+            )::int as freeze_attempt_number,
+            (h.hp_end + h.freeze_days_total)::date as hp_end_corrected,
+            (h.hp_end - h.hp_start + 1) as hp_length_days,
+            lead(h.hp_start) over (
+                partition by h.user_id
+                order by h.hp_start
+            )::date as next_hp_purchase_dt
+        from hp_agg h
     )
-    select
-        h.hp_period_id,
-        h.user_id,
-        h.hp_type,
-        h.hp_club_corr,
-        h.hp_start,
-        h.hp_end,
-        h.freeze_days_total,
-        (h.hp_end + h.freeze_days_total)::date as hp_end_corrected,
-        (h.hp_end - h.hp_start + 1) as hp_length_days,
-        lead(h.hp_start) over (
-            partition by h.user_id
-            order by h.hp_start
-        )::date as next_hp_purchase_dt
-    from hp_agg h
-    order by h.user_id, h.hp_start
+    -- Partition filter is applied after lead() so next_hp_purchase_dt
+    -- still sees the user's periods in other partitions
+    select p.*
+    from hp_periods p
+    where %(partition_starts)s::date[] is null
+       or date_trunc(%(granularity)s, p.hp_start)::date = any(%(partition_starts)s::date[])
+    order by p.user_id, p.hp_start
+"""
+
+# Period starts of every HeroPass of users whose HeroPasses or freezes changed,
+# both in the source and as stored (a period that moved or was deleted must
+# leave its old partition). All periods of such a user are affected:
+# next_hp_purchase_dt links them. Periods deleted at the source leave no
+# updated_at behind, so their users are found by the anti-join.
+TOUCHED_PERIODS_QUERY = """
+    with touched_users as (
+        select uhp."user"::text as user_id
+        from raw.userheropass uhp
+        where coalesce(uhp.updated_at, uhp.created_at) > %(since)s
+        union
+        select uft."user"::text
+        from raw.userfreezingtime uft
+        where coalesce(uft.updated_at, uft.created_at) > %(since)s
+        union
+        select cp.user_id::text
+        from ris.core_hp_period cp
+        where not exists (
+            select 1 from raw.userheropass uhp where uhp.id::text = cp.hp_period_id::text
+        )
+    )
+    select uhp.starttime::date as hp_start
+    from raw.userheropass uhp
+    join touched_users t on t.user_id = uhp."user"::text
+    where uhp.starttime is not null
+    union
+    select cp.hp_start
+    from ris.core_hp_period cp
+    join touched_users t on t.user_id = cp.user_id::text
+"""
+
+PARTITIONS_QUERY = """
+    select child.relname as partition_name
+    from pg_inherits i
+    join pg_class child on child.oid = i.inhrelid
+    join pg_class parent on parent.oid = i.inhparent
+    join pg_namespace n on n.oid = parent.relnamespace
+    where n.nspname = 'ris'
+      and parent.relname = 'core_hp_period'
+"""
+
+
+def partition_start(dt: date) -> date:
+    """First day of the partition containing dt"""
+    if PARTITION_GRANULARITY == 'quarter':
+        return date(dt.year, 3 * ((dt.month - 1) // 3) + 1, 1)
+    return date(dt.year, 1, 1)
+
+
+def partition_end(start: date) -> date:
+    """First day after the partition starting at start"""
+    if PARTITION_GRANULARITY == 'quarter':
+        month = start.month + 3
+        return date(start.year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+    return date(start.year + 1, 1, 1)
+
+
+def partition_name(start: date) -> str:
+    """Partition table name, e.g. core_hp_period_2024 or core_hp_period_2024q1"""
+    if PARTITION_GRANULARITY == 'quarter':
+        return f"core_hp_period_{start.year}q{(start.month - 1) // 3 + 1}"
+    return f"core_hp_period_{start.year}"
+
+
+def list_partitions(pg: PostgresConnector) -> set:
+    """Names of partitions currently attached to ris.core_hp_period"""
+    return {row['partition_name'] for row in pg.execute_query(PARTITIONS_QUERY)}
+
+
+def replace_partition(pg: PostgresConnector, start: date, df_part: pd.DataFrame, exists: bool):
+    """
+    Load rows into a fresh table and swap it in place of the partition
+
+    The partition is rebuilt from the current source rows only, so periods
+    deleted at the source disappear with the old partition. The new table is
+    filled and checked before the swap, so readers see either the old or the
+    new partition, never a partially loaded one.
+    Rows of the same periods left in other partitions (a period whose
+    hp_start moved across a partition boundary) are deleted in the same
+    transaction, so a period never appears twice.
     """
+    name = partition_name(start)
+    lo, hi = start.isoformat(), partition_end(start).isoformat()
+
+    with pg.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS ris.{name}_new;")
+            cursor.execute(
+                f"CREATE TABLE ris.{name}_new (LIKE ris.core_hp_period INCLUDING DEFAULTS);"
+            )
+            PostgresLoader.copy_dataframe(df_part, f"ris.{name}_new", cursor)
+            # Matching CHECK lets ATTACH skip the validation scan
+            cursor.execute(
+                f"ALTER TABLE ris.{name}_new ADD CONSTRAINT {name}_bounds "
+                f"CHECK (hp_start >= '{lo}' AND hp_start < '{hi}');"
+            )
+            cursor.execute(
+                "DELETE FROM ris.core_hp_period "
+                "WHERE hp_period_id = any(%s::text[]) AND NOT (hp_start >= %s AND hp_start < %s);",
+                (df_part['hp_period_id'].astype(str).tolist(), lo, hi)
+            )
+            if exists:
+                cursor.execute(f"ALTER TABLE ris.core_hp_period DETACH PARTITION ris.{name};")
+                cursor.execute(f"DROP TABLE ris.{name};")
+            cursor.execute(f"ALTER TABLE ris.{name}_new RENAME TO {name};")
+            cursor.execute(
+                f"ALTER TABLE ris.core_hp_period ATTACH PARTITION ris.{name} "
+                f"FOR VALUES FROM ('{lo}') TO ('{hi}');"
+            )
+
+
+def drop_partition(pg: PostgresConnector, name: str):
+    """Detach and drop a partition that no longer has any periods"""
+    with pg.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE ris.core_hp_period DETACH PARTITION ris.{name};")
+            cursor.execute(f"DROP TABLE ris.{name};")
+
 
-        try:
-        df_hp = pd.read_sql(base_query, pg.engine)
+def find_touched_partitions(pg: PostgresConnector, since: datetime) -> list:
+    """Start dates of partitions holding periods of users changed or deleted since the watermark"""
+    with pg.get_cursor() as cursor:
+        cursor.execute(TOUCHED_PERIODS_QUERY, {'since': since})
+        rows = cursor.fetchall()
+    return sorted({partition_start(row['hp_start']) for row in rows})
+
+
+def main():
+    """Populate core_hp_period table"""
+    parser = argparse.ArgumentParser(description='Populate ris.core_hp_period')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Replace only partitions touched since the last run (all partitions on first run)'
+    )
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("POPULATING CORE_HP_PERIOD TABLE")
+
+    pg = PostgresConnector()
+    meta = MetaStore(pg)
+
+    run_started_at = meta.db_now()
+    partition_starts = None
+
+    if args.incremental:
+        since = meta.get_watermark(JOB_NAME)
+        if since is None:
+            print("\nNo watermark found, rebuilding all partitions...")
+        else:
+            partition_starts = find_touched_partitions(pg, since)
+            print(f"\nPartitions touched since {since}: "
+                  f"{[partition_name(s) for s in partition_starts]}")
+
+            if not partition_starts:
+                meta.set_watermark(JOB_NAME, run_started_at, 'incremental', 0)
+                print("Nothing to update.")
+                return 0
+
+    print("\n1. Loading HeroPass data from PostgreSQL...")
+
+    try:
+        df_hp = pd.read_sql(
+            BASE_QUERY,
+            pg.engine,
+            params={'partition_starts': partition_starts, 'granularity': PARTITION_GRANULARITY}
+        )
         print(f"   Loaded {len(df_hp)} HeroPass periods from database")
     except Exception as e:
         print(f"   ERROR loading data: {str(e)}")
         import traceback
         traceback.print_exc()
-        return
+        return 1
 
-        print("\n2. Calculating additional fields...")
+    print("\n2. Calculating additional fields...")
 
     # Calculate days_to_next_hp
     df_hp['days_to_next_hp'] = (
@@ -124,10 +344,11 @@ def main():
     df_hp['renewed'] = df_hp['next_hp_purchase_dt'].notna()
 
     # Calculate gap_days (same as days_to_next_hp for renewed users)
-    df_hp['gap_days'] = df_hp.apply(
-        lambda row: row['days_to_next_hp'] if row['renewed'] else None,
-        axis=1
-    )
+    df_hp['gap_days'] = df_hp['days_to_next_hp'].where(df_hp['renewed'])
+
+    # COPY needs integers without a trailing .0
+    for column in INTEGER_COLUMNS:
+        df_hp[column] = df_hp[column].astype('Int64')
 
     # Add metadata
     df_hp['created_at'] = datetime.now()
@@ -137,34 +358,47 @@ def main():
     print(f"   Renewed HeroPasses: {df_hp['renewed'].sum():,}")
     print(f"   Not renewed: {(~df_hp['renewed']).sum():,}")
 
-        print("\n3. Inserting data into ris.core_hp_period...")
+    print("\n3. Replacing partitions of ris.core_hp_period...")
+
+    existing = list_partitions(pg)
+    starts = df_hp['hp_start'].map(partition_start)
+    targets = partition_starts if partition_starts is not None else sorted(starts.unique())
 
     try:
-                df_hp.to_sql(
-            name='core_hp_period',
-            schema='ris',
-            con=pg.engine,
-            if_exists='append',  # append to existing table
-            index=False,
-            method='multi',
-            chunksize=500
-        )
+        for start in targets:
+            df_part = df_hp[starts == start]
+            name = partition_name(start)
+            replace_partition(pg, start, df_part, exists=name in existing)
+            print(f"   {name}: {len(df_part):,} rows")
+
+        # Full rebuild: partitions without any periods left are removed
+        if partition_starts is None:
+            for name in sorted(existing - {partition_name(s) for s in targets}):
+                drop_partition(pg, name)
+                print(f"   {name}: dropped (no periods)")
 
-        print(f"   SUCCESS: Inserted {len(df_hp)} rows")
+        print(f"   SUCCESS: Replaced {len(targets)} partitions")
 
     except Exception as e:
         print(f"   ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
-        return
+        return 1
 
-        print("\n4. Verifying data...")
+    meta.set_watermark(
+        JOB_NAME,
+        run_started_at,
+        'incremental' if args.incremental else 'full',
+        len(df_hp)
+    )
+
+    print("\n4. Verifying data...")
     with pg.get_cursor() as cursor:
         cursor.execute("SELECT COUNT(*) as cnt FROM ris.core_hp_period;")
         count = cursor.fetchone()['cnt']
         print(f"   Total rows in table: {count:,}")
 
-                cursor.execute("""
+        cursor.execute("""
             SELECT
                 hp_period_id,
                 user_id,
@@ -212,10 +446,10 @@ def main():
     print("\n" + "=" * 70)
     print("POPULATION COMPLETE")
     
-    print(f"Rows inserted: {len(df_hp):,}")
+    print(f"Rows loaded: {len(df_hp):,}")
     print(f"Total in table: {count:,}")
-    
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,19 +1,26 @@
 import sys
+import argparse
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from sqlalchemy import text
 
-sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from utils.db_connectors import PostgresConnector
+from src.utils.config_loader import load_config
+from src.utils.db_connectors import PostgresConnector
+from src.data_engineering.meta_store import MetaStore
+from src.features.feature_store import get_feature_store
+from src.features.user_snapshots import snapshot_core_user
 
 
-def main():
-    print("Loading user data from PostgreSQL...")
+JOB_NAME = 'core_user'
 
-    pg = PostgresConnector()
-
-    base_query = r"""
+# Literal percent signs are escaped (%%) because the query is executed with
+# parameters; %(user_ids)s restricts every per-user CTE to the changed users
+# (NULL means all users, i.e. a full rebuild).
+BASE_QUERY = r"""
     with base as (
       select
           u.id                 as user_id,
@@ -35,6 +42,7 @@ def main():
       where
           u.role = 'user'
           and u.partnershiptype is null
+          and (%(user_ids)s::text[] is null or u.id = any(%(user_ids)s::text[]))
     ),
     calc as (
       select
@@ -69,6 +77,7 @@ def main():
         join raw.heropass h on h.id = uhp.heropass
         left join raw.club chp on chp.id = uhp.club
         where h."name" in ('Годовой Hero`s Pass', 'Полугодовой Hero`s Pass')
+          and (%(user_ids)s::text[] is null or uhp."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -86,6 +95,7 @@ def main():
               order by uit.testdate desc nulls last
             ) as rn
         from raw.userinbodytest uit
+        where (%(user_ids)s::text[] is null or uit."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -100,6 +110,7 @@ def main():
               order by fh."date" desc nulls last
             ) as rn
         from main.friends_history fh
+        where (%(user_ids)s::text[] is null or fh."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -109,13 +120,14 @@ def main():
           count(*)::int as feed_posts_total
       from raw.post p
       where p.status = 'posted'
+        and (%(user_ids)s::text[] is null or p."user" = any(%(user_ids)s::text[]))
       group by p."user"
     ),
     lifestyle_flag as (
       select user_id,
              case
-               when ans ilike '%да%' then true
-               when ans ilike '%нет%' then false
+               when ans ilike '%%да%%' then true
+               when ans ilike '%%нет%%' then false
                else null
              end as active_lifestyle
       from (
@@ -130,6 +142,7 @@ def main():
         join raw.usermarathonrecommendation umr
           on uq.usermarathonrecommendation_id = umr.id
         where lower(uq.question) ~ 'вы.*вед[её]те.*актив.*образ.*жизни'
+          and (%(user_ids)s::text[] is null or umr."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -153,6 +166,7 @@ def main():
         join raw.usermarathonrecommendation umr
           on uq.usermarathonrecommendation_id = umr.id
         where lower(uq.question) ~ 'выбер.*тип.*телосложен'
+          and (%(user_ids)s::text[] is null or umr."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -177,7 +191,8 @@ def main():
         from raw.usermarathonrecommendation_questionandanswer uq
         join raw.usermarathonrecommendation umr
           on uq.usermarathonrecommendation_id = umr.id
-        where lower(uq.question) like '%первостепенная цель%'
+        where lower(uq.question) like '%%первостепенная цель%%'
+          and (%(user_ids)s::text[] is null or umr."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -213,6 +228,7 @@ def main():
         join raw.heropass hp
           on uhp.heropass = hp.id
         where hp.name in ('Годовой Hero`s Pass', 'Полугодовой Hero`s Pass')
+          and (%(user_ids)s::text[] is null or uhp."user" = any(%(user_ids)s::text[]))
       ) s
       group by user_id
     ),
@@ -232,6 +248,7 @@ def main():
         from raw.usermarathonevent ume
         join raw.marathonevent me on me.id = ume.marathonevent
         left join raw.marathon m  on m.id  = me.marathon
+        where (%(user_ids)s::text[] is null or ume."user" = any(%(user_ids)s::text[]))
       ) s
       where rn = 1
     ),
@@ -247,7 +264,7 @@ def main():
                  from raw.userpayment up
                  where up."user" = et.user_id
                    and up.marathonevent = et.marathonevent_id
-                   and up.name like 'Подарочный Hero''s Week%'
+                   and up.name like 'Подарочный Hero''s Week%%'
                )
             then 'gift'
           when et.marathon_name in ('Первый шаг','Basecamp')
@@ -264,6 +281,10 @@ def main():
         end as trial_payment
       from earliest_trial et
     ),
+    clan_members as (
+      select distinct ruc.user_id
+      from ris.ref_user_clan ruc
+    ),
     test_exclude as (
       select distinct t."user" as user_id
       from raw.test_users_list t
@@ -293,43 +314,9 @@ def main():
         end as age_band,
         ib.fat_pct_latest,
         ib.bmi_latest,
-        case
-          when coalesce(hp.club_hp_name, upc.club_name) = 'HJ Villa'
-               and coalesce(hp.hp_created_at, c.user_created_at, current_date)::date < date '2025-06-01'
-            then 'HJ Colibri'
-          when coalesce(hp.club_hp_name, upc.club_name) = 'HJ Promenade'
-               and coalesce(hp.hp_created_at, c.user_created_at, current_date)::date < date '2025-04-01'
-            then 'HJ Colibri'
-          when coalesce(hp.club_hp_name, upc.club_name) = 'HJ Europe City'
-               and coalesce(hp.hp_created_at, c.user_created_at, current_date)::date < date '2025-02-01'
-            then 'HJ Nurly Orda'
-          else coalesce(hp.club_hp_name, upc.club_name)
-        end as default_club_corr,
-        case
-          when (
-            case
-              when coalesce(hp.club_hp_name, upc.club_name) = 'HJ Villa'
-                   and coalesce(hp.hp_created_at, c.user_created_at, current_date)::date < date '2025-06-01'
-                then 'HJ Colibri'
-              when coalesce(hp.club_hp_name, upc.club_name) = 'HJ Promenade'
-                   and coalesce(hp.hp_created_at, c.user_created_at, current_date)::date < date '2025-04-01'
-                then 'HJ Colibri'
-              when coalesce(hp.club_hp_name, upc.club_name) = 'HJ Europe City'
-                   and coalesce(hp.hp_created_at, c.user_created_at, current_date)::date < date '2025-02-01'
-                then 'HJ Nurly Orda'
-              else coalesce(hp.club_hp_name, upc.club_name)
-            end
-          ) in ('HJ Nurly Orda', 'HJ Europe City')
-            then 'Астана'
-          else 'Алматы'
-        end as city,
-        exists (
-          select 1
-          from raw.clans cl
-          where c.user_id = cl.admin
-             or (cl.users   is not null and c.user_id = any (cl.users))
-             or (cl.mentors is not null and c.user_id = any (cl.mentors))
-        ) as in_clan,
+        coalesce(ch.club_corr, hp.club_hp_name, upc.club_name) as default_club_corr,
+        coalesce(ch.city, 'Алматы') as city,
+        (cm.user_id is not null) as in_clan,
         coalesce(fl.friends_cnt, 0) as friends_cnt,
         coalesce(pc.feed_posts_total, 0) as feed_posts_total,
         lf.active_lifestyle,
@@ -367,6 +354,9 @@ def main():
     left join inbody_latest      ib  on ib.user_id = c.user_id
     left join hp_latest          hp  on hp.user_id = c.user_id
     left join user_profile_club  upc on upc.user_id = c.user_id
+    left join ris.ref_club_history ch
+           on ch.club_name = coalesce(hp.club_hp_name, upc.club_name)
+          and ch.valid_during @> coalesce(hp.hp_created_at, c.user_created_at, current_date)::date
     left join friends_latest     fl  on fl.user_id = c.user_id
     left join posts_cnt          pc  on pc.user_id = c.user_id
     left join lifestyle_flag     lf  on lf.user_id = c.user_id
@@ -375,80 +365,285 @@ def main():
     left join hp_first_five      hp5 on hp5.user_id = c.user_id
     left join earliest_trial     et  on et.user_id = c.user_id
     left join trial_payment      tp  on tp.user_id = c.user_id
+    left join clan_members       cm  on cm.user_id = c.user_id
     where not exists (
       select 1 from test_exclude te where te.user_id = c.user_id
     )
     """
 
-    try:
-        with pg.get_cursor() as cursor:
-            cursor.execute(base_query)
-            rows = cursor.fetchall()
+# Users touched since the last run, one source table per branch.
+# Age rolls over without any source change, so users whose stored age no
+# longer matches their birthday are included as well. ref_user_clan is
+# rebuilt from the current clan arrays (removed members leave no row), so
+# in_clan is compared with the current membership instead of clan timestamps.
+CHANGED_USERS_QUERY = r"""
+    select u.id::text as user_id
+    from raw."user" u
+    where coalesce(u.updated_at, u.created_at) > %(since)s
+    union
+    select uhp."user"::text
+    from raw.userheropass uhp
+    where coalesce(uhp.updated_at, uhp.created_at) > %(since)s
+    union
+    select uit."user"::text
+    from raw.userinbodytest uit
+    where coalesce(uit.updated_at, uit.created_at) > %(since)s
+    union
+    select fh."user"::text
+    from main.friends_history fh
+    where fh."date" > %(since)s
+    union
+    select p."user"::text
+    from raw.post p
+    where coalesce(p.updated_at, p.created_at) > %(since)s
+    union
+    select umr."user"::text
+    from raw.usermarathonrecommendation umr
+    where coalesce(umr.updated_at, umr.created_at) > %(since)s
+    union
+    select ume."user"::text
+    from raw.usermarathonevent ume
+    where coalesce(ume.updated_at, ume.created_at) > %(since)s
+    union
+    select up."user"::text
+    from raw.userpayment up
+    where coalesce(up.updated_at, up.created_at) > %(since)s
+    union
+    select cu.user_id::text
+    from ris.core_user cu
+    where cu.in_clan is distinct from exists (
+        select 1 from ris.ref_user_clan ruc where ruc.user_id = cu.user_id
+    )
+    union
+    select cu.user_id::text
+    from ris.core_user cu
+    join raw."user" u on u.id = cu.user_id
+    where u.birthday ~ '^\d{2}-\d{2}-\d{4}$'
+      and cu.age is distinct from
+          extract(year from age(current_date, to_date(u.birthday, 'DD-MM-YYYY')))::int
+"""
 
-        df_base = pd.DataFrame(rows)
-        print(f"Loaded {len(df_base)} users")
+# Club mapping edits change club_corr and city of every user of the club;
+# populate_ref_club_history only rewrites the table when the mapping changed
+CLUB_HISTORY_CHANGED_QUERY = """
+    select exists (
+        select 1 from ris.ref_club_history where updated_at > %(since)s
+    ) as changed
+"""
 
-    except Exception as e:
-        print(f"Error loading data: {str(e)}")
-        return
+LOCATION_COLUMNS_DEFAULTS = {
+    'home_latitude': None,
+    'home_longitude': None,
+    'home_location_confidence': None,
+    'location_sample_size': 0,
+    'distance_home_to_club_km': None,
+    'avg_booking_distance_km': None,
+    'min_booking_distance_km': None,
+    'distance_variability': None,
+    'is_home_nearby': False,
+    'commute_convenience_score': None,
+    'location_data_quality': 'none',
+}
 
-    print("Loading location metrics...")
+
+def load_users(pg: PostgresConnector, user_ids=None) -> pd.DataFrame:
+    """Run the core_user query for all users (None) or the given user IDs"""
+    with pg.get_cursor() as cursor:
+        cursor.execute(BASE_QUERY, {'user_ids': user_ids})
+        rows = cursor.fetchall()
+    return pd.DataFrame(rows)
+
+
+def find_changed_users(pg: PostgresConnector, since: datetime) -> list:
+    """Get IDs of users with source changes after the watermark"""
+    with pg.get_cursor() as cursor:
+        cursor.execute(CHANGED_USERS_QUERY, {'since': since})
+        rows = cursor.fetchall()
+    return [row['user_id'] for row in rows]
+
+
+def club_history_changed(pg: PostgresConnector, since: datetime) -> bool:
+    """Whether the club mapping was edited after the watermark"""
+    with pg.get_cursor() as cursor:
+        cursor.execute(CLUB_HISTORY_CHANGED_QUERY, {'since': since})
+        return bool(cursor.fetchone()['changed'])
+
+
+def load_location_metrics() -> pd.DataFrame:
+    """Read the latest location metrics CSV (empty if there is none)"""
     processed_dir = Path(__file__).parent.parent.parent / 'data' / 'processed'
 
     location_files = list(processed_dir.glob('user_location_metrics_*.csv'))
 
     if not location_files:
         print(f"Warning: No location metrics found")
-        df_location = pd.DataFrame()
-    else:
-        loc_file = sorted(location_files)[-1]
-        print(f"Using: {loc_file.name}")
-        df_location = pd.read_csv(loc_file)
+        return pd.DataFrame()
+
+    loc_file = sorted(location_files)[-1]
+    print(f"Using: {loc_file.name}")
+    df_location = pd.read_csv(loc_file)
+    df_location['user_id'] = df_location['user_id'].astype(str)
+    return df_location
 
-    print("Merging datasets...")
+
+def find_location_changes(pg: PostgresConnector, df_location: pd.DataFrame) -> list:
+    """
+    Get IDs of users whose location metrics differ from their core_user row
+
+    Location metrics are recalculated from bookings and club coordinates
+    without touching the raw tables CHANGED_USERS_QUERY watches.
+    """
+    columns = [col for col in LOCATION_COLUMNS_DEFAULTS if col in df_location.columns]
+    if df_location.empty or not columns:
+        return []
+
+    stored = pd.read_sql(f"select user_id, {', '.join(columns)} from ris.core_user", pg.engine)
+    stored['user_id'] = stored['user_id'].astype(str)
+    merged = df_location[['user_id'] + columns].merge(stored, on='user_id', suffixes=('', '_stored'))
+
+    changed = np.zeros(len(merged), dtype=bool)
+    for col in columns:
+        new, old = merged[col], merged[f"{col}_stored"]
+        if pd.api.types.is_numeric_dtype(new):
+            # Stored NUMERIC columns come back as Decimal
+            new = new.astype(float).to_numpy()
+            old = pd.to_numeric(old, errors='coerce').astype(float).to_numpy()
+            changed |= ~np.isclose(new, old, rtol=1e-6, equal_nan=True)
+        else:
+            changed |= ~((new == old) | (new.isna() & old.isna())).to_numpy()
+    return merged.loc[changed, 'user_id'].tolist()
+
+
+def merge_location_metrics(df_base: pd.DataFrame, df_location: pd.DataFrame) -> pd.DataFrame:
+    """Attach location metrics to the user rows"""
     if len(df_location) > 0:
         df_merged = df_base.merge(df_location, on='user_id', how='left')
         print(f"Merged {len(df_merged)} rows")
     else:
         df_merged = df_base
-        df_merged['home_latitude'] = None
-        df_merged['home_longitude'] = None
-        df_merged['home_location_confidence'] = None
-        df_merged['location_sample_size'] = 0
-        df_merged['distance_home_to_club_km'] = None
-        df_merged['avg_booking_distance_km'] = None
-        df_merged['min_booking_distance_km'] = None
-        df_merged['distance_variability'] = None
-        df_merged['is_home_nearby'] = False
-        df_merged['commute_convenience_score'] = None
-        df_merged['location_data_quality'] = 'none'
+        for column, default in LOCATION_COLUMNS_DEFAULTS.items():
+            df_merged[column] = default
 
-    print("Inserting into ris.core_user...")
+    return df_merged
 
-    df_merged['created_at'] = datetime.now()
-    df_merged['updated_at'] = datetime.now()
 
-    try:
-        df_merged.to_sql(
+def replace_users(pg: PostgresConnector, df: pd.DataFrame, user_ids=None):
+    """
+    Replace rows of the given users (None = all rows) in one transaction
+
+    Users that no longer pass the base filters are deleted and not re-inserted.
+    """
+    with pg.engine.begin() as conn:
+        if user_ids is None:
+            conn.execute(text("DELETE FROM ris.core_user;"))
+        else:
+            conn.execute(
+                text("DELETE FROM ris.core_user WHERE user_id = ANY(:user_ids);"),
+                {'user_ids': user_ids}
+            )
+        df.to_sql(
             name='core_user',
             schema='ris',
-            con=pg.engine,
+            con=conn,
             if_exists='append',
             index=False,
             method='multi',
             chunksize=500
         )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Populate ris.core_user')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Recompute only users changed since the last run (full replace on first run)'
+    )
+    args = parser.parse_args()
+
+    pg = PostgresConnector()
+    meta = MetaStore(pg)
+
+    run_started_at = meta.db_now()
+    user_ids = None
+    print("Loading location metrics...")
+    df_location = load_location_metrics()
+
+    if args.incremental:
+        since = meta.get_watermark(JOB_NAME)
+        if since is None:
+            print("No watermark found, recomputing all users...")
+        elif club_history_changed(pg, since):
+            print(f"Club history changed since {since}, recomputing all users...")
+        else:
+            print(f"Finding users changed since {since}...")
+            user_ids = find_changed_users(pg, since)
+            location_ids = find_location_changes(pg, df_location)
+            print(f"Changed users: {len(user_ids):,} (location metrics: {len(location_ids):,})")
+            user_ids = sorted(set(user_ids) | set(location_ids))
+
+            if not user_ids:
+                meta.set_watermark(JOB_NAME, run_started_at, 'incremental', 0)
+                print("Nothing to update.")
+                return 0
+
+    print("Loading user data from PostgreSQL...")
+
+    try:
+        df_base = load_users(pg, user_ids)
+        print(f"Loaded {len(df_base)} users")
+
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+        return 1
+
+    print("Merging location metrics...")
+    df_merged = merge_location_metrics(df_base, df_location)
+
+    print("Inserting into ris.core_user...")
+
+    df_merged['created_at'] = datetime.now()
+    df_merged['updated_at'] = datetime.now()
+
+    try:
+        if args.incremental:
+            replace_users(pg, df_merged, user_ids)
+        else:
+            df_merged.to_sql(
+                name='core_user',
+                schema='ris',
+                con=pg.engine,
+                if_exists='append',
+                index=False,
+                method='multi',
+                chunksize=500
+            )
         print(f"Inserted {len(df_merged)} rows")
 
     except Exception as e:
         print(f"Error: {str(e)}")
-        return
+        return 1
+
+    meta.set_watermark(
+        JOB_NAME,
+        run_started_at,
+        'incremental' if args.incremental else 'full',
+        len(df_merged)
+    )
+
+    # Mutable attributes are kept as dated versions for point-in-time features
+    print("Snapshotting mutable attributes...")
+    store = get_feature_store(load_config().get('features', {}).get('store_path'))
+    changed = snapshot_core_user(pg, store, run_started_at.date())
+    print(f"Users with changed attributes: {changed:,}")
 
     with pg.get_cursor() as cursor:
         cursor.execute("SELECT COUNT(*) as cnt FROM ris.core_user;")
         count = cursor.fetchone()['cnt']
         print(f"Total in table: {count:,}")
 
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
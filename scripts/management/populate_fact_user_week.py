@@ -0,0 +1,48 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.utils.db_connectors import PostgresConnector, MongoConnector
+from src.data_engineering.build_features_weekly import WeeklyFactBuilder
+
+
+def main():
+    """Populate fact_user_week table"""
+    parser = argparse.ArgumentParser(description='Populate ris.fact_user_week')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Recompute only weeks with sessions changed since the last run (full rebuild on first run)'
+    )
+    parser.add_argument('--batch-size', type=int, default=50000, help='Session documents per chunk')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("POPULATING FACT_USER_WEEK TABLE")
+
+    pg = PostgresConnector()
+    mongo = MongoConnector()
+
+    try:
+        builder = WeeklyFactBuilder(mongo, pg, batch_size=args.batch_size)
+        rows = builder.build(incremental=args.incremental)
+    except Exception as e:
+        print(f"   ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        mongo.close()
+
+    print(f"\nLoaded user weeks: {rows:,}")
+
+    print("\n" + "=" * 70)
+    print("POPULATED SUCCESSFULLY")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
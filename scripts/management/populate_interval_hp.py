@@ -0,0 +1,46 @@
+import sys
+import argparse
+from datetime import date
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.utils.db_connectors import PostgresConnector
+from src.data_engineering.build_intervals import IntervalBuilder
+
+
+def main():
+    """Populate interval_hp table"""
+    parser = argparse.ArgumentParser(description='Populate ris.interval_hp')
+    parser.add_argument(
+        '--as-of',
+        type=date.fromisoformat,
+        help='Observation date, YYYY-MM-DD (default: today)'
+    )
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("POPULATING INTERVAL_HP TABLE")
+
+    pg = PostgresConnector()
+
+    try:
+        builder = IntervalBuilder(pg)
+        print(f"\nFollow-up after hp_end_corrected: {builder.followup_days} days")
+        rows = builder.build(as_of=args.as_of)
+    except Exception as e:
+        print(f"   ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    print(f"\nLoaded intervals: {rows:,}")
+
+    print("\n" + "=" * 70)
+    print("POPULATED SUCCESSFULLY")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
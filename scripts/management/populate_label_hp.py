@@ -0,0 +1,51 @@
+import sys
+import argparse
+from datetime import date
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.utils.db_connectors import PostgresConnector
+from src.data_engineering.build_labels import LabelBuilder
+
+
+def main():
+    """Populate label_hp table"""
+    parser = argparse.ArgumentParser(description='Populate ris.label_hp')
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Relabel every period (default: only periods whose label can still change)'
+    )
+    parser.add_argument(
+        '--as-of',
+        type=date.fromisoformat,
+        help='Label date, YYYY-MM-DD (default: today)'
+    )
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print("POPULATING LABEL_HP TABLE")
+
+    pg = PostgresConnector()
+
+    try:
+        builder = LabelBuilder(pg)
+        print(f"\nTarget windows: {builder.windows}")
+        rows = builder.build(as_of=args.as_of, full=args.full)
+    except Exception as e:
+        print(f"   ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return 1
+
+    print(f"\nUpserted label rows: {rows:,}")
+
+    print("\n" + "=" * 70)
+    print("POPULATED SUCCESSFULLY")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
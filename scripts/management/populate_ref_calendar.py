@@ -1,13 +1,17 @@
-
-
 import sys
+import argparse
 from pathlib import Path
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
 
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent / 'src'))
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from utils.db_connectors import PostgresConnector
+from src.utils.db_connectors import PostgresConnector
+from src.data_engineering.postgres_loader import PostgresLoader
 
 
 # Kazakhstan public holidays (recurring annual)
@@ -41,148 +45,148 @@ SCHOOL_BREAKS = [
     ((11, 1), (11, 7)),
 ]
 
+# Season label by month (index 0 unused)
+SEASON_BY_MONTH = np.array([
+    None,
+    'winter', 'winter', 'spring', 'spring', 'spring', 'summer',
+    'summer', 'summer', 'autumn', 'autumn', 'autumn', 'winter',
+], dtype=object)
 
-def get_season(month: int) -> str:
-    """Get season label for a month"""
-    if month in [12, 1, 2]:
-        return 'winter'
-    elif month in [3, 4, 5]:
-        return 'spring'
-    elif month in [6, 7, 8]:
-        return 'summer'
-    else:  # 9, 10, 11
-        return 'autumn'
-
-
-def is_school_break(dt: date) -> bool:
-    """Check if date is during school break"""
-    for (start_month, start_day), (end_month, end_day) in SCHOOL_BREAKS:
-        # Handle year wrap-around for winter break
-        if start_month > end_month:
-            # Winter break spans two years
-            if (dt.month == start_month and dt.day >= start_day) or \
-               (dt.month == end_month and dt.day <= end_day):
-                return True
-        else:
-            # Normal break within same year
-            start_date = date(dt.year, start_month, start_day)
-            end_date = date(dt.year, end_month, end_day)
-            if start_date <= dt <= end_date:
-                return True
-    return False
-
-
-def generate_calendar_data(start_year: int, end_year: int):
-    """Generate calendar data for date range"""
-    start_date = date(start_year, 1, 1)
-    end_date = date(end_year, 12, 31)
-
-    calendar_data = []
-    current_date = start_date
-
-    while current_date <= end_date:
-        # Day of week (1=Monday, 7=Sunday)
-        dow = current_date.isoweekday()
-        is_weekend = dow in [6, 7]
-
-        # Week of year
-        week_of_year = current_date.isocalendar()[1]
+DEFAULT_START_YEAR = 2020
+DEFAULT_END_YEAR = 2030
 
-        # Month, quarter, year
-        month = current_date.month
-        quarter = (month - 1) // 3 + 1
-        year = current_date.year
 
-        # Holiday check
-        is_holiday = (month, current_date.day) in KZ_HOLIDAYS
+def month_day_key(month: int, day: int) -> int:
+    """Encode (month, day) as MMDD so that calendar order equals integer order"""
+    return month * 100 + day
 
-        # School break check
-        is_school_break_flag = is_school_break(current_date)
 
-        # Season
-        season = get_season(month)
+def school_break_mask(md: np.ndarray, school_breaks: List[Tuple]) -> np.ndarray:
+    """Mark MMDD keys that fall into any school break"""
+    mask = np.zeros(len(md), dtype=bool)
+    for (start_month, start_day), (end_month, end_day) in school_breaks:
+        start_key = month_day_key(start_month, start_day)
+        end_key = month_day_key(end_month, end_day)
+        if start_key > end_key:
+            # Winter break spans two years
+            mask |= (md >= start_key) | (md <= end_key)
+        else:
+            mask |= (md >= start_key) & (md <= end_key)
+    return mask
 
-        calendar_data.append({
-            'dt': current_date,
-            'dow': dow,
-            'is_weekend': is_weekend,
-            'week_of_year': week_of_year,
-            'month': month,
-            'quarter': quarter,
-            'year': year,
-            'is_holiday_kz': is_holiday,
-            'is_school_break': is_school_break_flag,
-            'season_label': season
-        })
 
-        current_date += timedelta(days=1)
+def generate_calendar_data(
+    start_date: date,
+    end_date: date,
+    holidays: Dict[Tuple[int, int], str] = KZ_HOLIDAYS,
+    school_breaks: List[Tuple] = SCHOOL_BREAKS
+) -> pd.DataFrame:
+    """
+    Generate calendar rows for an inclusive date range
 
-    return calendar_data
+    All attributes are computed as whole-column array operations, so the cost
+    does not depend on the number of holidays per day. Another country's
+    calendar is produced by passing its own holidays/school_breaks.
+    """
+    dates = pd.date_range(start_date, end_date, freq='D')
+    iso = dates.isocalendar()
+
+    month = dates.month.to_numpy()
+    md = month * 100 + dates.day.to_numpy()
+    dow = dates.dayofweek.to_numpy() + 1  # 1=Monday, 7=Sunday
+
+    holiday_keys = np.array([month_day_key(m, d) for (m, d) in holidays], dtype=md.dtype)
+
+    return pd.DataFrame({
+        'dt': dates.date,
+        'dow': dow,
+        'is_weekend': dow >= 6,
+        'week_of_year': iso['week'].to_numpy(),
+        'month': month,
+        'quarter': (month - 1) // 3 + 1,
+        'year': dates.year.to_numpy(),
+        'is_holiday_kz': np.isin(md, holiday_keys),
+        'is_school_break': school_break_mask(md, school_breaks),
+        'season_label': SEASON_BY_MONTH[month],
+    })
+
+
+def missing_ranges(
+    start_date: date,
+    end_date: date,
+    existing_min: date,
+    existing_max: date
+) -> List[Tuple[date, date]]:
+    """Date ranges within [start_date, end_date] not covered by existing rows"""
+    if existing_min is None or existing_max is None:
+        return [(start_date, end_date)]
+
+    ranges = []
+    if start_date < existing_min:
+        ranges.append((start_date, min(end_date, existing_min - timedelta(days=1))))
+    if end_date > existing_max:
+        ranges.append((max(start_date, existing_max + timedelta(days=1)), end_date))
+    return ranges
 
 
 def main():
     """Populate ref_calendar table"""
+    parser = argparse.ArgumentParser(description='Populate ris.ref_calendar')
+    parser.add_argument('--start-year', type=int, default=DEFAULT_START_YEAR)
+    parser.add_argument('--end-year', type=int, default=DEFAULT_END_YEAR)
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Regenerate the whole range instead of only extending it'
+    )
+    args = parser.parse_args()
+
     print("\n" + "=" * 70)
     print("POPULATING REF_CALENDAR TABLE")
-    
 
     pg = PostgresConnector()
 
-        if not pg.table_exists('ref_calendar'):
+    if not pg.table_exists('ref_calendar'):
         print("\n[ERROR] Table ris.ref_calendar does not exist!")
         print("Please run create_ref_calendar_table.py first.")
-        return
-
-    # Define date range (from 2020 to 2030 for sufficient coverage)
-    START_YEAR = 2020
-    END_YEAR = 2030
-
-    print(f"\n1. Generating calendar data for {START_YEAR}-{END_YEAR}...")
-    calendar_data = generate_calendar_data(START_YEAR, END_YEAR)
-    print(f"   Generated {len(calendar_data):,} calendar days")
-
-        holidays = sum(1 for d in calendar_data if d['is_holiday_kz'])
-    school_breaks = sum(1 for d in calendar_data if d['is_school_break'])
-    weekends = sum(1 for d in calendar_data if d['is_weekend'])
-
-    print(f"   - Holidays: {holidays:,}")
-    print(f"   - School breaks: {school_breaks:,}")
-    print(f"   - Weekends: {weekends:,}")
-
-    # Insert data
-    print("\n2. Inserting data into ris.ref_calendar...")
-
-    insert_query = """
-        INSERT INTO ris.ref_calendar (
-            dt, dow, is_weekend, week_of_year, month, quarter, year,
-            is_holiday_kz, is_school_break, season_label
-        ) VALUES (
-            %(dt)s, %(dow)s, %(is_weekend)s, %(week_of_year)s, %(month)s,
-            %(quarter)s, %(year)s, %(is_holiday_kz)s, %(is_school_break)s,
-            %(season_label)s
-        )
-        ON CONFLICT (dt) DO UPDATE SET
-            dow = EXCLUDED.dow,
-            is_weekend = EXCLUDED.is_weekend,
-            week_of_year = EXCLUDED.week_of_year,
-            month = EXCLUDED.month,
-            quarter = EXCLUDED.quarter,
-            year = EXCLUDED.year,
-            is_holiday_kz = EXCLUDED.is_holiday_kz,
-            is_school_break = EXCLUDED.is_school_break,
-            season_label = EXCLUDED.season_label,
-            updated_at = NOW();
-    """
+        return 1
+
+    start_date = date(args.start_year, 1, 1)
+    end_date = date(args.end_year, 12, 31)
+
+    if args.full:
+        ranges = [(start_date, end_date)]
+    else:
+        with pg.get_cursor() as cursor:
+            cursor.execute("SELECT MIN(dt) as min_dt, MAX(dt) as max_dt FROM ris.ref_calendar;")
+            existing = cursor.fetchone()
+        ranges = missing_ranges(start_date, end_date, existing['min_dt'], existing['max_dt'])
+
+    if not ranges:
+        print(f"\nCalendar already covers {start_date} - {end_date}. Nothing to do.")
+        return 0
+
+    print(f"\n1. Generating calendar data for {', '.join(f'{s} - {e}' for s, e in ranges)}...")
+    df_calendar = pd.concat(
+        [generate_calendar_data(s, e) for s, e in ranges],
+        ignore_index=True
+    )
+    print(f"   Generated {len(df_calendar):,} calendar days")
+
+    print(f"   - Holidays: {int(df_calendar['is_holiday_kz'].sum()):,}")
+    print(f"   - School breaks: {int(df_calendar['is_school_break'].sum()):,}")
+    print(f"   - Weekends: {int(df_calendar['is_weekend'].sum()):,}")
+
+    # Single COPY + INSERT ... ON CONFLICT instead of one round trip per row
+    print("\n2. Upserting data into ris.ref_calendar...")
+    df_calendar['updated_at'] = datetime.now()
 
-    with pg.get_connection() as conn:
-        with conn.cursor() as cursor:
-            # Batch insert
-            cursor.executemany(insert_query, calendar_data)
-            rows_inserted = cursor.rowcount
+    loader = PostgresLoader(pg)
+    rows_upserted = loader.copy_upsert_dataframe(df_calendar, 'ref_calendar', ['dt'])
 
-    print(f"   [SUCCESS] Inserted/updated {rows_inserted:,} rows")
+    print(f"   [SUCCESS] Inserted/updated {rows_upserted:,} rows")
 
-        print("\n3. Verifying data...")
+    print("\n3. Verifying data...")
     with pg.get_cursor() as cursor:
         cursor.execute("""
             SELECT
@@ -202,7 +206,7 @@ def main():
         print(f"   Holidays: {result['holidays']:,}")
         print(f"   School breaks: {result['school_breaks']:,}")
 
-        print("\n4. Sample data:")
+    print("\n4. Sample data:")
     with pg.get_cursor() as cursor:
         cursor.execute("""
             SELECT
@@ -227,8 +231,8 @@ def main():
 
     print("\n" + "=" * 70)
     print("POPULATION COMPLETE")
-    
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import sys
+from pathlib import Path
+from datetime import date
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from utils.db_connectors import PostgresConnector
+
+
+# Club locations
+CLUBS = {
+    'HJ Colibri': {'city': 'Алматы', 'lat': 43.2398083, 'lon': 76.9527295},
+    'HJ Promenade': {'city': 'Алматы', 'lat': 43.2397899, 'lon': 76.9240991},
+    'HJ Villa': {'city': 'Алматы', 'lat': 43.2116139, 'lon': 76.9180874},
+    'HJ Nurly Orda': {'city': 'Астана', 'lat': 51.1403179, 'lon': 71.4102712},
+    'HJ Europe City': {'city': 'Астана', 'lat': 51.1208937, 'lon': 71.4206657},
+}
+
+# (club_name, valid_from, valid_to, club_corr); None means unbounded.
+# Before a club opened, its clients are attributed to the club they came from.
+CLUB_HISTORY = [
+    ('HJ Colibri', None, None, 'HJ Colibri'),
+    ('HJ Nurly Orda', None, None, 'HJ Nurly Orda'),
+    ('HJ Villa', None, date(2025, 6, 1), 'HJ Colibri'),
+    ('HJ Villa', date(2025, 6, 1), None, 'HJ Villa'),
+    ('HJ Promenade', None, date(2025, 4, 1), 'HJ Colibri'),
+    ('HJ Promenade', date(2025, 4, 1), None, 'HJ Promenade'),
+    ('HJ Europe City', None, date(2025, 2, 1), 'HJ Nurly Orda'),
+    ('HJ Europe City', date(2025, 2, 1), None, 'HJ Europe City'),
+]
+
+
+def build_history_rows():
+    """Expand CLUB_HISTORY with city and coordinates of the resolved club"""
+    rows = []
+    for club_name, valid_from, valid_to, club_corr in CLUB_HISTORY:
+        club = CLUBS[club_corr]
+        rows.append({
+            'club_name': club_name,
+            'valid_from': valid_from,
+            'valid_to': valid_to,
+            'club_corr': club_corr,
+            'city': club['city'],
+            'latitude': club['lat'],
+            'longitude': club['lon'],
+        })
+    return rows
+
+
+def mapping_key(row):
+    """Comparable form of a history row (coordinates come back as Decimal)"""
+    return (
+        row['club_name'], row['valid_from'], row['valid_to'], row['club_corr'], row['city'],
+        round(float(row['latitude']), 7), round(float(row['longitude']), 7),
+    )
+
+
+def main():
+    """Populate ref_club_history table"""
+    print("\n" + "=" * 70)
+    print("POPULATING REF_CLUB_HISTORY TABLE")
+
+    pg = PostgresConnector()
+
+    if not pg.table_exists('ref_club_history'):
+        print("\n[ERROR] Table ris.ref_club_history does not exist!")
+        print("Please run sql/schemas/11_ref_club_history.sql first.")
+        return 1
+
+    rows = build_history_rows()
+
+    # Rewritten only on a change, so updated_at tells populate_core_user
+    # --incremental when the mapping of existing users changed
+    with pg.get_cursor() as cursor:
+        cursor.execute("""
+            SELECT club_name, valid_from, valid_to, club_corr, city, latitude, longitude
+            FROM ris.ref_club_history;
+        """)
+        current = cursor.fetchall()
+
+    # Rows are unique per club and date range (exclusion constraint)
+    if len(current) == len(rows) and set(map(mapping_key, current)) == set(map(mapping_key, rows)):
+        print(f"\n1. Club history unchanged ({len(rows)} rows)")
+        rows = None
+    else:
+        print(f"\n1. Replacing club history ({len(rows)} rows)...")
+
+    insert_query = """
+        INSERT INTO ris.ref_club_history (
+            club_name, valid_from, valid_to, club_corr, city, latitude, longitude
+        ) VALUES (
+            %(club_name)s, %(valid_from)s, %(valid_to)s, %(club_corr)s,
+            %(city)s, %(latitude)s, %(longitude)s
+        );
+    """
+
+    try:
+        if rows is not None:
+            with pg.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("DELETE FROM ris.ref_club_history;")
+                    cursor.executemany(insert_query, rows)
+            print("   [SUCCESS] Club history replaced")
+    except Exception as e:
+        print(f"   [ERROR] {str(e)}")
+        return 1
+
+    print("\n2. Current mapping:")
+    with pg.get_cursor() as cursor:
+        cursor.execute("""
+            SELECT club_name, valid_during, club_corr, city
+            FROM ris.ref_club_history
+            ORDER BY club_name, valid_from NULLS FIRST;
+        """)
+        for row in cursor.fetchall():
+            print(f"   {row['club_name']:<16} {str(row['valid_during']):<28} "
+                  f"-> {row['club_corr']} ({row['city']})")
+
+    print("\n" + "=" * 70)
+    print("POPULATION COMPLETE")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / 'src'))
+
+from utils.db_connectors import PostgresConnector
+
+
+# Clan arrays are unnested once here so that marts can hash-join on user_id
+# instead of scanning every clan's users/mentors arrays per user.
+MEMBERSHIP_QUERY = """
+    INSERT INTO ris.ref_user_clan (user_id, clan_id, clan_role)
+    SELECT DISTINCT m.user_id, m.clan_id, m.clan_role
+    FROM (
+        SELECT cl.admin::varchar AS user_id, cl.id::varchar AS clan_id, 'admin' AS clan_role
+        FROM raw.clans cl
+        WHERE cl.admin IS NOT NULL
+
+        UNION ALL
+
+        SELECT mn.user_id::varchar, cl.id::varchar, 'mentor'
+        FROM raw.clans cl
+        CROSS JOIN LATERAL unnest(cl.mentors) AS mn(user_id)
+
+        UNION ALL
+
+        SELECT us.user_id::varchar, cl.id::varchar, 'user'
+        FROM raw.clans cl
+        CROSS JOIN LATERAL unnest(cl.users) AS us(user_id)
+    ) m
+    WHERE m.user_id IS NOT NULL;
+"""
+
+
+def main():
+    """Rebuild ref_user_clan membership table from raw.clans"""
+    print("\n" + "=" * 70)
+    print("POPULATING REF_USER_CLAN TABLE")
+
+    pg = PostgresConnector()
+
+    if not pg.table_exists('ref_user_clan'):
+        print("\n[ERROR] Table ris.ref_user_clan does not exist!")
+        print("Please run sql/schemas/10_ref_user_clan.sql first.")
+        return 1
+
+    # Truncate and reload in one transaction so readers never see an empty table
+    print("\n1. Rebuilding clan membership from raw.clans...")
+    try:
+        with pg.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("TRUNCATE TABLE ris.ref_user_clan;")
+                cursor.execute(MEMBERSHIP_QUERY)
+                rows_inserted = cursor.rowcount
+        print(f"   SUCCESS: Inserted {rows_inserted:,} memberships")
+    except Exception as e:
+        print(f"   ERROR: {str(e)}")
+        return 1
+
+    print("\n2. Verifying data...")
+    with pg.get_cursor() as cursor:
+        cursor.execute("""
+            SELECT
+                clan_role,
+                COUNT(*) as memberships,
+                COUNT(DISTINCT user_id) as users,
+                COUNT(DISTINCT clan_id) as clans
+            FROM ris.ref_user_clan
+            GROUP BY clan_role
+            ORDER BY clan_role;
+        """)
+        for row in cursor.fetchall():
+            print(f"   {row['clan_role']:<8} memberships={row['memberships']:,} "
+                  f"users={row['users']:,} clans={row['clans']:,}")
+
+    print("\n" + "=" * 70)
+    print("POPULATION COMPLETE")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.config_loader import load_config
+from src.utils.db_connectors import PostgresConnector
+from src.scoring.service import ScoringService, RegistryFeatureSource, StubFeatureSource, create_app
+from src.scoring.score_users import load_model
+
+
+def main():
+    """Serve online retention scores over HTTP"""
+    parser = argparse.ArgumentParser(description='Run the online scoring service')
+    parser.add_argument('--window', type=int, default=None, help='Target window, days (default: from model metadata)')
+    parser.add_argument('--model', default=None, help='Compiled model (.npy) or pickle (default: latest compiled for the window)')
+    parser.add_argument('--stub-features', default=None, help='Serve features from a .csv/.parquet table instead of PostgreSQL')
+    parser.add_argument('--stub-delay-ms', type=float, default=0.0, help='Simulated latency of stub feature fetches')
+    parser.add_argument('--no-warm', action='store_true', help='Skip warming the feature cache on startup')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8000, help='Port')
+    args = parser.parse_args()
+
+    if args.model is None and args.window is None:
+        parser.error('--window is required without --model')
+
+    print("\n" + "=" * 70)
+    print("STARTING SCORING SERVICE")
+
+    try:
+        import uvicorn
+
+        config = load_config()
+        model = load_model(args.model, args.window)
+        if args.stub_features:
+            source = StubFeatureSource.from_file(Path(args.stub_features), args.stub_delay_ms)
+        else:
+            source = RegistryFeatureSource.for_model(PostgresConnector(), model.meta, config)
+        service = ScoringService(source, window_days=args.window, config=config, model=model)
+        app = create_app(service, warm=not args.no_warm)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        return 1
+
+    print(f"\nModel: {service.model.version} (window {service.window_days}d)")
+    print(f"Listening on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level='info')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.config_loader import load_config
+from src.utils.db_connectors import PostgresConnector
+from src.models.dataset_cache import DatasetCache
+from src.models.train import TrainingPipeline, MODEL_FACTORIES, SURVIVAL_FACTORIES
+from src.scoring.compiled_model import export_pickle
+
+TREE_MODELS = {'xgboost'}
+
+
+def main():
+    """Cross-validate models for the target windows"""
+    parser = argparse.ArgumentParser(description='Train and cross-validate RIS models')
+    parser.add_argument(
+        '--windows',
+        type=int,
+        nargs='*',
+        help='Target windows, days (default: model.target_windows)'
+    )
+    parser.add_argument(
+        '--models',
+        nargs='*',
+        help=f"Model families (default: all). Available: {', '.join([*MODEL_FACTORIES, *SURVIVAL_FACTORIES])}"
+    )
+    parser.add_argument('--features', nargs='*', help='Feature names (default: features from config.yaml)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument(
+        '--save',
+        action='store_true',
+        help='Fit every matrix model on all labeled rows, save it to models/ and compile tree models for scoring'
+    )
+    args = parser.parse_args()
+
+    config = load_config()
+    windows = args.windows or config['model']['target_windows']
+
+    print("\n" + "=" * 70)
+    print(f"TRAINING MODELS (windows: {', '.join(f'{w}d' for w in windows)})")
+
+    pg = PostgresConnector()
+    # One feature snapshot for all windows; only the labels differ
+    cache = DatasetCache(pg, features=args.features, config=config)
+
+    failed = []
+    for window in windows:
+        try:
+            pipeline = TrainingPipeline(
+                pg,
+                window_days=window,
+                models=args.models,
+                config=config,
+                max_workers=args.workers,
+                cache=cache
+            )
+            report = pipeline.run()
+        except Exception as e:
+            print(f"\nERROR ({window}d): {e}")
+            failed.append(window)
+            continue
+
+        metrics = [col for col in ('roc_auc', 'pr_auc', 'brier', 'concordance') if col in report.columns]
+        print(f"\nCV metrics, window {window}d (mean over folds, run {pipeline.run_id}):")
+        print(report.groupby('model')[metrics].mean().round(4).to_string())
+
+        if 'error' in report.columns and report['error'].notna().any():
+            failed.append(window)
+            continue
+
+        if args.save:
+            for model_name in pipeline.models:
+                if model_name in SURVIVAL_FACTORIES:
+                    # Cross-validated only: the scoring pipeline serves matrix models
+                    continue
+                model_path = pipeline.fit_final(model_name)
+                print(f"   Saved {model_name}: {model_path}")
+                if model_name in TREE_MODELS:
+                    print(f"   Compiled: {export_pickle(model_path)}")
+
+    print("\n" + "=" * 70)
+    if failed:
+        print(f"TRAINING FINISHED WITH ERRORS (windows: {', '.join(map(str, failed))})")
+        return 1
+
+    print("TRAINING COMPLETE")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
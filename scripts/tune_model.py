@@ -0,0 +1,52 @@
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.db_connectors import PostgresConnector
+from src.models.tuning import XGBoostTuner
+
+
+def main():
+    """Tune XGBoost hyperparameters for one target window"""
+    parser = argparse.ArgumentParser(description='Tune RIS XGBoost model with Optuna')
+    parser.add_argument('--window', type=int, default=30, help='Target window, days (model.target_windows)')
+    parser.add_argument('--trials', type=int, default=None, help='Trials to run (default: model.tuning.n_trials)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: model.tuning.n_workers)')
+    parser.add_argument('--timeout', type=int, default=None, help='Time limit per worker, seconds')
+    parser.add_argument('--study', default=None, help='Study name to resume')
+    parser.add_argument('--storage', default=None, help='Journal file path or sqlite:/// URL')
+    parser.add_argument('--features', nargs='*', help='Feature names (default: features from config.yaml)')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 70)
+    print(f"TUNING XGBOOST (window {args.window}d)")
+
+    try:
+        pg = PostgresConnector()
+        tuner = XGBoostTuner(
+            pg,
+            window_days=args.window,
+            features=args.features,
+            n_trials=args.trials,
+            n_workers=args.workers,
+            storage=args.storage,
+            study_name=args.study
+        )
+        config_path = tuner.run(timeout=args.timeout)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        return 1
+
+    print(f"\nStudy: {tuner.study_name} ({tuner.storage})")
+    print(f"Best params saved to {config_path}")
+
+    print("\n" + "=" * 70)
+    print("TUNING COMPLETE")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
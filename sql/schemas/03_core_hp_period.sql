@@ -1,13 +1,16 @@
 -- =====================================================================
 -- TABLE: ris.core_hp_period
 -- Description: Периоды HeroPass с учетом заморозок и корректировок клубов
+-- Partitioning: RANGE (hp_start), секции по году (или кварталу) начала периода
+--               (core_hp_period_2024, ...). Секции создаются и заменяются
+--               скриптом populate_core_hp_period.py (detach/attach)
 -- =====================================================================
 
 DROP TABLE IF EXISTS ris.core_hp_period CASCADE;
 
 CREATE TABLE ris.core_hp_period (
-    -- Primary key
-    hp_period_id        VARCHAR(50) PRIMARY KEY,
+    -- Primary key (with partition key)
+    hp_period_id        VARCHAR(50) NOT NULL,
 
     -- User reference
     user_id             VARCHAR(50),  -- Nullable to allow data load, will filter later
@@ -23,7 +26,10 @@ CREATE TABLE ris.core_hp_period (
 
     -- Duration metrics
     hp_length_days      INTEGER,                -- Длительность периода (hp_end - hp_start + 1)
-    freeze_days_total   INTEGER DEFAULT 0,      -- Общее количество дней заморозки
+    freeze_days_total   INTEGER DEFAULT 0,      -- Дни заморозки (пересекающиеся заморозки объединены)
+    freeze_count        INTEGER DEFAULT 0,      -- Количество заморозок в периоде
+    freeze_longest_days INTEGER DEFAULT 0,      -- Самая длинная (объединенная) заморозка, дней
+    freeze_attempt_number INTEGER DEFAULT 0,    -- Накопительное число заморозок пользователя на конец периода
 
     -- Renewal tracking
     next_hp_purchase_dt DATE,                   -- Дата покупки следующего HeroPass
@@ -35,10 +41,12 @@ CREATE TABLE ris.core_hp_period (
 
     -- Metadata
     created_at          TIMESTAMP DEFAULT NOW(),
-    updated_at          TIMESTAMP DEFAULT NOW()
-);
+    updated_at          TIMESTAMP DEFAULT NOW(),
 
--- Indexes for performance
+    PRIMARY KEY (hp_period_id, hp_start)
+) PARTITION BY RANGE (hp_start);
+
+-- Indexes for performance (created on every partition)
 CREATE INDEX idx_core_hp_period_user_id ON ris.core_hp_period(user_id);
 CREATE INDEX idx_core_hp_period_hp_start ON ris.core_hp_period(hp_start);
 CREATE INDEX idx_core_hp_period_hp_end_corrected ON ris.core_hp_period(hp_end_corrected);
@@ -46,7 +54,7 @@ CREATE INDEX idx_core_hp_period_renewed ON ris.core_hp_period(renewed);
 CREATE INDEX idx_core_hp_period_user_start ON ris.core_hp_period(user_id, hp_start);
 
 -- Comments
-COMMENT ON TABLE ris.core_hp_period IS 'Периоды HeroPass пользователей с учетом заморозок и корректировок';
+COMMENT ON TABLE ris.core_hp_period IS 'Периоды HeroPass пользователей с учетом заморозок и корректировок (секционирована по hp_start)';
 COMMENT ON COLUMN ris.core_hp_period.hp_period_id IS 'ID периода HeroPass (из raw.userheropass.id)';
 COMMENT ON COLUMN ris.core_hp_period.user_id IS 'ID пользователя';
 COMMENT ON COLUMN ris.core_hp_period.hp_type IS 'Тип HeroPass (годовой/полугодовой)';
@@ -55,7 +63,10 @@ COMMENT ON COLUMN ris.core_hp_period.hp_start IS 'Дата начала HeroPass
 COMMENT ON COLUMN ris.core_hp_period.hp_end IS 'Исходная дата окончания HeroPass';
 COMMENT ON COLUMN ris.core_hp_period.hp_end_corrected IS 'Дата окончания с учетом заморозок';
 COMMENT ON COLUMN ris.core_hp_period.hp_length_days IS 'Длительность HeroPass в днях';
-COMMENT ON COLUMN ris.core_hp_period.freeze_days_total IS 'Общее количество дней заморозки';
+COMMENT ON COLUMN ris.core_hp_period.freeze_days_total IS 'Общее количество дней заморозки (пересекающиеся и дублирующиеся заморозки объединены)';
+COMMENT ON COLUMN ris.core_hp_period.freeze_count IS 'Количество уникальных заморозок в периоде';
+COMMENT ON COLUMN ris.core_hp_period.freeze_longest_days IS 'Длительность самой длинной заморозки (после объединения пересечений), дней';
+COMMENT ON COLUMN ris.core_hp_period.freeze_attempt_number IS 'Номер последней попытки заморозки пользователя (накопительно по всем HeroPass до конца периода)';
 COMMENT ON COLUMN ris.core_hp_period.next_hp_purchase_dt IS 'Дата покупки следующего HeroPass';
 COMMENT ON COLUMN ris.core_hp_period.days_to_next_hp IS 'Дней до следующего HP (для тех кто продлил)';
 COMMENT ON COLUMN ris.core_hp_period.renewed IS 'Был ли продлен HeroPass';
@@ -0,0 +1,78 @@
+-- =====================================================================
+-- TABLE: ris.fact_user_week
+-- Description: Недельные метрики поведения пользователя (user x ISO-неделя),
+--              агрегированные из тренировок (MongoDB sessions).
+--              Пересчитываются только недели с новыми или измененными
+--              тренировками (src/data_engineering/build_features_weekly.py)
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.fact_user_week CASCADE;
+
+CREATE TABLE ris.fact_user_week (
+    -- Primary key
+    user_id             VARCHAR(50) NOT NULL,   -- ID пользователя
+    week_start          DATE NOT NULL,          -- Понедельник ISO-недели (по времени Алматы)
+
+    -- Week attributes
+    iso_year            SMALLINT NOT NULL,      -- ISO-год недели
+    iso_week            SMALLINT NOT NULL,      -- Номер ISO-недели (1-53)
+
+    -- Session counts
+    sessions_booked     INTEGER DEFAULT 0,      -- Все записи на тренировки за неделю
+    sessions_attended   INTEGER DEFAULT 0,      -- Посещенные тренировки
+    sessions_missed     INTEGER DEFAULT 0,      -- Пропущенные (записан, но не пришел)
+    sessions_cancelled  INTEGER DEFAULT 0,      -- Отмененные пользователем записи
+    late_arrivals       INTEGER DEFAULT 0,      -- Опоздания (отметка позже начала)
+    weekend_sessions    INTEGER DEFAULT 0,      -- Посещения в субботу/воскресенье
+
+    -- Activity patterns
+    active_days         SMALLINT DEFAULT 0,     -- Дней с хотя бы одним посещением
+    double_training_days SMALLINT DEFAULT 0,    -- Дней с двумя и более посещениями
+    distinct_trainers   SMALLINT DEFAULT 0,     -- Уникальных тренеров среди посещений
+    distinct_trainings  SMALLINT DEFAULT 0,     -- Уникальных типов тренировок среди посещений
+    avg_start_hour      DECIMAL(4, 2),          -- Средний час начала посещенных тренировок
+
+    -- Rates
+    attendance_rate     DECIMAL(5, 4),          -- sessions_attended / sessions_booked
+    cancellation_rate   DECIMAL(5, 4),          -- sessions_cancelled / sessions_booked
+
+    -- Distinct-count sketches (HyperLogLog, 256 registers) for windows of weeks
+    trainers_hll        BYTEA,                  -- Тренеры посещенных тренировок
+    trainings_hll       BYTEA,                  -- Типы посещенных тренировок
+
+    -- Time-of-day pattern
+    booking_hours       SMALLINT[],             -- Записи по часу начала (24 корзины, 0-23)
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+    updated_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (user_id, week_start)
+);
+
+-- Indexes for performance
+CREATE INDEX idx_fact_user_week_week_start ON ris.fact_user_week(week_start);
+CREATE INDEX idx_fact_user_week_iso ON ris.fact_user_week(iso_year, iso_week);
+
+-- Comments
+COMMENT ON TABLE ris.fact_user_week IS 'Недельные метрики поведения пользователя (одна строка на пользователя и ISO-неделю)';
+COMMENT ON COLUMN ris.fact_user_week.user_id IS 'ID пользователя';
+COMMENT ON COLUMN ris.fact_user_week.week_start IS 'Понедельник ISO-недели (локальное время Алматы, UTC+5)';
+COMMENT ON COLUMN ris.fact_user_week.iso_year IS 'ISO-год недели';
+COMMENT ON COLUMN ris.fact_user_week.iso_week IS 'Номер ISO-недели (1-53)';
+COMMENT ON COLUMN ris.fact_user_week.sessions_booked IS 'Количество записей на тренировки за неделю';
+COMMENT ON COLUMN ris.fact_user_week.sessions_attended IS 'Количество посещенных тренировок';
+COMMENT ON COLUMN ris.fact_user_week.sessions_missed IS 'Количество пропусков (запись без посещения и без отмены)';
+COMMENT ON COLUMN ris.fact_user_week.sessions_cancelled IS 'Количество отмененных записей';
+COMMENT ON COLUMN ris.fact_user_week.late_arrivals IS 'Количество опозданий на посещенные тренировки';
+COMMENT ON COLUMN ris.fact_user_week.weekend_sessions IS 'Количество посещений в выходные';
+COMMENT ON COLUMN ris.fact_user_week.active_days IS 'Количество дней с посещениями';
+COMMENT ON COLUMN ris.fact_user_week.double_training_days IS 'Количество дней с двумя и более посещениями';
+COMMENT ON COLUMN ris.fact_user_week.distinct_trainers IS 'Количество уникальных тренеров';
+COMMENT ON COLUMN ris.fact_user_week.distinct_trainings IS 'Количество уникальных типов тренировок';
+COMMENT ON COLUMN ris.fact_user_week.avg_start_hour IS 'Средний час начала посещенных тренировок (локальное время)';
+COMMENT ON COLUMN ris.fact_user_week.attendance_rate IS 'Доля посещенных тренировок от всех записей';
+COMMENT ON COLUMN ris.fact_user_week.cancellation_rate IS 'Доля отмененных записей от всех записей';
+COMMENT ON COLUMN ris.fact_user_week.trainers_hll IS 'HyperLogLog-скетч тренеров недели (объединяется по окну недель поэлементным max)';
+COMMENT ON COLUMN ris.fact_user_week.trainings_hll IS 'HyperLogLog-скетч типов тренировок недели';
+COMMENT ON COLUMN ris.fact_user_week.booking_hours IS 'Гистограмма записей по часу начала тренировки (24 элемента, локальное время)';
@@ -0,0 +1,47 @@
+-- =====================================================================
+-- TABLE: ris.label_hp
+-- Description: Таргеты продления HeroPass по окнам (model.target_windows:
+--              30/60/90 дней после hp_end_corrected) с флагами цензурирования.
+--              Одна строка на период и окно; пересчитываются только периоды,
+--              метка которых еще может измениться (build_labels.py)
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.label_hp CASCADE;
+
+CREATE TABLE ris.label_hp (
+    -- Primary key
+    hp_period_id        VARCHAR(50) NOT NULL,   -- ID периода HeroPass
+    window_days         SMALLINT NOT NULL,      -- Окно продления, дней после hp_end_corrected
+
+    -- Period reference
+    user_id             VARCHAR(50),            -- ID пользователя
+    hp_end_corrected    DATE NOT NULL,          -- Дата окончания с учетом заморозок (момент решения)
+    window_end          DATE NOT NULL,          -- hp_end_corrected + window_days
+    next_hp_purchase_dt DATE,                   -- Дата покупки следующего HeroPass
+    days_to_next_hp     INTEGER,                -- next_hp_purchase_dt - hp_end_corrected
+
+    -- Label
+    renewed             BOOLEAN,                -- Продлил в пределах окна (NULL пока окно открыто)
+    is_censored         BOOLEAN NOT NULL,       -- Окно еще не закрыто и продления нет
+    label_as_of         DATE NOT NULL,          -- Дата расчета метки
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+    updated_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (hp_period_id, window_days)
+);
+
+-- Indexes for performance
+CREATE INDEX idx_label_hp_user_id ON ris.label_hp(user_id);
+CREATE INDEX idx_label_hp_window_censored ON ris.label_hp(window_days, is_censored);
+CREATE INDEX idx_label_hp_hp_end_corrected ON ris.label_hp(hp_end_corrected);
+
+-- Comments
+COMMENT ON TABLE ris.label_hp IS 'Таргеты продления HeroPass по окнам 30/60/90 дней с цензурированием';
+COMMENT ON COLUMN ris.label_hp.hp_period_id IS 'ID периода HeroPass (ris.core_hp_period)';
+COMMENT ON COLUMN ris.label_hp.window_days IS 'Окно продления в днях после hp_end_corrected';
+COMMENT ON COLUMN ris.label_hp.window_end IS 'Последний день окна продления';
+COMMENT ON COLUMN ris.label_hp.renewed IS 'Продление в пределах окна (NULL, если окно открыто и продления еще нет)';
+COMMENT ON COLUMN ris.label_hp.is_censored IS 'Цензурировано справа: окно не закрыто на дату расчета';
+COMMENT ON COLUMN ris.label_hp.label_as_of IS 'Дата, на которую рассчитана метка';
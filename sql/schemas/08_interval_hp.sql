@@ -0,0 +1,47 @@
+-- =====================================================================
+-- TABLE: ris.interval_hp
+-- Description: Интервалы (start, stop, event] в формате counting process
+--              для survival-модели (Cox PH с меняющимися ковариатами).
+--              Время — дни от начала HeroPass; новая строка появляется только
+--              когда меняются недельные ковариаты (build_intervals.py)
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.interval_hp CASCADE;
+
+CREATE TABLE ris.interval_hp (
+    -- Primary key
+    hp_period_id        VARCHAR(50) NOT NULL,   -- ID периода HeroPass
+    start_day           SMALLINT NOT NULL,      -- Начало интервала, дней от hp_start (не включая)
+    stop_day            SMALLINT NOT NULL,      -- Конец интервала, дней от hp_start (включая)
+
+    -- Period reference
+    user_id             VARCHAR(50),            -- ID пользователя
+
+    -- Event
+    event               BOOLEAN NOT NULL,       -- Продление в конце интервала
+
+    -- Time-varying covariates (facts of the previous week, constant within the interval)
+    sessions_attended   SMALLINT DEFAULT 0,
+    sessions_missed     SMALLINT DEFAULT 0,
+    sessions_cancelled  SMALLINT DEFAULT 0,
+    late_arrivals       SMALLINT DEFAULT 0,
+    active_days         SMALLINT DEFAULT 0,
+    double_training_days SMALLINT DEFAULT 0,
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (hp_period_id, start_day)
+);
+
+-- Indexes for performance
+CREATE INDEX idx_interval_hp_user_id ON ris.interval_hp(user_id);
+
+-- Comments
+COMMENT ON TABLE ris.interval_hp IS 'Counting-process интервалы периодов HeroPass для survival-модели';
+COMMENT ON COLUMN ris.interval_hp.start_day IS 'Начало интервала в днях от hp_start (интервал (start_day, stop_day])';
+COMMENT ON COLUMN ris.interval_hp.stop_day IS 'Конец интервала в днях от hp_start';
+COMMENT ON COLUMN ris.interval_hp.event IS 'Продление HeroPass в момент stop_day (только на последнем интервале периода)';
+COMMENT ON COLUMN ris.interval_hp.sessions_attended IS 'Посещения за предыдущую неделю, действующие на интервале';
+COMMENT ON COLUMN ris.interval_hp.sessions_missed IS 'Пропуски за предыдущую неделю, действующие на интервале';
+COMMENT ON COLUMN ris.interval_hp.sessions_cancelled IS 'Отмены за предыдущую неделю, действующие на интервале';
@@ -0,0 +1,68 @@
+-- =====================================================================
+-- TABLE: ris.meta_etl_watermark
+-- Description: Водяные знаки инкрементальных загрузок витрин
+--              (время последнего успешного запуска по каждому job)
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.meta_etl_watermark CASCADE;
+
+CREATE TABLE ris.meta_etl_watermark (
+    -- Primary key
+    job_name            VARCHAR(100) PRIMARY KEY,   -- Имя загрузки, например 'core_user'
+
+    -- Watermark
+    watermark           TIMESTAMP NOT NULL,         -- Изменения позже этого момента еще не обработаны
+    run_mode            VARCHAR(20),                -- 'full' или 'incremental'
+    rows_affected       INTEGER,                    -- Количество пересчитанных строк за запуск
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+    updated_at          TIMESTAMP DEFAULT NOW()
+);
+
+-- Comments
+COMMENT ON TABLE ris.meta_etl_watermark IS 'Водяные знаки инкрементальных загрузок витрин';
+COMMENT ON COLUMN ris.meta_etl_watermark.job_name IS 'Имя загрузки (витрины)';
+COMMENT ON COLUMN ris.meta_etl_watermark.watermark IS 'Время начала последнего успешного запуска (по часам БД)';
+COMMENT ON COLUMN ris.meta_etl_watermark.run_mode IS 'Режим последнего запуска: full или incremental';
+COMMENT ON COLUMN ris.meta_etl_watermark.rows_affected IS 'Количество пересчитанных строк за последний запуск';
+
+
+-- =====================================================================
+-- TABLE: ris.meta_pipeline_run
+-- Description: Статусы и длительность шагов построения витрин
+--              (для resume с первого упавшего шага)
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.meta_pipeline_run CASCADE;
+
+CREATE TABLE ris.meta_pipeline_run (
+    -- Primary key
+    run_id              VARCHAR(50) NOT NULL,       -- ID запуска пайплайна
+    step_name           VARCHAR(100) NOT NULL,      -- Имя шага, например 'core_user'
+
+    -- Run details
+    pipeline_name       VARCHAR(100) NOT NULL,      -- Имя пайплайна, например 'marts'
+    status              VARCHAR(20) NOT NULL,       -- 'running', 'success', 'failed', 'skipped'
+    started_at          TIMESTAMP,
+    finished_at         TIMESTAMP,
+    duration_sec        DECIMAL(10, 2),
+    error_message       TEXT,                       -- Хвост вывода упавшего шага
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+    updated_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (run_id, step_name)
+);
+
+-- Indexes for performance
+CREATE INDEX idx_meta_pipeline_run_pipeline ON ris.meta_pipeline_run(pipeline_name, started_at);
+
+-- Comments
+COMMENT ON TABLE ris.meta_pipeline_run IS 'Статусы шагов построения витрин по запускам';
+COMMENT ON COLUMN ris.meta_pipeline_run.run_id IS 'ID запуска (повторяется при resume)';
+COMMENT ON COLUMN ris.meta_pipeline_run.step_name IS 'Имя шага пайплайна';
+COMMENT ON COLUMN ris.meta_pipeline_run.status IS 'Статус шага: running, success, failed, skipped';
+COMMENT ON COLUMN ris.meta_pipeline_run.duration_sec IS 'Длительность шага в секундах';
+COMMENT ON COLUMN ris.meta_pipeline_run.error_message IS 'Последние строки вывода упавшего шага';
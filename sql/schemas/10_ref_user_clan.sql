@@ -0,0 +1,30 @@
+-- =====================================================================
+-- TABLE: ris.ref_user_clan
+-- Description: Членство пользователей в кланах (user -> clan -> role),
+--              развернутое из массивов raw.clans.users / raw.clans.mentors
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.ref_user_clan CASCADE;
+
+CREATE TABLE ris.ref_user_clan (
+    -- Membership key
+    user_id             VARCHAR(50) NOT NULL,   -- ID пользователя
+    clan_id             VARCHAR(50) NOT NULL,   -- ID клана (raw.clans.id)
+    clan_role           VARCHAR(20) NOT NULL,   -- 'admin', 'mentor' или 'user'
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+    updated_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (user_id, clan_id, clan_role)
+);
+
+-- Indexes for performance
+CREATE INDEX idx_ref_user_clan_clan_id ON ris.ref_user_clan(clan_id);
+CREATE INDEX idx_ref_user_clan_role ON ris.ref_user_clan(clan_role);
+
+-- Comments
+COMMENT ON TABLE ris.ref_user_clan IS 'Членство пользователей в кланах (одна строка на пользователя, клан и роль)';
+COMMENT ON COLUMN ris.ref_user_clan.user_id IS 'ID пользователя';
+COMMENT ON COLUMN ris.ref_user_clan.clan_id IS 'ID клана (из raw.clans.id)';
+COMMENT ON COLUMN ris.ref_user_clan.clan_role IS 'Роль в клане: admin, mentor, user';
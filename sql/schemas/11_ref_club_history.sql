@@ -0,0 +1,45 @@
+-- =====================================================================
+-- TABLE: ris.ref_club_history
+-- Description: История клубов с периодами действия: в какой клуб и город
+--              относить исходный клуб на дату (закрытые/переименованные клубы)
+-- =====================================================================
+
+-- btree_gist allows "club_name WITH =" inside the GiST exclusion constraint
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+DROP TABLE IF EXISTS ris.ref_club_history CASCADE;
+
+CREATE TABLE ris.ref_club_history (
+    -- Source club
+    club_name           VARCHAR(100) NOT NULL,  -- Исходное название клуба (raw.club.name)
+
+    -- Validity range
+    valid_from          DATE,                   -- Начало действия (NULL = без ограничения)
+    valid_to            DATE,                   -- Конец действия, не включительно (NULL = без ограничения)
+    valid_during        DATERANGE GENERATED ALWAYS AS (daterange(valid_from, valid_to, '[)')) STORED,
+
+    -- Resolved club
+    club_corr           VARCHAR(100) NOT NULL,  -- Клуб с коррекцией для закрытых клубов
+    city                VARCHAR(50) NOT NULL,   -- Алматы или Астана
+    latitude            DECIMAL(10, 7),         -- Координаты клуба club_corr
+    longitude           DECIMAL(10, 7),
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+    updated_at          TIMESTAMP DEFAULT NOW(),
+
+    -- One mapping per club and date; the GiST index also serves the range joins
+    CONSTRAINT ex_ref_club_history_no_overlap
+        EXCLUDE USING gist (club_name WITH =, valid_during WITH &&)
+);
+
+-- Comments
+COMMENT ON TABLE ris.ref_club_history IS 'История клубов: коррекция закрытых клубов, город и координаты на дату';
+COMMENT ON COLUMN ris.ref_club_history.club_name IS 'Исходное название клуба';
+COMMENT ON COLUMN ris.ref_club_history.valid_from IS 'Начало действия записи (NULL = с начала истории)';
+COMMENT ON COLUMN ris.ref_club_history.valid_to IS 'Конец действия записи, не включительно (NULL = действует сейчас)';
+COMMENT ON COLUMN ris.ref_club_history.valid_during IS 'Период действия [valid_from, valid_to)';
+COMMENT ON COLUMN ris.ref_club_history.club_corr IS 'Клуб с коррекцией для исторически закрытых клубов';
+COMMENT ON COLUMN ris.ref_club_history.city IS 'Город клуба club_corr';
+COMMENT ON COLUMN ris.ref_club_history.latitude IS 'Широта клуба club_corr';
+COMMENT ON COLUMN ris.ref_club_history.longitude IS 'Долгота клуба club_corr';
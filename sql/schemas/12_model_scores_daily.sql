@@ -0,0 +1,60 @@
+-- =====================================================================
+-- TABLE: ris.model_scores_daily
+-- Description: Ежедневные скоры вероятности продления HeroPass для
+--              активных держателей HeroPass, у которых до окончания периода
+--              не больше горизонта модели (max model.decision_offsets_days),
+--              с риск-бэндами и уровнем интервенции
+--              (src/scoring/score_users.py). Держатели дальше от окончания
+--              не получают строку; онлайн-сервис им тоже не отвечает.
+--              Пользователи с неизменным fingerprint фич, версией модели
+--              и периодом переносятся с предыдущего дня без пересчета
+-- Partitioning: RANGE (score_date), секции по месяцу
+--               (model_scores_daily_2026_01, ...). Секции создаются
+--               скриптом скоринга при первой записи за месяц
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.model_scores_daily CASCADE;
+
+CREATE TABLE ris.model_scores_daily (
+    -- Primary key
+    score_date          DATE NOT NULL,          -- Дата скоринга (as_of для фич)
+    window_days         SMALLINT NOT NULL,      -- Окно продления модели, дней после hp_end_corrected
+    user_id             VARCHAR(50) NOT NULL,   -- ID пользователя
+
+    -- Period reference
+    hp_period_id        VARCHAR(50),            -- Текущий период HeroPass
+    hp_end_corrected    DATE,                   -- Дата окончания текущего периода с учетом заморозок
+    days_to_hp_end      INTEGER,                -- Дней до окончания периода
+
+    -- Score
+    model_version       VARCHAR(100) NOT NULL,  -- Версия модели (например, xgboost_w30_v3)
+    renewal_probability REAL NOT NULL,          -- Вероятность продления в пределах окна
+    risk_band           VARCHAR(20),            -- Риск-бэнд (scoring.risk_bands)
+    intervention        VARCHAR(20),            -- Уровень интервенции (scoring.intervention_thresholds), NULL если не нужна
+
+    -- Incremental rescoring
+    feature_fingerprint BIGINT,                 -- Хэш вектора фич относительно порогов сплитов модели
+    scored_date         DATE NOT NULL,          -- Дата, когда вероятность рассчитана моделью
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (score_date, window_days, user_id)
+) PARTITION BY RANGE (score_date);
+
+-- Indexes for performance (created on every partition)
+CREATE INDEX idx_model_scores_daily_user_id ON ris.model_scores_daily(user_id);
+CREATE INDEX idx_model_scores_daily_risk_band ON ris.model_scores_daily(score_date, risk_band);
+
+-- Comments
+COMMENT ON TABLE ris.model_scores_daily IS 'Ежедневные скоры продления HeroPass по активным держателям в пределах горизонта модели (секционирована по score_date, месяц)';
+COMMENT ON COLUMN ris.model_scores_daily.score_date IS 'Дата скоринга; фичи рассчитаны на эту дату';
+COMMENT ON COLUMN ris.model_scores_daily.window_days IS 'Окно продления, для которого обучена модель';
+COMMENT ON COLUMN ris.model_scores_daily.hp_period_id IS 'ID текущего периода HeroPass (ris.core_hp_period)';
+COMMENT ON COLUMN ris.model_scores_daily.days_to_hp_end IS 'Количество дней от score_date до hp_end_corrected';
+COMMENT ON COLUMN ris.model_scores_daily.model_version IS 'Версия модели, которой рассчитан скор';
+COMMENT ON COLUMN ris.model_scores_daily.renewal_probability IS 'Вероятность продления HeroPass в пределах окна';
+COMMENT ON COLUMN ris.model_scores_daily.risk_band IS 'Риск-бэнд по вероятности продления (very_high ... very_low)';
+COMMENT ON COLUMN ris.model_scores_daily.intervention IS 'Уровень интервенции: critical / warning / watch';
+COMMENT ON COLUMN ris.model_scores_daily.feature_fingerprint IS 'Хэш вектора фич: одинаковый хэш при той же модели дает тот же скор';
+COMMENT ON COLUMN ris.model_scores_daily.scored_date IS 'Дата расчета вероятности; меньше score_date, если скор перенесен с прошлого дня';
@@ -0,0 +1,34 @@
+-- =====================================================================
+-- TABLE: ris.model_explanations
+-- Description: Топ-k причин скора (TreeSHAP вклад фич) по версии модели
+--              и fingerprint вектора фич (src/scoring/explanations.py).
+--              Пользователи с одинаковым fingerprint при одной модели
+--              получают одинаковые вклады, поэтому объяснение считается
+--              один раз и переиспользуется. Связь со скорами:
+--              model_scores_daily.(model_version, feature_fingerprint)
+-- =====================================================================
+
+DROP TABLE IF EXISTS ris.model_explanations CASCADE;
+
+CREATE TABLE ris.model_explanations (
+    -- Primary key
+    model_version       VARCHAR(100) NOT NULL,  -- Версия модели (например, xgboost_w30_v3)
+    feature_fingerprint BIGINT NOT NULL,        -- Хэш вектора фич (model_scores_daily.feature_fingerprint)
+    rank                SMALLINT NOT NULL,      -- Место фичи по абсолютному вкладу (1 = самый сильный)
+
+    -- Contribution
+    feature             VARCHAR(100) NOT NULL,  -- Фича (one-hot колонки объединены в исходную фичу)
+    contribution        REAL NOT NULL,          -- Вклад в log-odds продления (< 0 снижает вероятность)
+
+    -- Metadata
+    created_at          TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (model_version, feature_fingerprint, rank)
+);
+
+-- Comments
+COMMENT ON TABLE ris.model_explanations IS 'Топ-k вкладов фич (TreeSHAP) по версии модели и fingerprint фич';
+COMMENT ON COLUMN ris.model_explanations.feature_fingerprint IS 'Хэш вектора фич относительно порогов сплитов модели';
+COMMENT ON COLUMN ris.model_explanations.rank IS 'Ранг по абсолютному вкладу, 1 = самый сильный';
+COMMENT ON COLUMN ris.model_explanations.feature IS 'Название фичи из реестра (например, location, engagement_delta)';
+COMMENT ON COLUMN ris.model_explanations.contribution IS 'SHAP-вклад в log-odds вероятности продления; отрицательный вклад повышает риск';
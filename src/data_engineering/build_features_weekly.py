@@ -0,0 +1,451 @@
+"""
+Weekly behavior facts
+Aggregates sessions per user and ISO week into ris.fact_user_week,
+recomputing only the weeks touched by new or changed sessions and the weeks
+of sessions that started since the previous run (sessions_missed counts
+only bookings already in the past)
+"""
+
+from typing import Optional, Iterator, Tuple, List, Dict, Any
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+
+from ..utils.db_connectors import PostgresConnector, MongoConnector
+from ..utils.logger import setup_logger
+from ..utils.config_loader import load_config
+from .mongo_extractor import MongoExtractor
+from .postgres_loader import PostgresLoader
+from .meta_store import MetaStore
+from ..features.sketches import build_registers, to_bytea
+
+
+logger = setup_logger('build_features_weekly', log_file='logs/build_features_weekly.log')
+
+JOB_NAME = 'fact_user_week'
+
+# Sessions collection schema; sources.sessions in config.yaml overrides it
+# (fields maps document fields to column names)
+DEFAULT_SESSION_SOURCE = {
+    'collection': 'sessions',
+    'fields': {
+        'userId': 'user_id',
+        'date': 'session_at',
+        'status': 'status',
+        'trainerId': 'trainer_id',
+        'trainingId': 'training_id',
+        'checkInAt': 'checkin_at',
+    },
+    'changed_field': 'updatedAt',
+    'attended_statuses': ['visited', 'attended', 'completed'],
+    'cancelled_statuses': ['cancelled', 'canceled'],
+    'timezone': 'Asia/Almaty',
+}
+SESSION_COLUMNS = ['user_id', 'session_at', 'status', 'trainer_id', 'training_id', 'checkin_at']
+
+LATE_ARRIVAL_THRESHOLD = pd.Timedelta(minutes=5)
+
+FACT_COLUMNS = [
+    'user_id', 'week_start', 'iso_year', 'iso_week',
+    'sessions_booked', 'sessions_attended', 'sessions_missed', 'sessions_cancelled',
+    'late_arrivals', 'weekend_sessions', 'active_days', 'double_training_days',
+    'distinct_trainers', 'distinct_trainings', 'avg_start_hour',
+    'attendance_rate', 'cancellation_rate', 'trainers_hll', 'trainings_hll', 'booking_hours',
+]
+INTEGER_COLUMNS = [
+    col for col in FACT_COLUMNS[2:]
+    if col not in ('avg_start_hour', 'attendance_rate', 'cancellation_rate', 'trainers_hll', 'trainings_hll', 'booking_hours')
+]
+
+
+def session_source(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Sessions collection schema from config
+
+    Args:
+        config: Loaded config; sources.sessions overrides DEFAULT_SESSION_SOURCE
+
+    Returns:
+        Schema dict with collection, fields, changed_field, status lists and
+        the IANA timezone weeks are cut in
+    """
+    source = {**DEFAULT_SESSION_SOURCE, **(config or {}).get('sources', {}).get('sessions', {})}
+    missing = set(SESSION_COLUMNS) - set(source['fields'].values())
+    if missing:
+        raise ValueError(f"sources.sessions.fields does not map: {sorted(missing)}")
+    ZoneInfo(source['timezone'])  # Unknown names raise here, not mid-build
+    return source
+
+
+def source_field(fields: Dict[str, str], column: str) -> str:
+    """Document field mapped to a session column"""
+    return next(field for field, name in fields.items() if name == column)
+
+
+def to_local(values, tz: str) -> pd.Series:
+    """UTC datetimes (naive or aware) as naive local time of tz; unparsable values become NaT"""
+    utc = pd.to_datetime(pd.Series(values), errors='coerce', utc=True)
+    return utc.dt.tz_convert(tz).dt.tz_localize(None)
+
+
+def local_to_utc(value: pd.Timestamp, tz: str, earliest: bool = True) -> datetime:
+    """
+    Naive local time of tz as a naive UTC datetime (for Mongo date filters)
+
+    A local time that occurs twice (DST end) resolves to its earlier or later
+    instant; a skipped one (DST start) moves forward.
+    """
+    local = pd.Timestamp(value).tz_localize(tz, ambiguous=earliest, nonexistent='shift_forward')
+    return local.tz_convert('UTC').tz_localize(None).to_pydatetime()
+
+
+def local_now(tz: str) -> pd.Timestamp:
+    """Current naive local time of tz"""
+    return pd.Timestamp.now(tz=tz).tz_localize(None)
+
+
+def normalize_sessions(
+    df: pd.DataFrame,
+    fields: Optional[Dict[str, str]] = None,
+    tz: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Rename session fields and derive local date and week start
+
+    Args:
+        df: Raw session documents (times in UTC)
+        fields: Document field -> column name (default: DEFAULT_SESSION_SOURCE)
+        tz: Timezone weeks are cut in (default: DEFAULT_SESSION_SOURCE)
+
+    Returns:
+        DataFrame with user_id, session_at (local time), status, trainer_id,
+        training_id, checkin_at, session_date and week_start
+    """
+    fields = fields or DEFAULT_SESSION_SOURCE['fields']
+    tz = tz or DEFAULT_SESSION_SOURCE['timezone']
+    sessions = df.reindex(columns=list(fields)).rename(columns=fields)
+    sessions = sessions[sessions['user_id'].notna() & sessions['session_at'].notna()]
+
+    sessions['user_id'] = sessions['user_id'].astype(str)
+    sessions['status'] = sessions['status'].astype(str).str.lower()
+    for col in ['trainer_id', 'training_id']:
+        sessions[col] = sessions[col].where(sessions[col].isna(), sessions[col].astype(str))
+
+    sessions['session_at'] = to_local(sessions['session_at'], tz).to_numpy()
+    sessions['checkin_at'] = to_local(sessions['checkin_at'], tz).to_numpy()
+    sessions = sessions[sessions['session_at'].notna()]
+
+    sessions['session_date'] = sessions['session_at'].dt.normalize()
+    sessions['week_start'] = (
+        sessions['session_date'] - pd.to_timedelta(sessions['session_date'].dt.weekday, unit='D')
+    )
+    return sessions.reset_index(drop=True)
+
+
+def aggregate_user_weeks(
+    sessions: pd.DataFrame,
+    as_of: datetime,
+    attended_statuses: Optional[List[str]] = None,
+    cancelled_statuses: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Aggregate normalized sessions to one row per user and week
+
+    Args:
+        sessions: Output of normalize_sessions (all sessions of every week present)
+        as_of: Local time of the run; bookings after it are not counted as missed
+        attended_statuses: Statuses of visited sessions (default: DEFAULT_SESSION_SOURCE)
+        cancelled_statuses: Statuses of cancelled sessions (default: DEFAULT_SESSION_SOURCE)
+
+    Returns:
+        DataFrame with FACT_COLUMNS
+    """
+    keys = ['user_id', 'week_start']
+
+    attended = sessions['status'].isin(attended_statuses or DEFAULT_SESSION_SOURCE['attended_statuses'])
+    cancelled = sessions['status'].isin(cancelled_statuses or DEFAULT_SESSION_SOURCE['cancelled_statuses'])
+    start_hour = sessions['session_at'].dt.hour + sessions['session_at'].dt.minute / 60
+
+    flags = sessions[keys].assign(
+        is_attended=attended,
+        is_cancelled=cancelled,
+        is_missed=~attended & ~cancelled & (sessions['session_at'] < as_of),
+        is_late=attended & (sessions['checkin_at'] - sessions['session_at'] > LATE_ARRIVAL_THRESHOLD),
+        is_weekend=attended & (sessions['session_at'].dt.weekday >= 5),
+        start_hour=start_hour.where(attended),
+    )
+    weekly = flags.groupby(keys, sort=False).agg(
+        sessions_booked=('is_attended', 'size'),
+        sessions_attended=('is_attended', 'sum'),
+        sessions_missed=('is_missed', 'sum'),
+        sessions_cancelled=('is_cancelled', 'sum'),
+        late_arrivals=('is_late', 'sum'),
+        weekend_sessions=('is_weekend', 'sum'),
+        avg_start_hour=('start_hour', 'mean'),
+    )
+
+    visits = sessions[attended]
+    visits_per_day = visits.groupby(keys + ['session_date'], sort=False).size()
+    days = pd.DataFrame({
+        'active_days': visits_per_day.groupby(level=keys, sort=False).size(),
+        'double_training_days': (visits_per_day >= 2).groupby(level=keys, sort=False).sum(),
+    })
+    variety = visits.groupby(keys, sort=False).agg(
+        distinct_trainers=('trainer_id', 'nunique'),
+        distinct_trainings=('training_id', 'nunique'),
+    )
+
+    weekly = weekly.join(days).join(variety)
+    count_columns = ['active_days', 'double_training_days', 'distinct_trainers', 'distinct_trainings']
+    weekly[count_columns] = weekly[count_columns].fillna(0)
+
+    # Booked sessions by local start hour, as a PostgreSQL array literal
+    session_rows = weekly.index.get_indexer(pd.MultiIndex.from_frame(sessions[keys]))
+    hours = np.zeros((len(weekly), 24), dtype=np.int64)
+    np.add.at(hours, (session_rows, sessions['session_at'].dt.hour.to_numpy()), 1)
+    weekly['booking_hours'] = ['{' + ','.join(map(str, row)) + '}' for row in hours]
+
+    # Mergeable distinct-count sketches, so variety over any window of weeks
+    # can be answered later without the sessions
+    visit_rows = weekly.index.get_indexer(pd.MultiIndex.from_frame(visits[keys]))
+    for col, sketch_col in [('trainer_id', 'trainers_hll'), ('training_id', 'trainings_hll')]:
+        registers = build_registers(visit_rows, len(weekly), visits[col])
+        has_values = registers.any(axis=1)
+        weekly[sketch_col] = np.where(has_values, to_bytea(registers), None)
+    weekly = weekly.reset_index()
+
+    weekly['attendance_rate'] = (weekly['sessions_attended'] / weekly['sessions_booked']).round(4)
+    weekly['cancellation_rate'] = (weekly['sessions_cancelled'] / weekly['sessions_booked']).round(4)
+    weekly['avg_start_hour'] = weekly['avg_start_hour'].round(2)
+
+    iso = weekly['week_start'].dt.isocalendar()
+    weekly['iso_year'] = iso['year'].astype(int)
+    weekly['iso_week'] = iso['week'].astype(int)
+    weekly['week_start'] = weekly['week_start'].dt.date
+
+    weekly[INTEGER_COLUMNS] = weekly[INTEGER_COLUMNS].astype(int)
+
+    return weekly[FACT_COLUMNS]
+
+
+class WeeklyFactBuilder:
+    """Build ris.fact_user_week from MongoDB sessions"""
+
+    def __init__(
+        self,
+        mongo_connector: MongoConnector,
+        postgres_connector: PostgresConnector,
+        batch_size: int = 50000,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize builder
+
+        Args:
+            mongo_connector: MongoDB connector instance
+            postgres_connector: PostgreSQL connector instance
+            batch_size: Number of session documents read per chunk
+            config: Loaded config (default: config/config.yaml); sources.sessions
+                    describes the sessions collection
+        """
+        self.extractor = MongoExtractor(mongo_connector)
+        self.pg = postgres_connector
+        self.loader = PostgresLoader(postgres_connector)
+        self.meta = MetaStore(postgres_connector)
+        self.schema = postgres_connector.schema
+        self.batch_size = batch_size
+        self.source = session_source(config if config is not None else load_config())
+        self.fields = self.source['fields']
+        self.tz = self.source['timezone']
+        self.user_field = source_field(self.fields, 'user_id')
+        self.date_field = source_field(self.fields, 'session_at')
+
+    def _iter_weeks(
+        self,
+        query: Optional[dict] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream normalized sessions grouped into complete weeks
+
+        Chunks come sorted by date, so every week before the last one of a chunk
+        is complete; the last week is carried over to the next chunk.
+        """
+        projection = {field: 1 for field in self.fields}
+        carry = None
+
+        for chunk in self._iter_documents(
+            start_date=start_date,
+            end_date=end_date,
+            query=query,
+            projection=projection
+        ):
+            sessions = normalize_sessions(chunk, self.fields, self.tz)
+            if carry is not None:
+                sessions = pd.concat([carry, sessions], ignore_index=True)
+            if sessions.empty:
+                continue
+
+            is_last_week = sessions['week_start'] == sessions['week_start'].max()
+            carry = sessions[is_last_week]
+            if not is_last_week.all():
+                yield sessions[~is_last_week]
+
+        if carry is not None and not carry.empty:
+            yield carry
+
+    def _iter_documents(self, **kwargs) -> Iterator[pd.DataFrame]:
+        """Stream raw session documents of the configured collection"""
+        return self.extractor.iter_sessions(
+            batch_size=self.batch_size,
+            collection_name=self.source['collection'],
+            date_field=self.date_field,
+            **kwargs
+        )
+
+    def _aggregate(self, sessions: pd.DataFrame, as_of: datetime) -> pd.DataFrame:
+        return aggregate_user_weeks(
+            sessions, as_of, self.source['attended_statuses'], self.source['cancelled_statuses']
+        )
+
+    def find_touched_weeks(self, since: datetime, until: datetime) -> Tuple[pd.DataFrame, List]:
+        """
+        Find (user, week) pairs to recompute after a watermark
+
+        These are weeks with sessions created or changed after the watermark,
+        and weeks with sessions that started between the watermark and this
+        run: a booking that was in the future on the previous run may be
+        missed now. Sessions moved to another week or deleted in the source
+        are only picked up by a full rebuild.
+
+        Args:
+            since: Watermark of the previous run
+            until: Start of this run (UTC, as the sessions are stored)
+
+        Returns:
+            (DataFrame with user_id and week_start, raw user IDs for Mongo queries)
+        """
+        query = {'$or': [
+            {self.source['changed_field']: {'$gt': since}},
+            {self.date_field: {'$gte': since, '$lt': until}},
+        ]}
+        touched = []
+        user_refs = set()
+
+        for chunk in self._iter_documents(
+            query=query,
+            projection={self.user_field: 1, self.date_field: 1}
+        ):
+            chunk = chunk[chunk[self.user_field].notna() & chunk[self.date_field].notna()]
+            user_refs.update(chunk[self.user_field].tolist())
+            sessions = normalize_sessions(chunk, self.fields, self.tz)
+            touched.append(sessions[['user_id', 'week_start']].drop_duplicates())
+
+        if not touched:
+            return pd.DataFrame(columns=['user_id', 'week_start']), []
+
+        keys = pd.concat(touched, ignore_index=True).drop_duplicates().reset_index(drop=True)
+        logger.info(f"Touched weeks since {since}: {len(keys)} (users: {len(user_refs)})")
+        return keys, list(user_refs)
+
+    def rebuild_full(self) -> int:
+        """
+        Recompute the whole table in one transaction
+
+        Returns:
+            Number of loaded rows
+        """
+        as_of = local_now(self.tz)
+        rows = 0
+
+        with self.pg.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"TRUNCATE TABLE {self.schema}.fact_user_week;")
+                for sessions in self._iter_weeks():
+                    weekly = self._aggregate(sessions, as_of)
+                    self.loader.copy_dataframe(weekly, f"{self.schema}.fact_user_week", cursor)
+                    rows += len(weekly)
+                    logger.info(f"Loaded {rows} user weeks (up to {weekly['week_start'].max()})")
+
+        return rows
+
+    def rebuild_weeks(self, touched: pd.DataFrame, user_refs: List) -> int:
+        """
+        Recompute only the given (user, week) pairs
+
+        All sessions of the touched users within the touched date range are
+        re-read, aggregated, and only the touched pairs are replaced.
+
+        Args:
+            touched: DataFrame with user_id and week_start
+            user_refs: Raw user IDs of the touched users
+
+        Returns:
+            Number of loaded rows
+        """
+        if touched.empty:
+            return 0
+
+        as_of = local_now(self.tz)
+        start_date = local_to_utc(touched['week_start'].min(), self.tz, earliest=True)
+        end_date = local_to_utc(touched['week_start'].max() + pd.Timedelta(days=7), self.tz, earliest=False)
+
+        parts = []
+        for sessions in self._iter_weeks(
+            query={self.user_field: {'$in': user_refs}},
+            start_date=start_date,
+            end_date=end_date
+        ):
+            sessions = sessions.merge(touched, on=['user_id', 'week_start'], how='inner')
+            if not sessions.empty:
+                parts.append(self._aggregate(sessions, as_of))
+
+        weekly = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=FACT_COLUMNS)
+
+        # Pairs without sessions left are deleted and not re-inserted
+        delete_query = f"""
+            DELETE FROM {self.schema}.fact_user_week f
+            USING unnest(%s::text[], %s::date[]) AS t(user_id, week_start)
+            WHERE f.user_id = t.user_id
+              AND f.week_start = t.week_start;
+        """
+        with self.pg.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    delete_query,
+                    (touched['user_id'].tolist(), touched['week_start'].dt.date.tolist())
+                )
+                if not weekly.empty:
+                    self.loader.copy_dataframe(weekly, f"{self.schema}.fact_user_week", cursor)
+
+        return len(weekly)
+
+    def build(self, incremental: bool = False) -> int:
+        """
+        Build fact_user_week and record the watermark
+
+        Args:
+            incremental: Recompute only weeks touched since the last run
+                         (full rebuild on the first run)
+
+        Returns:
+            Number of loaded rows
+        """
+        # Compared with session timestamps, so taken by the UTC clock the sources write
+        run_started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        since = self.meta.get_watermark(JOB_NAME) if incremental else None
+
+        if since is None:
+            logger.info("Full rebuild of fact_user_week")
+            rows = self.rebuild_full()
+            run_mode = 'full'
+        else:
+            touched, user_refs = self.find_touched_weeks(since, run_started_at)
+            rows = self.rebuild_weeks(touched, user_refs)
+            run_mode = 'incremental'
+
+        self.meta.set_watermark(JOB_NAME, run_started_at, run_mode, rows)
+        logger.info(f"fact_user_week built ({run_mode}): {rows} rows")
+        return rows
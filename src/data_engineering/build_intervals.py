@@ -0,0 +1,257 @@
+"""
+Survival intervals
+Builds counting-process (start, stop, event) rows per HeroPass period with
+weekly time-varying covariates, emitting a new row only where the
+covariates change, and streams them back as typed column chunks
+"""
+
+from typing import Dict, Iterator, List, Optional, Any
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from .postgres_loader import PostgresLoader
+
+
+logger = setup_logger('build_intervals', log_file='logs/build_intervals.log')
+
+COVARIATES = [
+    'sessions_attended', 'sessions_missed', 'sessions_cancelled',
+    'late_arrivals', 'active_days', 'double_training_days',
+]
+
+INTERVAL_DTYPES = {
+    'start_day': np.int16,
+    'stop_day': np.int16,
+    'event': np.bool_,
+    **{col: np.int16 for col in COVARIATES},
+}
+
+PERIODS_QUERY = """
+    select
+        hp_period_id,
+        user_id,
+        hp_start,
+        hp_end_corrected,
+        next_hp_purchase_dt
+    from ris.core_hp_period
+    where user_id is not null
+      and hp_start < %(as_of)s
+"""
+
+WEEKLY_FACTS_QUERY = f"""
+    select user_id, week_start, {', '.join(COVARIATES)}
+    from ris.fact_user_week
+    where week_start < %(as_of)s
+"""
+
+# Any Monday: week index = weeks since this date
+WEEK_EPOCH = np.datetime64('2000-01-03', 'D')
+
+
+def build_intervals(
+    periods: pd.DataFrame,
+    weekly: pd.DataFrame,
+    followup_days: int,
+    as_of: date
+) -> pd.DataFrame:
+    """
+    Counting-process intervals with run-length compressed covariates
+
+    Time is days since hp_start. Follow-up ends with the next HeroPass
+    purchase (event) if it happens within followup_days after hp_end_corrected
+    and before as_of; otherwise the period is censored at the earlier of the
+    two. Covariates are the facts of the last completed calendar week before
+    the day (the same one-week lag as DeltaFeatureEngine), so an interval never
+    sees activity of the week it is in; consecutive weeks with equal
+    covariates are merged into one interval.
+
+    Args:
+        periods: DataFrame with hp_period_id, user_id, hp_start, hp_end_corrected,
+                 next_hp_purchase_dt
+        weekly: Weekly facts with user_id, week_start and COVARIATES
+        followup_days: Days after hp_end_corrected a renewal still counts
+        as_of: Date the data is observed at
+
+    Returns:
+        DataFrame with hp_period_id, user_id, start_day, stop_day, event, COVARIATES
+    """
+    hp_start = pd.to_datetime(periods['hp_start']).to_numpy(dtype='datetime64[D]')
+    hp_end = pd.to_datetime(periods['hp_end_corrected']).to_numpy(dtype='datetime64[D]')
+    next_purchase = pd.to_datetime(periods['next_hp_purchase_dt']).to_numpy(dtype='datetime64[D]')
+
+    censor_at = np.minimum(hp_end + np.timedelta64(followup_days, 'D'), np.datetime64(as_of, 'D'))
+    event = ~np.isnat(next_purchase) & (next_purchase <= censor_at)
+    stop_at = np.where(event, next_purchase, censor_at)
+    duration = (stop_at - hp_start).astype(np.int64)
+
+    valid = duration > 0
+    hp_start, duration, event = hp_start[valid], duration[valid], event[valid]
+    period_ids = periods['hp_period_id'].to_numpy()[valid]
+    user_ids = periods['user_id'].astype(str).to_numpy()[valid]
+
+    # One row per (period, calendar week) overlapping (0, duration]
+    first_week = np.floor_divide((hp_start - WEEK_EPOCH).astype(np.int64), 7)
+    last_week = np.floor_divide((hp_start + duration.astype('timedelta64[D]') - WEEK_EPOCH).astype(np.int64), 7)
+    n_weeks = last_week - first_week + 1
+
+    row_period = np.repeat(np.arange(len(period_ids)), n_weeks)
+    row_offset = np.arange(n_weeks.sum()) - np.repeat(np.cumsum(n_weeks) - n_weeks, n_weeks)
+    row_week = first_week[row_period] + row_offset
+
+    start_offset = (WEEK_EPOCH - hp_start).astype(np.int64)[row_period]
+    row_start = np.maximum(row_week * 7 + start_offset, 0)
+    row_stop = np.minimum((row_week + 1) * 7 + start_offset, duration[row_period])
+    keep = row_stop > row_start
+    row_period, row_week, row_start, row_stop = (
+        row_period[keep], row_week[keep], row_start[keep], row_stop[keep]
+    )
+
+    # Covariates of each (user, week) are the facts of the previous week;
+    # weeks without facts are zeros
+    facts = weekly[['user_id'] + COVARIATES].copy()
+    facts['user_id'] = facts['user_id'].astype(str)
+    facts['week'] = np.floor_divide(
+        (pd.to_datetime(weekly['week_start']).to_numpy(dtype='datetime64[D]') - WEEK_EPOCH).astype(np.int64), 7
+    ) + 1
+    rows = pd.DataFrame({'user_id': user_ids[row_period], 'week': row_week})
+    covariates = (
+        rows.merge(facts, on=['user_id', 'week'], how='left')[COVARIATES]
+        .fillna(0)
+        .to_numpy(dtype=np.int64)
+    )
+
+    # Run-length compression: a new interval starts with a new period or changed covariates
+    changed = np.ones(len(row_period), dtype=bool)
+    if len(row_period) > 1:
+        changed[1:] = (row_period[1:] != row_period[:-1]) | (covariates[1:] != covariates[:-1]).any(axis=1)
+    run_first = np.flatnonzero(changed)
+    run_last = np.append(run_first[1:] - 1, len(row_period) - 1).astype(np.int64)
+
+    run_period = row_period[run_first]
+    is_period_end = np.append(run_period[1:] != run_period[:-1], True) if len(run_period) else np.array([], bool)
+
+    intervals = pd.DataFrame({
+        'hp_period_id': period_ids[run_period],
+        'user_id': user_ids[run_period],
+        'start_day': row_start[run_first],
+        'stop_day': row_stop[run_last],
+        'event': event[run_period] & is_period_end,
+    })
+    intervals[COVARIATES] = covariates[run_first]
+
+    logger.info(
+        f"{len(period_ids)} periods: {len(row_period)} period-weeks compressed "
+        f"into {len(intervals)} intervals"
+    )
+    return intervals.astype(INTERVAL_DTYPES)
+
+
+class IntervalBuilder:
+    """Build ris.interval_hp and stream it back for survival training"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        followup_days: Optional[int] = None,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize builder
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            followup_days: Renewal window after hp_end_corrected
+                           (default: the longest model.target_windows)
+            config: Loaded config (default: config/config.yaml)
+        """
+        if followup_days is None:
+            config = config if config is not None else load_config()
+            followup_days = max(config['model']['target_windows'])
+
+        self.pg = postgres_connector
+        self.loader = PostgresLoader(postgres_connector)
+        self.schema = postgres_connector.schema
+        self.followup_days = int(followup_days)
+
+    def build(self, as_of: Optional[date] = None) -> int:
+        """
+        Rebuild ris.interval_hp
+
+        Args:
+            as_of: Observation date (default: today)
+
+        Returns:
+            Number of loaded intervals
+        """
+        as_of = as_of or date.today()
+        params = {'as_of': as_of}
+
+        periods = pd.read_sql(PERIODS_QUERY, self.pg.engine, params=params)
+        weekly = pd.read_sql(WEEKLY_FACTS_QUERY, self.pg.engine, params=params)
+        intervals = build_intervals(periods, weekly, self.followup_days, as_of)
+
+        with self.pg.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"TRUNCATE TABLE {self.schema}.interval_hp;")
+                self.loader.copy_dataframe(intervals, f"{self.schema}.interval_hp", cursor)
+
+        return len(intervals)
+
+    def iter_chunks(
+        self,
+        chunk_rows: int = 200000,
+        columns: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Stream intervals as typed column arrays
+
+        A server-side cursor reads chunk_rows rows at a time, so memory holds one
+        chunk of compact (int16 / bool) columns instead of the whole table.
+
+        Args:
+            chunk_rows: Rows per chunk
+            columns: Columns to read (default: all)
+
+        Yields:
+            Dictionary column -> numpy array
+        """
+        columns = columns or ['hp_period_id', 'user_id'] + list(INTERVAL_DTYPES)
+        query = f"""
+            SELECT {', '.join(columns)}
+            FROM {self.schema}.interval_hp
+            ORDER BY hp_period_id, start_day;
+        """
+
+        with self.pg.get_connection(cursor_factory=None) as conn:
+            with conn.cursor(name='interval_hp_stream') as cursor:
+                cursor.itersize = chunk_rows
+                cursor.execute(query)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    values = list(zip(*rows))
+                    yield {
+                        col: np.asarray(values[i], dtype=INTERVAL_DTYPES.get(col, object))
+                        for i, col in enumerate(columns)
+                    }
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read all intervals into a compactly typed DataFrame (e.g. for CoxTimeVaryingFitter)
+
+        Args:
+            columns: Columns to read (default: all)
+
+        Returns:
+            DataFrame with int16 / bool columns
+        """
+        chunks = [pd.DataFrame(chunk) for chunk in self.iter_chunks(columns=columns)]
+        if not chunks:
+            return pd.DataFrame(columns=columns or ['hp_period_id', 'user_id'] + list(INTERVAL_DTYPES))
+        return pd.concat(chunks, ignore_index=True)
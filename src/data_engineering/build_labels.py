@@ -0,0 +1,181 @@
+"""
+HeroPass renewal labels
+Computes renewal targets for all model.target_windows at once from
+ris.core_hp_period and loads them into ris.label_hp
+"""
+
+from typing import List, Optional, Sequence, Any, Dict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from .postgres_loader import PostgresLoader
+
+
+logger = setup_logger('build_labels', log_file='logs/build_labels.log')
+
+LABEL_COLUMNS = [
+    'hp_period_id', 'window_days', 'user_id', 'hp_end_corrected', 'window_end',
+    'next_hp_purchase_dt', 'days_to_next_hp', 'renewed', 'is_censored', 'label_as_of',
+]
+
+# Periods without labels yet, with a label that is still censored,
+# or rebuilt in core_hp_period after they were labeled
+OPEN_PERIODS_QUERY = """
+    select
+        p.hp_period_id,
+        p.user_id,
+        p.hp_end_corrected,
+        p.next_hp_purchase_dt,
+        p.days_to_next_hp
+    from ris.core_hp_period p
+    left join (
+        select
+            hp_period_id,
+            bool_or(is_censored) as has_open_window,
+            min(updated_at) as labeled_at
+        from ris.label_hp
+        group by hp_period_id
+    ) l
+      on l.hp_period_id = p.hp_period_id
+    where %(full)s
+       or l.hp_period_id is null
+       or l.has_open_window
+       or coalesce(p.updated_at, p.created_at) > l.labeled_at
+"""
+
+STALE_LABELS_DELETE = """
+    delete from ris.label_hp l
+    where not exists (
+        select 1 from ris.core_hp_period p where p.hp_period_id = l.hp_period_id
+    )
+"""
+
+
+def build_label_matrix(
+    periods: pd.DataFrame,
+    windows: Sequence[int],
+    as_of: date
+) -> pd.DataFrame:
+    """
+    Label every period for every window in one vectorized comparison
+
+    A period is renewed within a window when the next HeroPass was bought no
+    later than window_days after hp_end_corrected and no later than as_of
+    (purchases after as_of are not known yet when relabeling a past date).
+    Without such a purchase the label is False once the window has closed
+    (as_of > window_end), otherwise it is right-censored (renewed is NULL).
+    Periods without hp_end_corrected cannot be labeled and are skipped.
+
+    Args:
+        periods: DataFrame with hp_period_id, user_id, hp_end_corrected,
+                 next_hp_purchase_dt, days_to_next_hp
+        windows: Window lengths in days
+        as_of: Date the labels are computed for
+
+    Returns:
+        DataFrame with LABEL_COLUMNS, one row per period and window
+    """
+    window_days = np.asarray(sorted(windows), dtype=np.int64)
+
+    # NaT would turn into a huge negative day count below
+    has_end = pd.to_datetime(periods['hp_end_corrected']).notna().to_numpy()
+    if not has_end.all():
+        logger.warning(f"Skipping {(~has_end).sum()} periods without hp_end_corrected")
+        periods = periods[has_end]
+
+    hp_end = pd.to_datetime(periods['hp_end_corrected']).to_numpy(dtype='datetime64[D]')
+    days_to_next = pd.to_numeric(periods['days_to_next_hp']).to_numpy(dtype=float, na_value=np.nan)
+    elapsed = (np.datetime64(as_of, 'D') - hp_end).astype(np.int64)
+
+    # (periods x windows) comparison matrices; NaN days never compare True
+    purchase_known = days_to_next <= elapsed
+    renewed_in_window = purchase_known[:, None] & (days_to_next[:, None] <= window_days[None, :])
+    window_closed = elapsed[:, None] > window_days[None, :]
+    censored = ~renewed_in_window & ~window_closed
+
+    n_periods, n_windows = renewed_in_window.shape
+    labels = pd.DataFrame({
+        'hp_period_id': np.repeat(periods['hp_period_id'].to_numpy(), n_windows),
+        'window_days': np.tile(window_days, n_periods),
+        'user_id': np.repeat(periods['user_id'].to_numpy(), n_windows),
+        'hp_end_corrected': np.repeat(hp_end, n_windows),
+        'next_hp_purchase_dt': np.repeat(periods['next_hp_purchase_dt'].to_numpy(), n_windows),
+        'days_to_next_hp': np.repeat(periods['days_to_next_hp'].to_numpy(), n_windows),
+        'renewed': pd.array(renewed_in_window.ravel(), dtype='boolean'),
+        'is_censored': censored.ravel(),
+    })
+    labels.loc[labels['is_censored'], 'renewed'] = pd.NA
+    labels['window_end'] = labels['hp_end_corrected'] + pd.to_timedelta(labels['window_days'], unit='D')
+    labels['hp_end_corrected'] = labels['hp_end_corrected'].dt.date
+    labels['window_end'] = labels['window_end'].dt.date
+    labels['days_to_next_hp'] = labels['days_to_next_hp'].astype('Int64')
+    labels['label_as_of'] = as_of
+
+    return labels[LABEL_COLUMNS]
+
+
+class LabelBuilder:
+    """Build ris.label_hp from ris.core_hp_period"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        windows: Optional[List[int]] = None,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize builder
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            windows: Target windows in days (default: model.target_windows from config.yaml)
+            config: Loaded config (default: config/config.yaml)
+        """
+        if windows is None:
+            config = config if config is not None else load_config()
+            windows = config['model']['target_windows']
+
+        self.pg = postgres_connector
+        self.loader = PostgresLoader(postgres_connector)
+        self.windows = sorted(int(w) for w in windows)
+
+    def build(self, as_of: Optional[date] = None, full: bool = False) -> int:
+        """
+        Label periods whose status can still change and upsert them
+
+        Labels of periods no longer in core_hp_period are deleted first.
+
+        Args:
+            as_of: Label date (default: today)
+            full: Relabel every period
+
+        Returns:
+            Number of upserted label rows
+        """
+        as_of = as_of or date.today()
+
+        # On every run: incremental core_hp_period loads delete periods removed at the source
+        with self.pg.get_cursor() as cursor:
+            cursor.execute(STALE_LABELS_DELETE)
+            logger.info(f"Deleted {cursor.rowcount} labels of periods missing in core_hp_period")
+
+        periods = pd.read_sql(OPEN_PERIODS_QUERY, self.pg.engine, params={'full': full})
+        logger.info(f"Periods to label: {len(periods)} (full={full}, as_of={as_of})")
+        if periods.empty:
+            return 0
+
+        labels = build_label_matrix(periods, self.windows, as_of)
+        labels['updated_at'] = pd.Timestamp.now()
+
+        rows = self.loader.copy_upsert_dataframe(labels, 'label_hp', ['hp_period_id', 'window_days'])
+
+        censored = labels['is_censored'].groupby(labels['window_days']).mean()
+        for window, share in censored.items():
+            logger.info(f"Window {window}d: censored {share:.1%}")
+
+        return rows
@@ -0,0 +1,237 @@
+"""
+Mart build orchestration
+Declares mart build steps with their dependencies, runs independent steps in
+parallel and resumes a failed run from the steps that did not succeed
+"""
+
+import sys
+import time
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional, Tuple
+
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from .meta_store import MetaStore
+
+
+logger = setup_logger('mart_pipeline', log_file='logs/mart_pipeline.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+
+@dataclass
+class MartStep:
+    """One mart build step: scripts run in order, after all dependencies succeeded"""
+
+    name: str
+    commands: List[List[str]]
+    depends_on: List[str] = field(default_factory=list)
+
+
+# Scripts are relative to the project root; a step fails on the first
+# command that exits with a non-zero status.
+MART_STEPS = [
+    MartStep('ref_calendar', [['scripts/management/populate_ref_calendar.py']]),
+    MartStep('ref_club_history', [['scripts/management/populate_ref_club_history.py']]),
+    MartStep('ref_user_clan', [['scripts/management/populate_ref_user_clan.py']]),
+    MartStep(
+        'location_metrics',
+        [['scripts/calculate_location_metrics.py']],
+        depends_on=['ref_club_history']
+    ),
+    MartStep(
+        'core_hp_period',
+        [['scripts/management/populate_core_hp_period.py', '--incremental']],
+        depends_on=['ref_club_history']
+    ),
+    MartStep(
+        'label_hp',
+        [['scripts/management/populate_label_hp.py']],
+        depends_on=['core_hp_period']
+    ),
+    MartStep(
+        'fact_user_week',
+        [['scripts/management/populate_fact_user_week.py', '--incremental']]
+    ),
+    MartStep(
+        'interval_hp',
+        [['scripts/management/populate_interval_hp.py']],
+        depends_on=['core_hp_period', 'fact_user_week']
+    ),
+    # Besides raw-table changes, --incremental picks up users whose location
+    # metrics changed and recomputes everyone after a club history edit
+    MartStep(
+        'core_user',
+        [['scripts/management/populate_core_user.py', '--incremental']],
+        depends_on=['location_metrics', 'ref_user_clan', 'ref_club_history']
+    ),
+]
+
+
+class MartPipeline:
+    """Run mart build steps as a dependency graph with per-step status tracking"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        steps: List[MartStep] = MART_STEPS,
+        pipeline_name: str = 'marts',
+        max_workers: int = 4
+    ):
+        """
+        Initialize pipeline
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            steps: Step declarations
+            pipeline_name: Pipeline name in ris.meta_pipeline_run
+            max_workers: Maximum number of steps running at once
+        """
+        self.meta = MetaStore(postgres_connector)
+        self.steps = {step.name: step for step in steps}
+        self.pipeline_name = pipeline_name
+        self.max_workers = max_workers
+        self.log_dir = PROJECT_ROOT / 'logs' / pipeline_name
+
+        self._validate()
+
+    def _validate(self):
+        """Check that dependencies exist and the graph has no cycles"""
+        for step in self.steps.values():
+            unknown = [dep for dep in step.depends_on if dep not in self.steps]
+            if unknown:
+                raise ValueError(f"Step {step.name} depends on unknown steps: {unknown}")
+
+        # Kahn's algorithm: every step must eventually have all dependencies resolved
+        resolved = set()
+        remaining = dict(self.steps)
+        while remaining:
+            ready = [name for name, step in remaining.items()
+                     if all(dep in resolved for dep in step.depends_on)]
+            if not ready:
+                raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+            for name in ready:
+                resolved.add(name)
+                del remaining[name]
+
+    def _select(self, targets: Optional[List[str]]) -> List[str]:
+        """Selected steps plus everything they depend on"""
+        if not targets:
+            return list(self.steps)
+
+        selected = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.steps:
+                raise ValueError(f"Unknown step: {name}")
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.steps[name].depends_on)
+        return [name for name in self.steps if name in selected]
+
+    def _run_step(self, run_id: str, step: MartStep) -> Tuple[bool, float, Optional[str]]:
+        """
+        Run all commands of a step, writing their output to a per-step log
+
+        Returns:
+            (succeeded, duration in seconds, tail of the output on failure)
+        """
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        log_path = self.log_dir / f"{run_id}_{step.name}.log"
+
+        started = time.monotonic()
+        with open(log_path, 'w', encoding='utf-8') as log_file:
+            for command in step.commands:
+                script, *args = command
+                log_file.write(f"$ {script} {' '.join(args)}\n")
+                log_file.flush()
+                result = subprocess.run(
+                    [sys.executable, str(PROJECT_ROOT / script), *args],
+                    cwd=PROJECT_ROOT,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT
+                )
+                if result.returncode != 0:
+                    duration = time.monotonic() - started
+                    tail = log_path.read_text(encoding='utf-8').splitlines()[-20:]
+                    return False, duration, '\n'.join(tail)
+
+        return True, time.monotonic() - started, None
+
+    def run(self, targets: Optional[List[str]] = None, resume: bool = False) -> Dict[str, str]:
+        """
+        Run the pipeline
+
+        Independent steps run concurrently. When a step fails, its dependents are
+        marked as skipped while unrelated branches keep running.
+
+        Args:
+            targets: Steps to build (with their dependencies); None builds everything
+            resume: Continue the last run, re-running only steps that did not succeed
+
+        Returns:
+            Dictionary step_name -> final status
+        """
+        selected = self._select(targets)
+
+        statuses: Dict[str, str] = {}
+        run_id = None
+        if resume:
+            run_id = self.meta.get_last_run_id(self.pipeline_name)
+            if run_id:
+                previous = self.meta.get_step_statuses(run_id)
+                statuses = {name: 'success' for name in selected if previous.get(name) == 'success'}
+                logger.info(f"Resuming run {run_id}, already succeeded: {sorted(statuses)}")
+
+        if run_id is None:
+            run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        logger.info(f"Pipeline {self.pipeline_name} run {run_id}: steps {selected}")
+
+        pending = [name for name in selected if name not in statuses]
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Skip steps whose dependencies can no longer succeed
+                for name in list(pending):
+                    deps = self.steps[name].depends_on
+                    if any(statuses.get(dep) in ('failed', 'skipped') for dep in deps):
+                        pending.remove(name)
+                        statuses[name] = 'skipped'
+                        self.meta.finish_step(self.pipeline_name, run_id, name, 'skipped')
+
+                ready = [name for name in pending
+                         if all(statuses.get(dep) == 'success' for dep in self.steps[name].depends_on)]
+                for name in ready:
+                    pending.remove(name)
+                    self.meta.start_step(self.pipeline_name, run_id, name)
+                    logger.info(f"Starting step {name}")
+                    running[executor.submit(self._run_step, run_id, self.steps[name])] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        succeeded, duration, error = future.result()
+                    except Exception as e:
+                        succeeded, duration, error = False, None, str(e)
+
+                    statuses[name] = 'success' if succeeded else 'failed'
+                    self.meta.finish_step(
+                        self.pipeline_name, run_id, name, statuses[name],
+                        round(duration, 2) if duration is not None else None, error
+                    )
+                    if succeeded:
+                        logger.info(f"Step {name} finished in {duration:.1f}s")
+                    else:
+                        logger.error(f"Step {name} failed, see {self.log_dir / f'{run_id}_{name}.log'}")
+
+        return statuses
@@ -0,0 +1,190 @@
+"""
+Service (meta) tables access
+Reads and writes incremental load watermarks and pipeline step runs in ris.meta_* tables
+"""
+
+from typing import Optional, Dict
+from datetime import datetime
+
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+
+
+logger = setup_logger('meta_store', log_file='logs/meta_store.log')
+
+
+class MetaStore:
+    """Access to RIS service tables (load watermarks, pipeline step runs)"""
+
+    def __init__(self, postgres_connector: PostgresConnector):
+        """
+        Initialize meta store
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+        """
+        self.pg = postgres_connector
+        self.schema = postgres_connector.schema
+
+    def db_now(self) -> datetime:
+        """
+        Get current timestamp from the database clock
+
+        Watermarks are taken from the database rather than the local clock,
+        so they compare consistently with timestamps written by the sources.
+
+        Returns:
+            Current database timestamp
+        """
+        result = self.pg.execute_query("SELECT NOW()::timestamp AS now;")
+        return result[0]['now']
+
+    def get_watermark(self, job_name: str) -> Optional[datetime]:
+        """
+        Get watermark of the last successful run
+
+        Args:
+            job_name: Job name (e.g. 'core_user')
+
+        Returns:
+            Watermark timestamp or None if the job has never run
+        """
+        query = f"""
+            SELECT watermark
+            FROM {self.schema}.meta_etl_watermark
+            WHERE job_name = %s;
+        """
+        result = self.pg.execute_query(query, (job_name,))
+        return result[0]['watermark'] if result else None
+
+    def set_watermark(
+        self,
+        job_name: str,
+        watermark: datetime,
+        run_mode: str,
+        rows_affected: Optional[int] = None
+    ):
+        """
+        Record watermark of a successful run
+
+        Args:
+            job_name: Job name (e.g. 'core_user')
+            watermark: Timestamp the run started at (changes after it are not covered)
+            run_mode: 'full' or 'incremental'
+            rows_affected: Number of rows recomputed by the run
+        """
+        query = f"""
+            INSERT INTO {self.schema}.meta_etl_watermark (
+                job_name, watermark, run_mode, rows_affected
+            ) VALUES (%s, %s, %s, %s)
+            ON CONFLICT (job_name) DO UPDATE SET
+                watermark = EXCLUDED.watermark,
+                run_mode = EXCLUDED.run_mode,
+                rows_affected = EXCLUDED.rows_affected,
+                updated_at = NOW();
+        """
+        with self.pg.get_cursor() as cursor:
+            cursor.execute(query, (job_name, watermark, run_mode, rows_affected))
+
+        logger.info(f"Watermark for {job_name} set to {watermark} ({run_mode}, rows={rows_affected})")
+
+    def start_step(self, pipeline_name: str, run_id: str, step_name: str):
+        """
+        Mark pipeline step as running (resets a previous attempt of the same run)
+
+        Args:
+            pipeline_name: Pipeline name (e.g. 'marts')
+            run_id: Pipeline run ID
+            step_name: Step name
+        """
+        query = f"""
+            INSERT INTO {self.schema}.meta_pipeline_run (
+                run_id, step_name, pipeline_name, status, started_at
+            ) VALUES (%s, %s, %s, 'running', NOW())
+            ON CONFLICT (run_id, step_name) DO UPDATE SET
+                status = 'running',
+                started_at = NOW(),
+                finished_at = NULL,
+                duration_sec = NULL,
+                error_message = NULL,
+                updated_at = NOW();
+        """
+        with self.pg.get_cursor() as cursor:
+            cursor.execute(query, (run_id, step_name, pipeline_name))
+
+    def finish_step(
+        self,
+        pipeline_name: str,
+        run_id: str,
+        step_name: str,
+        status: str,
+        duration_sec: Optional[float] = None,
+        error_message: Optional[str] = None
+    ):
+        """
+        Record final status of a pipeline step
+
+        Args:
+            pipeline_name: Pipeline name (e.g. 'marts')
+            run_id: Pipeline run ID
+            step_name: Step name
+            status: 'success', 'failed' or 'skipped'
+            duration_sec: Step duration in seconds
+            error_message: Tail of the step output on failure
+        """
+        query = f"""
+            INSERT INTO {self.schema}.meta_pipeline_run (
+                run_id, step_name, pipeline_name, status, finished_at,
+                duration_sec, error_message
+            ) VALUES (%s, %s, %s, %s, NOW(), %s, %s)
+            ON CONFLICT (run_id, step_name) DO UPDATE SET
+                status = EXCLUDED.status,
+                finished_at = EXCLUDED.finished_at,
+                duration_sec = EXCLUDED.duration_sec,
+                error_message = EXCLUDED.error_message,
+                updated_at = NOW();
+        """
+        with self.pg.get_cursor() as cursor:
+            cursor.execute(
+                query,
+                (run_id, step_name, pipeline_name, status, duration_sec, error_message)
+            )
+
+        logger.info(f"[{pipeline_name}/{run_id}] step {step_name}: {status}")
+
+    def get_last_run_id(self, pipeline_name: str) -> Optional[str]:
+        """
+        Get ID of the most recent run of a pipeline
+
+        Args:
+            pipeline_name: Pipeline name
+
+        Returns:
+            Run ID or None if the pipeline has never run
+        """
+        query = f"""
+            SELECT run_id
+            FROM {self.schema}.meta_pipeline_run
+            WHERE pipeline_name = %s
+            ORDER BY created_at DESC
+            LIMIT 1;
+        """
+        result = self.pg.execute_query(query, (pipeline_name,))
+        return result[0]['run_id'] if result else None
+
+    def get_step_statuses(self, run_id: str) -> Dict[str, str]:
+        """
+        Get status of every recorded step of a run
+
+        Args:
+            run_id: Pipeline run ID
+
+        Returns:
+            Dictionary step_name -> status
+        """
+        query = f"""
+            SELECT step_name, status
+            FROM {self.schema}.meta_pipeline_run
+            WHERE run_id = %s;
+        """
+        return {row['step_name']: row['status'] for row in self.pg.execute_query(query, (run_id,))}
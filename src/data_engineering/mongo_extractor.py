@@ -3,7 +3,8 @@ MongoDB data extractor
 Extracts raw data from MongoDB and prepares for PostgreSQL marts
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator
+from itertools import islice
 import pandas as pd
 from datetime import datetime
 from tqdm import tqdm
@@ -119,6 +120,62 @@ class MongoExtractor:
 
         return df
 
+    def iter_sessions(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        query: Optional[Dict] = None,
+        projection: Optional[Dict] = None,
+        batch_size: int = 50000,
+        collection_name: str = 'sessions',
+        date_field: str = 'date'
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream session/workout data from MongoDB in chunks sorted by date
+
+        Unlike extract_sessions, documents are never all held in memory:
+        each chunk is yielded as a DataFrame once batch_size documents are read.
+
+        Args:
+            start_date: Start date filter (inclusive)
+            end_date: End date filter (exclusive)
+            query: Additional query filters
+            projection: Fields to include/exclude
+            batch_size: Number of documents per chunk
+            collection_name: Sessions collection
+            date_field: Session start field used for the date filter and sort
+
+        Yields:
+            DataFrames with at most batch_size sessions each
+        """
+        logger.info(f"Streaming sessions from {start_date} to {end_date}")
+
+        collection = self.mongo.get_collection(collection_name)
+
+        query = dict(query or {})
+        if start_date or end_date:
+            query[date_field] = {}
+            if start_date:
+                query[date_field]['$gte'] = start_date
+            if end_date:
+                query[date_field]['$lt'] = end_date
+
+        cursor = (
+            collection.find(query, projection)
+            .sort(date_field, 1)
+            .batch_size(batch_size)
+        )
+
+        total = 0
+        while True:
+            docs = list(islice(cursor, batch_size))
+            if not docs:
+                break
+            total += len(docs)
+            yield pd.DataFrame(docs)
+
+        logger.info(f"Streamed {total} sessions")
+
     def extract_heropasses(self, query: Optional[Dict] = None) -> pd.DataFrame:
         """
         Extract HeroPass data from MongoDB
@@ -3,6 +3,7 @@ PostgreSQL data loader
 Loads data into PostgreSQL marts
 """
 
+import io
 from typing import Optional, Dict, Any
 import pandas as pd
 from sqlalchemy import text
@@ -136,6 +137,77 @@ class PostgresLoader:
 
         logger.info(f"Successfully upserted {len(df)} rows into {self.schema}.{table_name}")
 
+    def copy_upsert_dataframe(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        unique_columns: list,
+        update_columns: Optional[list] = None
+    ) -> int:
+        """
+        Upsert DataFrame via COPY into a temp table and a single INSERT ... ON CONFLICT
+
+        Unlike upsert_dataframe, rows are streamed with COPY (no per-row INSERTs)
+        and the temp table lives only inside the transaction.
+
+        Args:
+            df: DataFrame to upsert
+            table_name: Target table name
+            unique_columns: Columns that form unique constraint
+            update_columns: Columns to update on conflict (if None, update all except unique)
+
+        Returns:
+            Number of inserted or updated rows
+        """
+        logger.info(f"COPY-upserting {len(df)} rows into {self.schema}.{table_name}")
+
+        if update_columns is None:
+            update_columns = [col for col in df.columns if col not in unique_columns]
+
+        temp_table = f"{table_name}_stage"
+        columns_str = ', '.join(df.columns)
+        unique_str = ', '.join(unique_columns)
+        update_str = ', '.join([f"{col} = EXCLUDED.{col}" for col in update_columns])
+        conflict_action = f"DO UPDATE SET {update_str}" if update_columns else "DO NOTHING"
+
+        with self.pg.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMP TABLE {temp_table} "
+                    f"(LIKE {self.schema}.{table_name} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                self.copy_dataframe(df, temp_table, cursor)
+                cursor.execute(f"""
+                    INSERT INTO {self.schema}.{table_name} ({columns_str})
+                    SELECT {columns_str} FROM {temp_table}
+                    ON CONFLICT ({unique_str})
+                    {conflict_action}
+                """)
+                rows_affected = cursor.rowcount
+
+        logger.info(f"Successfully upserted {rows_affected} rows into {self.schema}.{table_name}")
+        return rows_affected
+
+    @staticmethod
+    def copy_dataframe(df: pd.DataFrame, qualified_table: str, cursor):
+        """
+        Stream DataFrame into a table with COPY ... FROM STDIN (CSV)
+
+        Args:
+            df: DataFrame to copy (column names must match the table)
+            qualified_table: Target table (schema-qualified or temp table)
+            cursor: psycopg2 cursor of the caller's transaction
+        """
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        columns_str = ', '.join(df.columns)
+        cursor.copy_expert(
+            f"COPY {qualified_table} ({columns_str}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
     def get_table_row_count(self, table_name: str) -> int:
         """
         Get row count from table
@@ -0,0 +1,194 @@
+"""
+Calendar lookups
+ris.ref_calendar loaded into NumPy arrays indexed by day ordinal (re-read
+after CALENDAR_MAX_AGE_SECONDS, so long-running processes see new days);
+bulk per-date lookups by array indexing and per-interval counts by prefix sums
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+
+
+logger = setup_logger('calendar', log_file='logs/calendar.log')
+
+CALENDAR_QUERY = """
+    SELECT dt, dow, is_weekend, is_holiday_kz, is_school_break, month, season_label
+    FROM ris.ref_calendar
+    ORDER BY dt;
+"""
+
+FLAG_COLUMNS = ['is_weekend', 'is_holiday_kz', 'is_school_break']
+SEASONS = ['winter', 'spring', 'summer', 'autumn']
+
+# Age after which get_calendar re-reads ris.ref_calendar
+CALENDAR_MAX_AGE_SECONDS = 3600
+
+# One calendar per database (host, port, database, schema), however many
+# connectors, with the monotonic time it was loaded at
+_calendar_cache: Dict[Tuple[str, str, str, str], Tuple[float, 'CalendarLookup']] = {}
+
+
+class CalendarLookup:
+    """
+    Calendar attributes as arrays indexed by (date - first_date) in days
+
+    Flag columns also keep prefix sums, so the number of flagged days in any
+    [start, end] interval is a difference of two array reads.
+    """
+
+    def __init__(self, calendar: pd.DataFrame):
+        """
+        Initialize lookup
+
+        Args:
+            calendar: ref_calendar rows (dt, dow, is_weekend, is_holiday_kz,
+                      is_school_break, month, season_label)
+        """
+        dates = pd.to_datetime(calendar['dt']).to_numpy(dtype='datetime64[D]')
+        self.first_date = dates.min()
+        self.n_days = int((dates.max() - self.first_date).astype(np.int64)) + 1
+        index = (dates - self.first_date).astype(np.int64)
+
+        # Dates missing in ref_calendar stay unknown (dow 0, season -1, flags False)
+        self.known = np.zeros(self.n_days, dtype=bool)
+        self.known[index] = True
+        self.dow = np.zeros(self.n_days, dtype=np.int8)
+        self.dow[index] = calendar['dow'].to_numpy()
+        self.month = np.zeros(self.n_days, dtype=np.int8)
+        self.month[index] = calendar['month'].to_numpy()
+        self.season = np.full(self.n_days, -1, dtype=np.int8)
+        self.season[index] = pd.Categorical(calendar['season_label'], categories=SEASONS).codes
+
+        self.flags: Dict[str, np.ndarray] = {}
+        self.prefix: Dict[str, np.ndarray] = {}
+        for col in FLAG_COLUMNS:
+            flag = np.zeros(self.n_days, dtype=bool)
+            flag[index] = calendar[col].fillna(False).to_numpy(dtype=bool)
+            self.flags[col] = flag
+            self.prefix[col] = np.concatenate([[0], np.cumsum(flag, dtype=np.int32)])
+
+        missing = self.n_days - int(self.known.sum())
+        if missing:
+            logger.warning(f"ref_calendar has {missing} missing dates between {self.first_date} and {dates.max()}")
+
+    @classmethod
+    def from_db(cls, postgres_connector: PostgresConnector) -> 'CalendarLookup':
+        """Load ris.ref_calendar"""
+        return cls(pd.read_sql(CALENDAR_QUERY, postgres_connector.engine))
+
+    def day_index(self, dates) -> np.ndarray:
+        """
+        Day ordinals of dates (-1 outside the calendar)
+
+        Args:
+            dates: Array-like of dates / datetimes
+
+        Returns:
+            int64 array
+        """
+        days = (pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]') - self.first_date)
+        index = days.astype(np.int64)
+        index[(index < 0) | (index >= self.n_days) | np.isnat(days)] = -1
+        return index
+
+    def flag(self, dates, column: str) -> np.ndarray:
+        """
+        Flag value per date (False outside the calendar)
+
+        Args:
+            dates: Array-like of dates
+            column: One of FLAG_COLUMNS
+
+        Returns:
+            bool array
+        """
+        index = self.day_index(dates)
+        return np.where(index >= 0, self.flags[column][np.maximum(index, 0)], False)
+
+    def season_of(self, dates) -> np.ndarray:
+        """Season code per date (index in SEASONS, -1 unknown)"""
+        index = self.day_index(dates)
+        return np.where(index >= 0, self.season[np.maximum(index, 0)], -1).astype(np.int8)
+
+    def count_between(self, start_dates, end_dates, column: str) -> np.ndarray:
+        """
+        Number of flagged days in each inclusive [start, end] interval
+
+        Intervals are clipped to the calendar range; empty intervals give 0.
+
+        Args:
+            start_dates: Interval starts
+            end_dates: Interval ends (inclusive)
+            column: One of FLAG_COLUMNS
+
+        Returns:
+            int array, e.g. holidays inside each HeroPass window
+        """
+        start = self._clip(start_dates)
+        end = self._clip(end_dates, offset=1)
+        end = np.maximum(end, start)
+        prefix = self.prefix[column]
+        return prefix[end] - prefix[start]
+
+    def share(self, dates, column: str, groups=None) -> pd.Series:
+        """
+        Share of flagged dates, overall or per group
+
+        Args:
+            dates: Array-like of dates (e.g. session dates)
+            column: One of FLAG_COLUMNS
+            groups: Optional group labels of the same length (e.g. user_id)
+
+        Returns:
+            Series indexed by group (or a single 'all' row)
+        """
+        flags = self.flag(dates, column).astype(np.float64)
+        if groups is None:
+            return pd.Series({'all': flags.mean() if len(flags) else np.nan})
+
+        codes, labels = pd.factorize(pd.Series(groups))
+        # Dates without a group (code -1) are left out, as groupby does
+        grouped = codes >= 0
+        counts = np.bincount(codes[grouped], minlength=len(labels))
+        hits = np.bincount(codes[grouped], weights=flags[grouped], minlength=len(labels))
+        return pd.Series(hits / counts, index=labels)
+
+    def _clip(self, dates, offset: int = 0) -> np.ndarray:
+        """Prefix-sum positions of dates clipped to [0, n_days]"""
+        days = (pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]') - self.first_date)
+        return np.clip(days.astype(np.int64) + offset, 0, self.n_days)
+
+
+def get_calendar(
+    postgres_connector: PostgresConnector,
+    reload: bool = False,
+    max_age_seconds: float = CALENDAR_MAX_AGE_SECONDS
+) -> CalendarLookup:
+    """
+    Calendar lookup of a database, re-read once it is older than max_age_seconds
+
+    Args:
+        postgres_connector: PostgreSQL connector instance
+        reload: Re-read ris.ref_calendar
+        max_age_seconds: Age after which the cached calendar is re-read
+
+    Returns:
+        CalendarLookup
+    """
+    key = tuple(str(part) for part in (
+        postgres_connector.host, postgres_connector.port,
+        postgres_connector.database, postgres_connector.schema
+    ))
+    now = time.monotonic()
+    cached = _calendar_cache.get(key)
+    if reload or cached is None or now - cached[0] > max_age_seconds:
+        cached = (now, CalendarLookup.from_db(postgres_connector))
+        _calendar_cache[key] = cached
+        logger.info(f"Loaded ref_calendar: {cached[1].n_days} days")
+    return cached[1]
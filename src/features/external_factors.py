@@ -0,0 +1,298 @@
+"""
+External factors (behavior deltas)
+Rolling-window means of weekly facts and their deltas against each user's
+own baseline, computed for all users in one vectorized pass
+"""
+
+from itertools import chain
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Any
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.logger import setup_logger
+
+
+logger = setup_logger('external_factors', log_file='logs/external_factors.log')
+
+# Delta feature prefix -> ris.fact_user_week column
+DELTA_METRICS = {
+    'engagement': 'sessions_attended',
+    'missed': 'sessions_missed',
+    'cancellation': 'sessions_cancelled',
+    'late_arrivals': 'late_arrivals',
+    'double_trainings': 'double_training_days',
+    'active_days': 'active_days',
+    'trainers_variety': 'distinct_trainers',
+    'trainings_variety': 'distinct_trainings',
+}
+
+# Any Monday: week index = weeks since this date
+WEEK_EPOCH = pd.Timestamp('2000-01-03')
+
+
+@dataclass
+class FeatureMatrix:
+    """Feature values as a float32 matrix with one row per (user_id, as_of_date) key"""
+
+    keys: pd.DataFrame
+    values: np.ndarray
+    feature_names: List[str]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Keys and features as one DataFrame"""
+        features = pd.DataFrame(self.values, columns=self.feature_names, index=self.keys.index)
+        return pd.concat([self.keys, features], axis=1)
+
+
+def week_index(dates: pd.Series) -> np.ndarray:
+    """Number of whole weeks between WEEK_EPOCH and each date"""
+    days = (pd.to_datetime(dates) - WEEK_EPOCH).dt.days.to_numpy()
+    return np.floor_divide(days, 7)
+
+
+class DeltaFeatureEngine:
+    """
+    Rolling and delta features over weekly facts
+
+    Facts are laid out as one contiguous block of weeks per user (weeks without
+    a fact row are zeros), so every window is a difference of two cumulative
+    sums at segment-clipped offsets.
+    """
+
+    def __init__(
+        self,
+        metrics: Dict[str, str] = DELTA_METRICS,
+        recent_weeks: Sequence[int] = (1, 4),
+        baseline_weeks: int = 12,
+        min_baseline_weeks: int = 4
+    ):
+        """
+        Initialize engine
+
+        Args:
+            metrics: Feature prefix -> weekly fact column
+            recent_weeks: Lengths of recent windows, weeks
+            baseline_weeks: Length of the baseline window before the longest recent window
+            min_baseline_weeks: Minimum weeks in the baseline window for a non-NaN baseline
+        """
+        self.metrics = dict(metrics)
+        self.recent_weeks = sorted(int(w) for w in recent_weeks)
+        self.baseline_weeks = int(baseline_weeks)
+        self.min_baseline_weeks = int(min_baseline_weeks)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None, **kwargs) -> 'DeltaFeatureEngine':
+        """
+        Create engine with windows from features.delta_windows of config.yaml
+
+        Args:
+            config: Loaded config (default: config/config.yaml)
+            **kwargs: Overrides of constructor arguments
+        """
+        config = config if config is not None else load_config()
+        windows = config.get('features', {}).get('delta_windows', {})
+        params = {
+            key: windows[key]
+            for key in ('recent_weeks', 'baseline_weeks', 'min_baseline_weeks')
+            if key in windows
+        }
+        params.update(kwargs)
+        return cls(**params)
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Output column names in matrix order"""
+        names = ['weeks_observed']
+        for prefix in self.metrics:
+            names += [f"{prefix}_recent_{w}w" for w in self.recent_weeks]
+            names.append(f"{prefix}_baseline")
+            names += [f"{prefix}_delta_{w}w" for w in self.recent_weeks]
+        return names
+
+    def compute(self, weekly: pd.DataFrame, as_of: Optional[pd.DataFrame] = None) -> FeatureMatrix:
+        """
+        Compute features
+
+        Args:
+            weekly: Weekly facts with user_id, week_start and the metric columns
+            as_of: Requested keys (user_id, as_of_date); windows end with the last
+                   week finished before as_of_date. Default: the end of every fact week.
+
+        Returns:
+            FeatureMatrix keyed by (user_id, as_of_date)
+        """
+        columns = list(self.metrics.values())
+        facts = weekly[['user_id', 'week_start'] + columns]
+
+        user_codes, users = pd.factorize(facts['user_id'], sort=True)
+        fact_week = week_index(facts['week_start'])
+
+        if as_of is None:
+            keys = pd.DataFrame({
+                'user_id': facts['user_id'].to_numpy(),
+                'as_of_date': (pd.to_datetime(facts['week_start']) + pd.Timedelta(days=7)).dt.date,
+            })
+            query_code = user_codes
+            query_week = fact_week
+        else:
+            keys = as_of[['user_id', 'as_of_date']].reset_index(drop=True)
+            query_code = users.get_indexer(keys['user_id'])
+            query_week = week_index(keys['as_of_date']) - 1
+
+        n_users = len(users)
+        n_metrics = len(columns)
+
+        # Contiguous block of weeks per user, from the first fact week to the
+        # last fact week or the last requested week
+        first = np.full(n_users, np.iinfo(np.int64).max)
+        last = np.full(n_users, np.iinfo(np.int64).min)
+        np.minimum.at(first, user_codes, fact_week)
+        np.maximum.at(last, user_codes, fact_week)
+        known = query_code >= 0
+        np.maximum.at(last, query_code[known], query_week[known])
+
+        span = last - first + 1
+        segment_start = np.concatenate([[0], np.cumsum(span)[:-1]])
+
+        dense = np.zeros((int(span.sum()), n_metrics))
+        positions = segment_start[user_codes] + fact_week - first[user_codes]
+        dense[positions] = facts[columns].to_numpy(dtype=float, na_value=0.0)
+
+        cumulative = np.zeros((len(dense) + 1, n_metrics))
+        np.cumsum(dense, axis=0, out=cumulative[1:])
+
+        # Window [lo, hi) in dense positions, clipped to the user's segment
+        code = np.where(known, query_code, 0)
+        seg_lo = segment_start[code]
+        end = np.maximum(segment_start[code] + query_week - first[code] + 1, seg_lo)
+
+        def window(hi: np.ndarray, length: int):
+            lo = np.maximum(hi - length, seg_lo)
+            hi = np.maximum(hi, lo)
+            counts = (hi - lo).astype(float)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = (cumulative[hi] - cumulative[lo]) / counts[:, None]
+            return means, counts
+
+        max_recent = self.recent_weeks[-1]
+        baseline, baseline_counts = window(end - max_recent, self.baseline_weeks)
+        baseline[baseline_counts < self.min_baseline_weeks] = np.nan
+
+        recent = {w: window(end, w)[0] for w in self.recent_weeks}
+
+        blocks = [(end - seg_lo)[:, None].astype(float)]
+        for j in range(n_metrics):
+            blocks += [recent[w][:, j:j + 1] for w in self.recent_weeks]
+            blocks.append(baseline[:, j:j + 1])
+            blocks += [recent[w][:, j:j + 1] - baseline[:, j:j + 1] for w in self.recent_weeks]
+
+        values = np.hstack(blocks).astype(np.float32)
+        # Users without facts observed no weeks; their windows have no mean
+        values[~known] = np.nan
+        values[~known, 0] = 0.0
+
+        logger.info(f"Computed {values.shape[1]} delta features for {len(keys)} keys")
+        return FeatureMatrix(keys=keys, values=values, feature_names=self.feature_names)
+
+
+def hour_histograms(values: pd.Series, bins: int = 24) -> np.ndarray:
+    """
+    Stack weekly hour histograms read from ris.fact_user_week.booking_hours
+
+    Args:
+        values: Lists (as returned by psycopg2), '{..}' literals or None
+        bins: Histogram length
+
+    Returns:
+        int array (n, bins); missing histograms are zeros
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    hist = np.zeros((len(values), bins), dtype=np.int64)
+    is_text = values.map(type).eq(str).to_numpy()
+
+    # Lists of complete histograms are flattened and converted in one C-level pass
+    is_list = ~is_text & values.str.len().eq(bins).to_numpy()
+    if is_list.any():
+        flat = np.fromiter(chain.from_iterable(values[is_list]), dtype=np.int64, count=int(is_list.sum()) * bins)
+        hist[is_list] = flat.reshape(-1, bins)
+
+    # '{..}' literals are joined into one string and parsed at once
+    if is_text.any():
+        text = values[is_text].str.strip('{}')
+        complete = (text.str.count(',').eq(bins - 1) & text.ne('')).to_numpy()
+        rows = np.flatnonzero(is_text)[complete]
+        if len(rows):
+            hist[rows] = np.fromstring(','.join(text[complete]), dtype=np.int64, sep=',').reshape(-1, bins)
+    return hist
+
+
+def jensen_shannon(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """
+    Row-wise Jensen-Shannon divergence (base 2, in [0, 1]) of count vectors
+
+    Rows where either side has no mass give NaN.
+    """
+    p_sum = p.sum(axis=1, keepdims=True)
+    q_sum = q.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = p / p_sum
+        q = q / q_sum
+        m = (p + q) / 2
+        kl_pm = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=1)
+        kl_qm = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=1)
+    js = 0.5 * kl_pm + 0.5 * kl_qm
+    js[(p_sum[:, 0] == 0) | (q_sum[:, 0] == 0) | np.isnan(p_sum[:, 0]) | np.isnan(q_sum[:, 0])] = np.nan
+    return np.clip(js, 0.0, 1.0)
+
+
+def booking_pattern_shift(
+    weekly: pd.DataFrame,
+    as_of: Optional[pd.DataFrame] = None,
+    recent_weeks: int = 4,
+    baseline_weeks: int = 12,
+    min_baseline_weeks: int = 4
+) -> FeatureMatrix:
+    """
+    Shift of booking time-of-day distribution against the user's baseline
+
+    The 24 hour bins go through DeltaFeatureEngine as ordinary metrics, so the
+    recent and baseline histograms of all keys come from the same cumulative
+    sums; the divergence is then one row-wise operation.
+
+    Args:
+        weekly: Weekly facts with user_id, week_start and booking_hours
+        as_of: Requested keys (user_id, as_of_date); default: every fact week
+        recent_weeks: Recent window, weeks
+        baseline_weeks: Baseline window before the recent one, weeks
+        min_baseline_weeks: Minimum weeks of baseline history
+
+    Returns:
+        FeatureMatrix with booking_time_pattern_change (Jensen-Shannon divergence)
+    """
+    hist = hour_histograms(weekly['booking_hours'])
+    bins = [f"booking_hour_{h:02d}" for h in range(hist.shape[1])]
+    frame = pd.concat(
+        [weekly[['user_id', 'week_start']].reset_index(drop=True), pd.DataFrame(hist, columns=bins)],
+        axis=1
+    )
+
+    engine = DeltaFeatureEngine(
+        {col: col for col in bins},
+        recent_weeks=[recent_weeks],
+        baseline_weeks=baseline_weeks,
+        min_baseline_weeks=min_baseline_weeks
+    )
+    matrix = engine.compute(frame, as_of=as_of)
+    names = matrix.feature_names
+    recent = matrix.values[:, [names.index(f"{col}_recent_{recent_weeks}w") for col in bins]]
+    baseline = matrix.values[:, [names.index(f"{col}_baseline") for col in bins]]
+
+    shift = jensen_shannon(recent.astype(np.float64), baseline.astype(np.float64))
+    return FeatureMatrix(
+        keys=matrix.keys,
+        values=shift[:, None].astype(np.float32),
+        feature_names=['booking_time_pattern_change']
+    )
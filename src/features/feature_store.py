@@ -0,0 +1,346 @@
+"""
+Point-in-time feature store
+Keeps time-versioned feature values in monthly columnar partitions and answers
+as-of joins: features of each (user_id, as_of_date) as they were on that date.
+A compacted base partition holds the latest version of every user up to a
+month, so recent lookups read it and the months after it instead of the
+whole history.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import setup_logger
+from .external_factors import FeatureMatrix
+
+
+logger = setup_logger('feature_store', log_file='logs/feature_store.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DEFAULT_STORE_PATH = PROJECT_ROOT / 'data' / 'features'
+
+PARTITION_NAME = re.compile(r'\d{4}-\d{2}')
+
+# Compacted partition: latest version per user in the months up to its 'through' month
+BASE_PARTITION = 'base'
+
+
+class FeatureStore:
+    """
+    Time-versioned feature partitions on disk
+
+    Every row is (user_id, valid_from, features): the values hold from valid_from
+    until the next row of the same user. Rows are stored per feature set in
+    monthly .npz partitions by valid_from, sorted by (user_id, valid_from).
+    Recently used partitions are kept in memory with LRU eviction.
+
+    compact() writes base.npz with the latest version of every user through a
+    month; keys dated after that month are answered from the base and the
+    later partitions only. Monthly partitions are kept, so older keys still
+    get their exact versions.
+    """
+
+    def __init__(self, root: Optional[str] = None, cache_size: int = 24):
+        """
+        Initialize store
+
+        Args:
+            root: Store directory (default: data/features)
+            cache_size: Maximum number of partitions kept in memory (raised
+                        to the partitions of a single lookup when it needs more)
+        """
+        self.root = Path(root) if root else DEFAULT_STORE_PATH
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple[str, str], Dict[str, np.ndarray]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _partition_path(self, feature_set: str, partition: str) -> Path:
+        return self.root / feature_set / f"{partition}.npz"
+
+    def list_partitions(self, feature_set: str) -> List[str]:
+        """
+        List partitions of a feature set
+
+        Args:
+            feature_set: Feature set name (e.g. 'external_factors')
+
+        Returns:
+            Sorted partition names ('YYYY-MM')
+        """
+        directory = self.root / feature_set
+        if not directory.exists():
+            return []
+        # Half-written files carry a .npz.tmp suffix and are not matched
+        return sorted(path.stem for path in directory.glob('*.npz') if PARTITION_NAME.fullmatch(path.stem))
+
+    def _load_partition(self, feature_set: str, partition: str) -> Dict[str, np.ndarray]:
+        """Read a partition through the LRU cache"""
+        key = (feature_set, partition)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._cache[key]
+
+        with np.load(self._partition_path(feature_set, partition), allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+
+        with self._lock:
+            self.cache_misses += 1
+            self._cache[key] = arrays
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return arrays
+
+    def _invalidate(self, feature_set: str, partition: str):
+        with self._lock:
+            self._cache.pop((feature_set, partition), None)
+
+    def base_through(self, feature_set: str) -> Optional[str]:
+        """Last month ('YYYY-MM') covered by the compacted base (None without one)"""
+        path = self._partition_path(feature_set, BASE_PARTITION)
+        if not path.exists():
+            return None
+        return str(self._load_partition(feature_set, BASE_PARTITION)['through'])
+
+    def compact(self, feature_set: str, through: Optional[str] = None) -> Optional[str]:
+        """
+        Write the base partition with the latest version of every user through a month
+
+        Args:
+            feature_set: Feature set name
+            through: Last month to compact (default: every partition but the
+                     newest, which still receives writes)
+
+        Returns:
+            Month the base covers (None when there is nothing to compact)
+        """
+        partitions = self.list_partitions(feature_set)
+        if through is None:
+            through = partitions[-2] if len(partitions) > 1 else None
+        partitions = [p for p in partitions if through is not None and p <= through]
+        if not partitions:
+            return None
+        if self.base_through(feature_set) == through:
+            return through
+
+        frames = [self._partition_frame(self._read_partition(feature_set, p)) for p in partitions]
+        rows = pd.concat(frames, ignore_index=True).sort_values(['user_id', 'valid_from'])
+        rows = rows.drop_duplicates('user_id', keep='last')
+        self._save_partition(feature_set, BASE_PARTITION, rows, through=through)
+        logger.info(f"Compacted {feature_set} through {through}: {len(rows)} users from {len(partitions)} partitions")
+        return through
+
+    def _read_partition(self, feature_set: str, partition: str) -> Dict[str, np.ndarray]:
+        """Read a partition without the cache (one-off full scans)"""
+        with np.load(self._partition_path(feature_set, partition), allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def _save_partition(self, feature_set: str, partition: str, rows: pd.DataFrame, **extra):
+        """Atomically replace a partition file with rows sorted by (user_id, valid_from)"""
+        path = self._partition_path(feature_set, partition)
+        feature_names = [col for col in rows.columns if col not in ('user_id', 'valid_from')]
+
+        # Written through a file object: np.savez would append .npz to the name
+        tmp_path = path.with_name(f"{partition}.npz.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                user_id=rows['user_id'].to_numpy(dtype=str),
+                valid_from=rows['valid_from'].to_numpy(dtype='datetime64[D]'),
+                values=rows[feature_names].to_numpy(dtype=np.float32),
+                feature_names=np.array(feature_names, dtype=str),
+                **{name: np.array(value) for name, value in extra.items()}
+            )
+        os.replace(tmp_path, path)
+        self._invalidate(feature_set, partition)
+
+    def write(self, feature_set: str, df: pd.DataFrame) -> List[str]:
+        """
+        Write feature versions, merging them into existing partitions
+
+        A row with the same (user_id, valid_from) as a stored one replaces it.
+
+        Args:
+            feature_set: Feature set name
+            df: DataFrame with user_id, valid_from and float feature columns
+
+        Returns:
+            Names of the written partitions
+        """
+        df = df.copy()
+        df['user_id'] = df['user_id'].astype(str)
+        df['valid_from'] = pd.to_datetime(df['valid_from']).dt.normalize()
+        df['partition'] = df['valid_from'].dt.strftime('%Y-%m')
+
+        directory = self.root / feature_set
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # Versions inside the compacted months would be hidden behind the base
+        through = self.base_through(feature_set)
+        if through is not None and len(df) and df['partition'].min() <= through:
+            self._partition_path(feature_set, BASE_PARTITION).unlink()
+            self._invalidate(feature_set, BASE_PARTITION)
+            logger.info(f"Dropped the {feature_set} base: rows written into compacted months")
+
+        written = []
+        for partition, rows in df.groupby('partition', sort=True):
+            rows = rows.drop(columns='partition')
+            path = self._partition_path(feature_set, partition)
+            if path.exists():
+                stored = self._partition_frame(self._load_partition(feature_set, partition))
+                rows = pd.concat([stored, rows], ignore_index=True)
+
+            rows = (
+                rows
+                .drop_duplicates(['user_id', 'valid_from'], keep='last')
+                .sort_values(['user_id', 'valid_from'])
+            )
+            self._save_partition(feature_set, partition, rows)
+            written.append(partition)
+
+        logger.info(f"Wrote {len(df)} rows of {feature_set} into partitions {written}")
+        return written
+
+    def write_matrix(self, feature_set: str, matrix: FeatureMatrix) -> List[str]:
+        """
+        Write a FeatureMatrix, each row valid from its as_of_date
+
+        Args:
+            feature_set: Feature set name
+            matrix: Computed features (e.g. DeltaFeatureEngine.compute output)
+
+        Returns:
+            Names of the written partitions
+        """
+        df = matrix.to_frame().rename(columns={'as_of_date': 'valid_from'})
+        return self.write(feature_set, df)
+
+    @staticmethod
+    def _partition_frame(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+        df = pd.DataFrame(arrays['values'], columns=arrays['feature_names'].tolist())
+        df.insert(0, 'user_id', arrays['user_id'])
+        df.insert(1, 'valid_from', pd.to_datetime(arrays['valid_from']))
+        return df
+
+    def as_of(
+        self,
+        feature_set: str,
+        keys: pd.DataFrame,
+        features: Optional[List[str]] = None
+    ) -> FeatureMatrix:
+        """
+        Vectorized as-of join
+
+        For every key the latest version with valid_from <= as_of_date is taken;
+        keys without one get NaN. Lookups are a single sorted merge
+        (searchsorted over (user, date) composite keys), not a per-key loop.
+        When every key is dated after the compacted base, only the base and
+        the partitions after it are read.
+
+        Args:
+            feature_set: Feature set name
+            keys: DataFrame with user_id and as_of_date (e.g. HeroPass decision dates)
+            features: Subset of features to return (default: all)
+
+        Returns:
+            FeatureMatrix in the order of keys
+        """
+        keys = keys[['user_id', 'as_of_date']].reset_index(drop=True)
+        query_user = keys['user_id'].astype(str).to_numpy()
+        query_day = pd.to_datetime(keys['as_of_date']).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+        # Only partitions that can hold versions valid on the latest requested date
+        last_partition = pd.Timestamp(query_day.max(), unit='D').strftime('%Y-%m') if len(keys) else ''
+        partitions = [p for p in self.list_partitions(feature_set) if p <= last_partition]
+
+        # Versions of the compacted months are all older than keys after them
+        first_partition = pd.Timestamp(query_day.min(), unit='D').strftime('%Y-%m') if len(keys) else ''
+        through = self.base_through(feature_set) if partitions else None
+        if through is not None and first_partition > through:
+            partitions = [BASE_PARTITION] + [p for p in partitions if p > through]
+
+        if len(partitions) > self.cache_size:
+            # A lookup must not evict its own partitions
+            logger.info(f"Raising partition cache size from {self.cache_size} to {len(partitions)}")
+            self.cache_size = len(partitions)
+        loaded = [self._load_partition(feature_set, p) for p in partitions]
+
+        if features is None:
+            features = []
+            for arrays in loaded:
+                features += [f for f in arrays['feature_names'].tolist() if f not in features]
+
+        values = np.full((len(keys), len(features)), np.nan, dtype=np.float32)
+        if not loaded:
+            return FeatureMatrix(keys=keys, values=values, feature_names=list(features))
+
+        row_user = np.concatenate([arrays['user_id'] for arrays in loaded])
+        row_day = np.concatenate([arrays['valid_from'].astype(np.int64) for arrays in loaded])
+        row_values = np.vstack([
+            self._select_columns(arrays, features) for arrays in loaded
+        ])
+
+        # Composite (user, day) keys over a shared user coding
+        codes, _ = pd.factorize(np.concatenate([row_user, query_user]))
+        row_code, query_code = codes[:len(row_user)], codes[len(row_user):]
+        day_offset = min(row_day.min(), query_day.min())
+        span = max(row_day.max(), query_day.max()) - day_offset + 1
+        row_key = row_code * span + (row_day - day_offset)
+        query_key = query_code * span + (query_day - day_offset)
+
+        order = np.argsort(row_key, kind='stable')
+        row_key = row_key[order]
+        match = np.searchsorted(row_key, query_key, side='right') - 1
+        found = (match >= 0) & (row_code[order][np.maximum(match, 0)] == query_code)
+
+        values[found] = row_values[order[match[found]]]
+        logger.info(
+            f"As-of join on {feature_set}: {found.sum()}/{len(keys)} keys matched "
+            f"({len(partitions)} partitions, cache hits {self.cache_hits}, misses {self.cache_misses})"
+        )
+        return FeatureMatrix(keys=keys, values=values, feature_names=list(features))
+
+    @staticmethod
+    def _select_columns(arrays: Dict[str, np.ndarray], features: List[str]) -> np.ndarray:
+        """Partition values reordered to the requested features (NaN where missing)"""
+        stored = {name: i for i, name in enumerate(arrays['feature_names'].tolist())}
+        selected = np.full((len(arrays['values']), len(features)), np.nan, dtype=np.float32)
+        for j, name in enumerate(features):
+            if name in stored:
+                selected[:, j] = arrays['values'][:, stored[name]]
+        return selected
+
+
+_stores: Dict[str, FeatureStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_feature_store(root: Optional[str] = None) -> FeatureStore:
+    """
+    Store shared by all runs reading the same directory
+
+    Feature runs are short-lived (one per scoring request in the service);
+    sharing the store keeps its partition cache warm between them.
+
+    Args:
+        root: Store directory, relative to the project root (default: data/features)
+
+    Returns:
+        FeatureStore
+    """
+    path = str((PROJECT_ROOT / root).resolve() if root else DEFAULT_STORE_PATH)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = FeatureStore(path)
+        return _stores[path]
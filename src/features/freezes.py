@@ -0,0 +1,117 @@
+"""
+Point-in-time HeroPass freezes
+Freeze aggregates and the corrected end date of a period as known on a
+key date, from the raw freeze intervals: ris.core_hp_period keeps only
+the final values, which include freezes taken after the key date
+"""
+
+import numpy as np
+import pandas as pd
+
+
+FREEZE_COLUMNS = ['freeze_days_used', 'freeze_attempt_number', 'hp_end_corrected']
+
+
+def _timestamps(values) -> pd.Series:
+    """Dates as nanosecond timestamps (merge_asof needs one resolution on both sides)"""
+    return pd.to_datetime(pd.Series(values)).astype('datetime64[ns]')
+
+
+def freeze_islands(freezes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merge overlapping freezes of each period into disjoint islands
+
+    Same sweep as populate_core_hp_period: a freeze opens a new island unless
+    it starts on or before the latest end of the period's earlier freezes.
+
+    Args:
+        freezes: hp_period_id, freezing_start, freezing_end (inclusive dates)
+
+    Returns:
+        DataFrame with hp_period_id, island_start, island_end and
+        days_before (frozen days of the period's earlier islands), sorted by
+        period and start
+    """
+    freezes = (
+        freezes[['hp_period_id', 'freezing_start', 'freezing_end']]
+        .drop_duplicates()
+        .sort_values(['hp_period_id', 'freezing_start', 'freezing_end'])
+    )
+    by_period = freezes.groupby('hp_period_id', sort=False)
+    latest_end = by_period['freezing_end'].cummax().groupby(freezes['hp_period_id'], sort=False).shift()
+    island_id = (latest_end.isna() | (freezes['freezing_start'] > latest_end)).cumsum()
+
+    islands = freezes.groupby(island_id, sort=False).agg(
+        hp_period_id=('hp_period_id', 'first'),
+        island_start=('freezing_start', 'min'),
+        island_end=('freezing_end', 'max'),
+    ).reset_index(drop=True)
+    days = (islands['island_end'] - islands['island_start']).dt.days + 1
+    islands['days_before'] = days.groupby(islands['hp_period_id'], sort=False).cumsum() - days
+    return islands
+
+
+def freezes_as_of(periods: pd.DataFrame, freezes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Freeze aggregates of each key's HeroPass period as of its key date
+
+    Only freeze days before as_of are counted (a running freeze up to the
+    day before), so serving on any day sees what training saw on that day:
+        freeze_days_used      - frozen days of the period
+        freeze_attempt_number - the user's freezes started so far, over all periods
+        hp_end_corrected      - hp_end moved by freeze_days_used
+
+    Args:
+        periods: One row per key with user_id, hp_period_id (NaN = no period),
+                 hp_end and as_of_ts
+        freezes: user_id, hp_period_id, freezing_start, freezing_end (inclusive
+                 dates, duplicates allowed)
+
+    Returns:
+        DataFrame with FREEZE_COLUMNS aligned with periods (NaN without a period)
+    """
+    result = pd.DataFrame(np.nan, index=periods.index, columns=FREEZE_COLUMNS)
+    result['hp_end_corrected'] = pd.NaT
+    has_period = periods['hp_period_id'].notna()
+    if not has_period.any():
+        return result
+
+    keys = pd.DataFrame({
+        'user_id': periods.loc[has_period, 'user_id'].astype(str),
+        'hp_period_id': periods.loc[has_period, 'hp_period_id'].astype(str),
+        'as_of_ts': _timestamps(periods.loc[has_period, 'as_of_ts']),
+        'key_position': np.flatnonzero(has_period),
+    }).sort_values('as_of_ts')
+
+    freezes = freezes.assign(
+        user_id=freezes['user_id'].astype(str),
+        hp_period_id=freezes['hp_period_id'].astype(str),
+        freezing_start=_timestamps(freezes['freezing_start']),
+        freezing_end=_timestamps(freezes['freezing_end']),
+    )
+
+    # Latest island started before as_of: earlier islands count whole,
+    # this one up to the day before as_of
+    islands = freeze_islands(freezes).sort_values('island_start')
+    used = pd.merge_asof(
+        keys, islands, left_on='as_of_ts', right_on='island_start', by='hp_period_id', allow_exact_matches=False
+    )
+    last_day = np.minimum(used['island_end'], used['as_of_ts'] - pd.Timedelta(days=1))
+    days_used = (used['days_before'] + (last_day - used['island_start']).dt.days + 1).fillna(0)
+
+    # Ordinal of the user's latest freeze started before as_of
+    starts = freezes.drop_duplicates(['user_id', 'hp_period_id', 'freezing_start', 'freezing_end'])
+    starts = starts.sort_values(['freezing_start', 'freezing_end'])
+    starts = starts.assign(attempt=starts.groupby('user_id').cumcount() + 1)[['user_id', 'freezing_start', 'attempt']]
+    attempts = pd.merge_asof(
+        keys[['user_id', 'as_of_ts']], starts, left_on='as_of_ts', right_on='freezing_start',
+        by='user_id', allow_exact_matches=False
+    )
+    attempt = attempts['attempt'].fillna(0)
+
+    position = used['key_position'].to_numpy()
+    result.iloc[position, 0] = days_used.to_numpy()
+    result.iloc[position, 1] = attempt.to_numpy()
+    hp_end = _timestamps(periods['hp_end']).iloc[position].to_numpy()
+    result.iloc[position, 2] = hp_end + pd.to_timedelta(days_used.to_numpy(), unit='D')
+    return result
@@ -0,0 +1,482 @@
+"""
+Feature registry
+Maps feature names from config.yaml to their inputs and computations.
+Requesting a subset resolves only the dependencies it needs; sources and
+intermediate results are computed once and memoized per run.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Any
+
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from .external_factors import DeltaFeatureEngine, booking_pattern_shift
+from .calendar import CalendarLookup, get_calendar
+from .sketches import window_distinct
+from .freezes import freezes_as_of
+from .feature_store import get_feature_store
+from . import user_snapshots
+
+
+logger = setup_logger('feature_registry', log_file='logs/feature_registry.log')
+
+
+@dataclass
+class FeatureSpec:
+    """Declaration of a feature or an intermediate source"""
+
+    name: str
+    compute: Callable[['FeatureRun'], Any]
+    depends_on: List[str] = field(default_factory=list)
+    source: Optional[str] = None        # Table / collection the values come from
+    is_source: bool = False             # Intermediate result, not a model feature
+    snapshot: bool = False              # Past values come from dated snapshots (history starts with the first one)
+    daily: bool = False                 # Moves with as_of_date alone, while its inputs stay the same
+
+
+class FeatureRegistry:
+    """Named features and sources with their dependencies"""
+
+    def __init__(self):
+        self.specs: Dict[str, FeatureSpec] = {}
+
+    def _register(self, spec: FeatureSpec):
+        if spec.name in self.specs:
+            raise ValueError(f"Feature {spec.name} is already registered")
+        self.specs[spec.name] = spec
+
+    def source(
+        self,
+        name: str,
+        depends_on: Optional[List[str]] = None,
+        source: Optional[str] = None,
+        snapshot: bool = False
+    ):
+        """Decorator registering an intermediate source (e.g. a loaded table)"""
+        def decorator(func):
+            self._register(FeatureSpec(name, func, list(depends_on or []), source, is_source=True, snapshot=snapshot))
+            return func
+        return decorator
+
+    def feature(
+        self,
+        name: str,
+        depends_on: Optional[List[str]] = None,
+        source: Optional[str] = None,
+        daily: bool = False
+    ):
+        """Decorator registering a feature computed by func(run) -> Series aligned with run.keys"""
+        def decorator(func):
+            self._register(FeatureSpec(name, func, list(depends_on or []), source, daily=daily))
+            return func
+        return decorator
+
+    def column_feature(self, name: str, source_name: str, column: str):
+        """Register a feature taken as-is from a column of a per-user source"""
+        self._register(FeatureSpec(
+            name,
+            lambda run: run.by_user(source_name, column),
+            [source_name],
+            self.specs[source_name].source if source_name in self.specs else None
+        ))
+
+    def key_column_feature(self, name: str, source_name: str, column: str):
+        """Register a feature taken as-is from a column of a source aligned with the run keys"""
+        spec = self.specs[source_name]
+        self._register(FeatureSpec(
+            name,
+            lambda run: run.get(source_name)[column],
+            [source_name],
+            spec.source,
+            snapshot=spec.snapshot
+        ))
+
+    def is_snapshot(self, name: str) -> bool:
+        """Whether a feature (or any of its inputs) is read from dated snapshots"""
+        return any(self.specs[spec_name].snapshot for spec_name in self.resolve([name]))
+
+    def is_daily(self, name: str) -> bool:
+        """Whether a feature changes from one as_of_date to the next without new input data"""
+        return self.specs[name].daily
+
+    @property
+    def feature_names(self) -> List[str]:
+        """Names of all registered model features"""
+        return [name for name, spec in self.specs.items() if not spec.is_source]
+
+    def resolve(self, names: List[str]) -> List[str]:
+        """
+        Minimal set of specs needed for the requested features, in dependency order
+
+        Args:
+            names: Requested feature names
+
+        Returns:
+            Spec names, dependencies first
+        """
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: List[str]):
+            if name not in self.specs:
+                raise KeyError(f"Unknown feature: {name}")
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in self.specs[name].depends_on:
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in names:
+            visit(name, [])
+        return order
+
+    def configured_features(self, config: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Feature names listed in config.yaml (internal and external factors) that are registered
+
+        Args:
+            config: Loaded config (default: config/config.yaml)
+
+        Returns:
+            Registered feature names in config order
+        """
+        config = config if config is not None else load_config()
+        features = config.get('features', {})
+        listed = features.get('internal_factors', []) + features.get('external_factors', [])
+
+        missing = [name for name in listed if name not in self.specs]
+        if missing:
+            logger.info(f"Features listed in config without implementation: {missing}")
+        return [name for name in listed if name in self.specs]
+
+    def run(
+        self,
+        keys: pd.DataFrame,
+        postgres_connector: PostgresConnector,
+        config: Optional[Dict[str, Any]] = None
+    ) -> 'FeatureRun':
+        """Start a run (memoization scope) for the given keys"""
+        return FeatureRun(self, keys, postgres_connector, config)
+
+
+class FeatureRun:
+    """
+    One feature computation over a fixed set of (user_id, as_of_date) keys
+
+    Every spec is computed at most once per run; later requests on the same
+    run reuse already computed sources and features.
+    """
+
+    def __init__(
+        self,
+        registry: FeatureRegistry,
+        keys: pd.DataFrame,
+        postgres_connector: PostgresConnector,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize run
+
+        Args:
+            registry: Feature registry
+            keys: DataFrame with user_id and as_of_date
+            postgres_connector: PostgreSQL connector instance
+            config: Loaded config (default: config/config.yaml)
+        """
+        self.registry = registry
+        self.keys = keys[['user_id', 'as_of_date']].reset_index(drop=True)
+        self.pg = postgres_connector
+        self.config = config if config is not None else load_config()
+        self.results: Dict[str, Any] = {}
+
+    @property
+    def user_ids(self) -> List[str]:
+        """Distinct users of the run"""
+        return self.keys['user_id'].astype(str).unique().tolist()
+
+    def get(self, name: str) -> Any:
+        """Computed value of a spec (computing its dependencies first)"""
+        for spec_name in self.registry.resolve([name]):
+            if spec_name not in self.results:
+                logger.info(f"Computing {spec_name}")
+                self.results[spec_name] = self.registry.specs[spec_name].compute(self)
+        return self.results[name]
+
+    def by_user(self, source_name: str, column: str) -> pd.Series:
+        """Column of a user-indexed source aligned with the run keys"""
+        source = self.get(source_name)
+        return self.keys['user_id'].astype(str).map(source[column]).rename(column)
+
+    def compute(self, names: List[str]) -> pd.DataFrame:
+        """
+        Compute requested features
+
+        Args:
+            names: Feature names
+
+        Returns:
+            DataFrame with the keys and one column per requested feature
+        """
+        features = pd.DataFrame({name: self.get(name).to_numpy() for name in names}, index=self.keys.index)
+        return pd.concat([self.keys, features], axis=1)
+
+
+registry = FeatureRegistry()
+
+
+# ---------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------
+
+# Only attributes fixed per user: core_user holds today's values, mutable
+# attributes are read as of the key date from user_snapshots
+CORE_USER_QUERY = """
+    select user_id, age, gender, height_cm, city, fitness_goal, trial_before_hp
+    from ris.core_user
+    where user_id = any(%(user_ids)s::text[])
+"""
+
+FACT_USER_WEEK_QUERY = """
+    select *
+    from ris.fact_user_week
+    where user_id = any(%(user_ids)s::text[])
+      and week_start < %(max_as_of)s
+"""
+
+# Freeze aggregates and hp_end_corrected are final values (they include later
+# freezes); features take them as of the key date from HP_FREEZES_QUERY
+CORE_HP_PERIOD_QUERY = """
+    select user_id, hp_period_id, hp_start, hp_end, hp_type, hp_club_corr
+    from ris.core_hp_period
+    where user_id = any(%(user_ids)s::text[])
+      and hp_start <= %(max_as_of)s
+"""
+
+# Raw freeze intervals of the periods in ris.core_hp_period, filtered as
+# populate_core_hp_period does
+HP_FREEZES_QUERY = """
+    select distinct
+        p.user_id,
+        p.hp_period_id,
+        uft.starttime::date as freezing_start,
+        uft.endtime::date as freezing_end
+    from ris.core_hp_period p
+    join raw.userfreezingtime uft
+      on uft."user"::text = p.user_id::text
+     and uft.userheropass::text = p.hp_period_id::text
+    where p.user_id = any(%(user_ids)s::text[])
+      and uft.starttime is not null
+      and uft.endtime is not null
+      and uft.endtime::date >= uft.starttime::date
+      and uft.starttime::date < %(max_as_of)s
+"""
+
+
+@registry.source('core_user', source='ris.core_user')
+def _core_user(run: FeatureRun) -> pd.DataFrame:
+    df = pd.read_sql(CORE_USER_QUERY, run.pg.engine, params={'user_ids': run.user_ids})
+    df['user_id'] = df['user_id'].astype(str)
+    return df.set_index('user_id')
+
+
+@registry.source('core_user_as_of', source='ris.core_user', snapshot=True)
+def _core_user_as_of(run: FeatureRun) -> pd.DataFrame:
+    """Mutable core_user attributes as of each key date (NaN before the first snapshot)"""
+    store = get_feature_store(run.config.get('features', {}).get('store_path'))
+    return store.as_of(user_snapshots.FEATURE_SET, run.keys, user_snapshots.SNAPSHOT_COLUMNS).to_frame()
+
+
+@registry.source('fact_user_week', source='ris.fact_user_week')
+def _fact_user_week(run: FeatureRun) -> pd.DataFrame:
+    return pd.read_sql(
+        FACT_USER_WEEK_QUERY,
+        run.pg.engine,
+        params={'user_ids': run.user_ids, 'max_as_of': run.keys['as_of_date'].max()}
+    )
+
+
+@registry.source('weekly_deltas', depends_on=['fact_user_week'], source='ris.fact_user_week')
+def _weekly_deltas(run: FeatureRun) -> pd.DataFrame:
+    engine = DeltaFeatureEngine.from_config(run.config)
+    deltas = engine.compute(run.get('fact_user_week'), as_of=run.keys).to_frame()
+
+    # Model features use the longest recent window
+    longest = engine.recent_weeks[-1]
+    return deltas.rename(columns={
+        f"{prefix}_{kind}_{longest}w": f"{prefix}_{kind}"
+        for prefix in engine.metrics
+        for kind in ('recent', 'delta')
+    })
+
+
+@registry.source('calendar', source='ris.ref_calendar')
+def _calendar(run: FeatureRun) -> CalendarLookup:
+    return get_calendar(run.pg)
+
+
+@registry.source('hp_period_as_of', source='ris.core_hp_period')
+def _hp_period_as_of(run: FeatureRun) -> pd.DataFrame:
+    """Latest HeroPass period started on or before each as_of_date"""
+    periods = pd.read_sql(
+        CORE_HP_PERIOD_QUERY,
+        run.pg.engine,
+        params={'user_ids': run.user_ids, 'max_as_of': run.keys['as_of_date'].max()}
+    )
+    periods['user_id'] = periods['user_id'].astype(str)
+    periods['hp_start'] = pd.to_datetime(periods['hp_start'])
+
+    keys = run.keys.assign(
+        user_id=run.keys['user_id'].astype(str),
+        as_of_ts=pd.to_datetime(run.keys['as_of_date']),
+        key_position=range(len(run.keys))
+    )
+    merged = pd.merge_asof(
+        keys.sort_values('as_of_ts'),
+        periods.sort_values('hp_start'),
+        left_on='as_of_ts',
+        right_on='hp_start',
+        by='user_id'
+    )
+    return merged.sort_values('key_position').reset_index(drop=True)
+
+
+@registry.source('hp_freezes_as_of', depends_on=['hp_period_as_of'], source='raw.userfreezingtime')
+def _hp_freezes_as_of(run: FeatureRun) -> pd.DataFrame:
+    """Freeze days, freeze attempts and hp_end_corrected of the current period, as of each key date"""
+    freezes = pd.read_sql(
+        HP_FREEZES_QUERY,
+        run.pg.engine,
+        params={'user_ids': run.user_ids, 'max_as_of': run.keys['as_of_date'].max()}
+    )
+    return freezes_as_of(run.get('hp_period_as_of'), freezes)
+
+
+# ---------------------------------------------------------------------
+# Internal factors
+# ---------------------------------------------------------------------
+
+for _name, _column in [
+    ('age', 'age'),
+    ('gender', 'gender'),
+    ('height', 'height_cm'),
+    ('fitness_goal', 'fitness_goal'),
+    ('had_trial', 'trial_before_hp'),
+]:
+    registry.column_feature(_name, 'core_user', _column)
+
+for _name, _column in [
+    ('weight', 'weight_kg'),
+    ('fat_percentage', 'fat_pct_latest'),
+    ('location', 'distance_home_to_club_km'),
+    ('personality_type', 'friends_cnt'),
+    ('social_commitment', 'feed_posts_total'),
+    ('in_clan', 'in_clan'),
+]:
+    registry.key_column_feature(_name, 'core_user_as_of', _column)
+
+# Club of the HeroPass period running on the key date (core_user only has today's club)
+registry.key_column_feature('club', 'hp_period_as_of', 'hp_club_corr')
+
+
+@registry.feature('heropass_type', depends_on=['hp_period_as_of'], source='ris.core_hp_period')
+def _heropass_type(run: FeatureRun) -> pd.Series:
+    return run.get('hp_period_as_of')['hp_type']
+
+
+@registry.feature(
+    'days_to_hp_end', depends_on=['hp_period_as_of', 'hp_freezes_as_of'], source='ris.core_hp_period', daily=True
+)
+def _days_to_hp_end(run: FeatureRun) -> pd.Series:
+    """Days from as_of_date to hp_end_corrected of the current period (the decision horizon)"""
+    hp_end = run.get('hp_freezes_as_of')['hp_end_corrected']
+    return (hp_end - run.get('hp_period_as_of')['as_of_ts']).dt.days
+
+
+# ---------------------------------------------------------------------
+# External factors
+# ---------------------------------------------------------------------
+
+for _name, _column in [
+    ('engagement_delta', 'engagement_delta'),
+    ('missed_delta', 'missed_delta'),
+    ('cancellation_delta', 'cancellation_delta'),
+    ('late_arrivals', 'late_arrivals_recent'),
+    ('double_trainings', 'double_trainings_recent'),
+]:
+    registry.feature(_name, depends_on=['weekly_deltas'], source='ris.fact_user_week')(
+        lambda run, column=_column: run.get('weekly_deltas')[column]
+    )
+
+
+@registry.feature('seasonality_external', depends_on=['calendar'], source='ris.ref_calendar', daily=True)
+def _seasonality_external(run: FeatureRun) -> pd.Series:
+    """Holiday and school-break days in the 30 days before as_of_date"""
+    calendar = run.get('calendar')
+    end = pd.to_datetime(run.keys['as_of_date']) - pd.Timedelta(days=1)
+    start = end - pd.Timedelta(days=29)
+    days_off = (
+        calendar.count_between(start, end, 'is_holiday_kz') +
+        calendar.count_between(start, end, 'is_school_break')
+    )
+    return pd.Series(days_off, index=run.keys.index)
+
+
+@registry.feature(
+    'seasonality_internal', depends_on=['calendar', 'hp_period_as_of'], source='ris.ref_calendar', daily=True
+)
+def _seasonality_internal(run: FeatureRun) -> pd.Series:
+    """Share of holiday and school-break days from hp_start of the current period to as_of_date"""
+    calendar = run.get('calendar')
+    periods = run.get('hp_period_as_of')
+    start, end = periods['hp_start'], periods['as_of_ts']
+    days_off = (
+        calendar.count_between(start, end, 'is_holiday_kz') +
+        calendar.count_between(start, end, 'is_school_break')
+    )
+    # NaN without a current period
+    elapsed = ((end - start).dt.days + 1).to_numpy(dtype=float)
+    return pd.Series(days_off / elapsed, index=run.keys.index)
+
+
+@registry.feature('booking_time_pattern_change', depends_on=['fact_user_week'], source='ris.fact_user_week')
+def _booking_time_pattern_change(run: FeatureRun) -> pd.Series:
+    windows = run.config.get('features', {}).get('delta_windows', {})
+    shift = booking_pattern_shift(
+        run.get('fact_user_week'),
+        as_of=run.keys,
+        recent_weeks=max(windows.get('recent_weeks', [4])),
+        baseline_weeks=windows.get('baseline_weeks', 12),
+        min_baseline_weeks=windows.get('min_baseline_weeks', 4)
+    )
+    return pd.Series(shift.values[:, 0], index=run.keys.index)
+
+
+for _name, _column in [
+    ('trainers_variety', 'trainers_hll'),
+    ('trainings_variety', 'trainings_hll'),
+]:
+    # Distinct count over the longest recent window, merged from weekly sketches
+    registry.feature(_name, depends_on=['fact_user_week'], source='ris.fact_user_week')(
+        lambda run, column=_column: pd.Series(
+            window_distinct(
+                run.get('fact_user_week'),
+                column,
+                run.keys,
+                max(run.config.get('features', {}).get('delta_windows', {}).get('recent_weeks', [4]))
+            ),
+            index=run.keys.index
+        )
+    )
+
+# Daily: a running freeze adds a day and a scheduled one starts without any marts reload
+for _name in ['freeze_days_used', 'freeze_attempt_number']:
+    registry.feature(_name, depends_on=['hp_freezes_as_of'], source='raw.userfreezingtime', daily=True)(
+        lambda run, column=_name: run.get('hp_freezes_as_of')[column]
+    )
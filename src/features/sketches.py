@@ -0,0 +1,219 @@
+"""
+Distinct-count sketches
+Vectorized HyperLogLog registers per group, mergeable across weeks, for
+trainer / training variety over arbitrary windows, with an exact mode
+for validation
+"""
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+# 2^8 one-byte registers per sketch: 256 bytes, ~6.5% standard error
+# (small counts, the usual case per user, fall back to exact-ish linear counting)
+DEFAULT_PRECISION = 8
+
+# Any Monday: week index = weeks since this date
+WEEK_EPOCH = np.datetime64('2000-01-03', 'D')
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Vectorized int.bit_length for uint64 arrays"""
+    x = x.copy()
+    length = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length += shift * high
+        x = np.where(high, x >> np.uint64(shift), x)
+    return length + (x > 0)
+
+
+def hash_values(values: Iterable) -> np.ndarray:
+    """Stable 64-bit hashes of values (their string form)"""
+    return pd.util.hash_array(np.asarray(pd.Series(values).astype(str), dtype=object))
+
+
+def build_registers(
+    group_codes: np.ndarray,
+    n_groups: int,
+    values: Iterable,
+    precision: int = DEFAULT_PRECISION
+) -> np.ndarray:
+    """
+    HyperLogLog registers of values per group
+
+    Args:
+        group_codes: Group index (0..n_groups-1) of every value; -1 rows are skipped
+        n_groups: Number of groups
+        values: Values to count (NaN / None are skipped)
+        precision: log2 of the number of registers
+
+    Returns:
+        uint8 array (n_groups, 2^precision)
+    """
+    values = pd.Series(values)
+    group_codes = np.asarray(group_codes)
+    present = values.notna().to_numpy() & (group_codes >= 0)
+
+    hashes = hash_values(values[present])
+    p = np.uint64(precision)
+    register = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+    remainder = (hashes << p)
+    # Position of the leftmost 1-bit in the remaining 64 - p bits
+    rank = np.minimum(64 - _bit_length(remainder) + 1, 64 - precision + 1).astype(np.uint8)
+
+    registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+    np.maximum.at(registers, (group_codes[present], register), rank)
+    return registers
+
+
+def estimate(registers: np.ndarray) -> np.ndarray:
+    """
+    Distinct count estimates of sketches
+
+    Args:
+        registers: uint8 array (n, m) or (m,)
+
+    Returns:
+        float array of estimates
+    """
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+
+    raw = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = np.sum(registers == 0, axis=1)
+    with np.errstate(divide='ignore'):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def to_bytea(registers: np.ndarray) -> list:
+    """Sketches as PostgreSQL bytea hex literals (for COPY)"""
+    return ['\\x' + row.tobytes().hex() for row in np.atleast_2d(registers)]
+
+
+def from_bytea(values: Iterable, precision: int = DEFAULT_PRECISION) -> np.ndarray:
+    """
+    Sketches read back from bytea (bytes, memoryview or hex literal); NULL gives empty sketches
+
+    Returns:
+        uint8 array (n, 2^precision)
+    """
+    m = 1 << precision
+    rows = []
+    for value in values:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            rows.append(np.zeros(m, dtype=np.uint8))
+        elif isinstance(value, str):
+            rows.append(np.frombuffer(bytes.fromhex(value[2:]), dtype=np.uint8))
+        else:
+            rows.append(np.frombuffer(bytes(value), dtype=np.uint8))
+    return np.vstack(rows) if rows else np.zeros((0, m), dtype=np.uint8)
+
+
+def _window_ranges(
+    row_user: np.ndarray,
+    row_week: np.ndarray,
+    key_user: np.ndarray,
+    key_week_end: np.ndarray,
+    weeks: int
+):
+    """Row ranges [lo, hi) of each key's window in (user, week)-sorted rows"""
+    codes, _ = pd.factorize(np.concatenate([row_user, key_user]))
+    row_code, key_code = codes[:len(row_user)], codes[len(row_user):]
+
+    offset = min(row_week.min(initial=0), (key_week_end - weeks).min(initial=0))
+    span = max(row_week.max(initial=0), key_week_end.max(initial=0)) - offset + 1
+    row_key = row_code * span + (row_week - offset)
+    order = np.argsort(row_key, kind='stable')
+
+    lo = np.searchsorted(row_key[order], key_code * span + (key_week_end - weeks - offset), side='left')
+    hi = np.searchsorted(row_key[order], key_code * span + (key_week_end - offset), side='left')
+    return order, lo, hi
+
+
+def window_distinct(
+    weekly: pd.DataFrame,
+    sketch_column: str,
+    keys: pd.DataFrame,
+    weeks: int,
+    precision: int = DEFAULT_PRECISION
+) -> np.ndarray:
+    """
+    Distinct counts over the `weeks` weeks before each as_of_date, by merging weekly sketches
+
+    Args:
+        weekly: Weekly facts with user_id, week_start and the sketch column
+        sketch_column: Column with weekly sketches (e.g. 'trainers_hll')
+        keys: DataFrame with user_id and as_of_date
+        weeks: Window length in weeks
+        precision: Sketch precision
+
+    Returns:
+        float array of estimates (0 for keys without weeks in the window)
+    """
+    row_user = weekly['user_id'].astype(str).to_numpy()
+    row_week = np.floor_divide(
+        (pd.to_datetime(weekly['week_start']).to_numpy(dtype='datetime64[D]') - WEEK_EPOCH).astype(np.int64), 7
+    )
+    key_user = keys['user_id'].astype(str).to_numpy()
+    # Weeks finished before as_of_date
+    key_week_end = np.floor_divide(
+        (pd.to_datetime(keys['as_of_date']).to_numpy(dtype='datetime64[D]') - WEEK_EPOCH).astype(np.int64), 7
+    )
+
+    if len(weekly) == 0:
+        return np.zeros(len(keys))
+
+    order, lo, hi = _window_ranges(row_user, row_week, key_user, key_week_end, weeks)
+    registers = from_bytea(weekly[sketch_column].to_numpy()[order], precision)
+
+    # maximum.reduceat over interleaved [lo, hi) bounds; a trailing empty row keeps hi in range
+    padded = np.vstack([registers, np.zeros((1, registers.shape[1]), dtype=np.uint8)])
+    bounds = np.column_stack([lo, hi]).ravel()
+    merged = np.maximum.reduceat(padded, bounds, axis=0)[::2]
+
+    result = estimate(merged)
+    result[hi <= lo] = 0.0
+    return result
+
+
+def exact_window_distinct(
+    sessions: pd.DataFrame,
+    value_column: str,
+    keys: pd.DataFrame,
+    weeks: int
+) -> np.ndarray:
+    """
+    Exact distinct counts for the same windows as window_distinct (validation mode)
+
+    Args:
+        sessions: Normalized sessions with user_id, week_start and the value column
+        value_column: Column to count (e.g. 'trainer_id')
+        keys: DataFrame with user_id and as_of_date
+        weeks: Window length in weeks
+
+    Returns:
+        int array of exact counts
+    """
+    key_frame = keys[['user_id', 'as_of_date']].reset_index(drop=True).copy()
+    key_frame['key_position'] = np.arange(len(key_frame))
+    key_frame['user_id'] = key_frame['user_id'].astype(str)
+    key_frame['window_end'] = pd.to_datetime(key_frame['as_of_date'])
+
+    week_end = WEEK_EPOCH + np.floor_divide(
+        (key_frame['window_end'].to_numpy(dtype='datetime64[D]') - WEEK_EPOCH).astype(np.int64), 7
+    ) * 7
+    key_frame['window_end'] = pd.to_datetime(week_end)
+    key_frame['window_start'] = key_frame['window_end'] - pd.Timedelta(weeks=weeks)
+
+    rows = sessions[['user_id', 'week_start', value_column]].dropna()
+    rows = rows.assign(user_id=rows['user_id'].astype(str), week_start=pd.to_datetime(rows['week_start']))
+    merged = key_frame.merge(rows, on='user_id')
+    in_window = (merged['week_start'] >= merged['window_start']) & (merged['week_start'] < merged['window_end'])
+
+    counts = merged[in_window].groupby('key_position')[value_column].nunique()
+    return counts.reindex(range(len(key_frame)), fill_value=0).to_numpy()
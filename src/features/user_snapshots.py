@@ -0,0 +1,80 @@
+"""
+Dated snapshots of mutable user attributes
+ris.core_user keeps only the current value of attributes that change over
+time (body measurements, social activity, clan membership, home distance).
+Every core_user load writes the values that changed into the feature store,
+so features can be read as they were on a past decision date.
+"""
+
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from ..data_engineering.meta_store import MetaStore
+from .feature_store import FeatureStore
+
+
+logger = setup_logger('user_snapshots', log_file='logs/user_snapshots.log')
+
+FEATURE_SET = 'core_user'
+JOB_NAME = 'core_user_snapshot'
+
+# Mutable core_user columns; everything else read from core_user is fixed per user
+SNAPSHOT_COLUMNS = [
+    'weight_kg', 'fat_pct_latest', 'friends_cnt', 'feed_posts_total',
+    'in_clan', 'distance_home_to_club_km',
+]
+
+SNAPSHOT_QUERY = f"""
+    select user_id, {', '.join(SNAPSHOT_COLUMNS)}
+    from ris.core_user
+"""
+
+
+def snapshot_core_user(
+    postgres_connector: PostgresConnector,
+    store: FeatureStore,
+    snapshot_date: Optional[date] = None
+) -> int:
+    """
+    Write current core_user values that differ from the latest stored version
+
+    Args:
+        postgres_connector: PostgreSQL connector instance
+        store: Feature store
+        snapshot_date: Date the values are valid from (default: database date)
+
+    Returns:
+        Number of users with a new version
+    """
+    meta = MetaStore(postgres_connector)
+    run_started_at = meta.db_now()
+    snapshot_date = pd.Timestamp(snapshot_date or run_started_at.date())
+
+    current = pd.read_sql(SNAPSHOT_QUERY, postgres_connector.engine)
+    current['user_id'] = current['user_id'].astype(str)
+    values = current[SNAPSHOT_COLUMNS].astype(float).to_numpy(dtype=np.float32)
+
+    stored = store.as_of(
+        FEATURE_SET,
+        current[['user_id']].assign(as_of_date=snapshot_date),
+        SNAPSHOT_COLUMNS
+    ).values
+    same = (stored == values) | (np.isnan(stored) & np.isnan(values))
+    changed = ~same.all(axis=1)
+
+    if changed.any():
+        versions = current.loc[changed, ['user_id']].assign(valid_from=snapshot_date)
+        versions[SNAPSHOT_COLUMNS] = values[changed]
+        store.write(FEATURE_SET, versions)
+    # Moves the base up once a month, so daily lookups stop reading older partitions
+    store.compact(FEATURE_SET)
+
+    n_changed = int(changed.sum())
+    meta.set_watermark(JOB_NAME, run_started_at, 'snapshot', n_changed)
+    logger.info(f"core_user snapshot {snapshot_date.date()}: {n_changed}/{len(current)} users changed")
+    return n_changed
@@ -0,0 +1,336 @@
+"""
+Training dataset cache
+Features of all labeled periods are computed once per feature snapshot and
+stored under models/datasets/<hash>/ as a float32 .npy matrix. The
+30/60/90-day windows reuse it and only swap the label vector. Every period
+appears once per decision offset (days before hp_end_corrected), the points
+daily scoring sees it at. Cross-validation
+and final fits memory-map the matrix, tuning trials load an XGBoost binary
+buffer written from it once (raw values; bins are built per loading process).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from ..data_engineering.meta_store import MetaStore
+from ..features.registry import registry
+
+
+logger = setup_logger('dataset_cache', log_file='logs/dataset_cache.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DATASET_DIR = PROJECT_ROOT / 'models' / 'datasets'
+
+# Periods with at least one closed label window, each sampled at every
+# decision offset before hp_end_corrected that falls inside the period
+KEYS_QUERY = """
+    select
+        l.hp_period_id,
+        l.user_id,
+        l.hp_end_corrected - o.days_before_end as as_of_date
+    from (
+        select hp_period_id, user_id, hp_end_corrected
+        from ris.label_hp
+        where not is_censored
+          and user_id is not null
+        group by hp_period_id, user_id, hp_end_corrected
+    ) l
+    join ris.core_hp_period p
+      on p.hp_period_id = l.hp_period_id
+    cross join unnest(%(offsets)s::int[]) as o(days_before_end)
+    where l.hp_end_corrected - o.days_before_end >= p.hp_start
+    order by as_of_date, l.hp_period_id
+"""
+
+LABELS_QUERY = """
+    select hp_period_id, renewed
+    from ris.label_hp
+    where window_days = %(window_days)s
+      and not is_censored
+"""
+
+# Marts the features are read from; a new load of any of them is a new snapshot
+SOURCE_JOBS = ['core_user', 'core_hp_period', 'fact_user_week', 'core_user_snapshot']
+
+# Snapshot-backed features known on fewer training rows than this are dropped
+DEFAULT_MIN_SNAPSHOT_COVERAGE = 0.5
+
+DEFAULT_DECISION_OFFSETS = [0]
+
+
+def encode_features(features: pd.DataFrame) -> pd.DataFrame:
+    """
+    Numeric encoding of a feature frame
+
+    Booleans become 0/1, categorical columns are one-hot encoded
+    (a missing category is an all-zero row).
+
+    Args:
+        features: Feature columns only
+
+    Returns:
+        All-numeric DataFrame
+    """
+    features = features.copy()
+    for col in features.columns:
+        if features[col].dtype == bool or str(features[col].dtype) == 'boolean':
+            features[col] = features[col].astype(float)
+
+    categorical = [
+        col for col in features.columns
+        if not pd.api.types.is_numeric_dtype(features[col])
+    ]
+    if categorical:
+        features = pd.get_dummies(features, columns=categorical, dtype=float)
+    return features
+
+
+@dataclass
+class DatasetSnapshot:
+    """Cached feature matrix of one snapshot"""
+
+    key: str
+    directory: Path
+    keys: pd.DataFrame
+    features: List[str]
+    columns: List[str]
+    decision_offsets: List[int]
+
+    @property
+    def matrix_path(self) -> Path:
+        return self.directory / 'X.npy'
+
+    @property
+    def xgboost_path(self) -> Path:
+        return self.directory / 'xgboost.buffer'
+
+    def labels_path(self, window_days: int) -> Path:
+        return self.directory / f"labels_w{window_days}.npy"
+
+    def matrix(self) -> np.ndarray:
+        """Feature matrix, memory-mapped read-only"""
+        return np.load(self.matrix_path, mmap_mode='r')
+
+
+def load_dmatrix(buffer_path: str, labels: np.ndarray, rows: Optional[np.ndarray] = None):
+    """
+    XGBoost DMatrix from the cached buffer with a window's labels
+
+    Periods without a closed window (label -1) get zero weight, so the same
+    buffer serves every window without rebuilding.
+
+    Args:
+        buffer_path: Snapshot xgboost.buffer
+        labels: int8 labels of all snapshot rows (-1 = censored)
+        rows: Optional row subset (e.g. train / validation split)
+
+    Returns:
+        xgboost.DMatrix
+    """
+    import xgboost as xgb
+
+    dmatrix = xgb.DMatrix(str(buffer_path))
+    dmatrix.set_label(np.maximum(labels, 0).astype(np.float32))
+    dmatrix.set_weight((labels >= 0).astype(np.float32))
+    if rows is not None:
+        dmatrix = dmatrix.slice(rows)
+    return dmatrix
+
+
+class DatasetCache:
+    """Build or reuse the training matrix of the current feature snapshot"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        features: Optional[List[str]] = None,
+        config: Optional[Dict[str, Any]] = None,
+        root: Path = DATASET_DIR
+    ):
+        """
+        Initialize cache
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            features: Feature names (default: registered features listed in config.yaml)
+            config: Loaded config (default: config/config.yaml)
+            root: Cache directory
+        """
+        self.pg = postgres_connector
+        self.config = config if config is not None else load_config()
+        self.features = features or registry.configured_features(self.config)
+        self.root = Path(root)
+        model_config = self.config.get('model', {})
+        self.min_snapshot_coverage = model_config.get('min_snapshot_coverage', DEFAULT_MIN_SNAPSHOT_COVERAGE)
+        self.decision_offsets = sorted(
+            int(days) for days in model_config.get('decision_offsets_days', DEFAULT_DECISION_OFFSETS)
+        )
+
+    def snapshot_key(self, keys: pd.DataFrame) -> str:
+        """
+        Hash of the feature set, feature windows, labeled keys and source mart loads
+
+        Args:
+            keys: Labeled decision points (hp_period_id, user_id, as_of_date)
+
+        Returns:
+            16-char hex key
+        """
+        meta = MetaStore(self.pg)
+        digest = hashlib.sha256()
+        digest.update(json.dumps({
+            'features': sorted(self.features),
+            'delta_windows': self.config.get('features', {}).get('delta_windows', {}),
+            'min_snapshot_coverage': self.min_snapshot_coverage,
+            'sources': {job: str(meta.get_watermark(job)) for job in SOURCE_JOBS},
+        }, sort_keys=True, default=str).encode())
+        digest.update(pd.util.hash_pandas_object(keys, index=False).to_numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+    def get(self, rebuild: bool = False) -> DatasetSnapshot:
+        """
+        Snapshot for the current labels and marts, built if not cached
+
+        Args:
+            rebuild: Recompute even if the snapshot exists
+
+        Returns:
+            DatasetSnapshot
+        """
+        keys = pd.read_sql(KEYS_QUERY, self.pg.engine, params={'offsets': self.decision_offsets})
+        keys['hp_period_id'] = keys['hp_period_id'].astype(str)
+        keys['user_id'] = keys['user_id'].astype(str)
+        key = self.snapshot_key(keys)
+        directory = self.root / key
+
+        if rebuild and directory.exists():
+            shutil.rmtree(directory)
+
+        if not (directory / 'meta.json').exists():
+            self._build(keys, directory)
+        else:
+            logger.info(f"Using cached dataset {key}")
+
+        with open(directory / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return DatasetSnapshot(
+            key=key,
+            directory=directory,
+            keys=keys,
+            features=meta['features'],
+            columns=meta['columns'],
+            decision_offsets=meta.get('decision_offsets_days', DEFAULT_DECISION_OFFSETS)
+        )
+
+    def _without_history(self, features: pd.DataFrame) -> List[str]:
+        """
+        Snapshot-backed features with too little history for the training rows
+
+        Their values before the first snapshot are unknown; read from today's
+        marts instead they would leak the outcome, so such features are dropped.
+        """
+        dropped = []
+        for name in features.columns:
+            if not registry.is_snapshot(name):
+                continue
+            coverage = features[name].notna().mean() if len(features) else 0.0
+            if coverage < self.min_snapshot_coverage:
+                logger.info(f"Dropping {name}: known as of {coverage:.1%} of training rows")
+                dropped.append(name)
+        return dropped
+
+    def _build(self, keys: pd.DataFrame, directory: Path):
+        """Compute features and write the snapshot (in a temp dir, renamed when complete)"""
+        logger.info(
+            f"Building dataset for {keys['hp_period_id'].nunique()} periods at offsets {self.decision_offsets} "
+            f"({len(keys)} rows), {len(self.features)} features"
+        )
+        run = registry.run(keys[['user_id', 'as_of_date']], self.pg, self.config)
+        features = run.compute(self.features).drop(columns=['user_id', 'as_of_date'])
+        dropped = self._without_history(features)
+        features = encode_features(features.drop(columns=dropped))
+        kept = [name for name in self.features if name not in dropped]
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = self.root / f".{directory.name}.{os.getpid()}.tmp"
+        tmp_dir.mkdir()
+
+        matrix = np.lib.format.open_memmap(
+            tmp_dir / 'X.npy', mode='w+', dtype=np.float32, shape=features.shape
+        )
+        matrix[:] = features.to_numpy(dtype=np.float32, na_value=np.nan)
+        matrix.flush()
+        del matrix
+
+        with open(tmp_dir / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'features': kept,
+                'dropped_features': dropped,
+                'columns': features.columns.tolist(),
+                'n_rows': int(len(keys)),
+                'decision_offsets_days': self.decision_offsets,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+            }, f, indent=2, ensure_ascii=False)
+
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Built concurrently by another process
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.info(f"Dataset {directory.name} saved: {features.shape}")
+
+    def labels(self, snapshot: DatasetSnapshot, window_days: int) -> Tuple[np.ndarray, Path]:
+        """
+        Label vector of a window aligned with the snapshot rows
+
+        Args:
+            snapshot: Dataset snapshot
+            window_days: Target window
+
+        Returns:
+            (int8 labels with -1 for periods censored in this window, saved .npy path)
+        """
+        rows = pd.read_sql(LABELS_QUERY, self.pg.engine, params={'window_days': window_days})
+        # A period has one label per window and one snapshot row per decision offset
+        position = pd.Index(rows['hp_period_id'].astype(str)).get_indexer(snapshot.keys['hp_period_id'])
+        found = position >= 0
+
+        labels = np.full(len(snapshot.keys), -1, dtype=np.int8)
+        labels[found] = rows['renewed'].to_numpy()[position[found]].astype(np.int8)
+
+        path = snapshot.labels_path(window_days)
+        np.save(path, labels)
+        logger.info(f"Window {window_days}d: {int((labels >= 0).sum())} of {len(labels)} rows labeled")
+        return labels, path
+
+    def xgboost_buffer(self, snapshot: DatasetSnapshot) -> Path:
+        """
+        XGBoost binary buffer of the snapshot (without labels), written once
+
+        The buffer keeps raw float values, not bins: XGBoost cannot save a
+        quantized (QuantileDMatrix) dataset. What it saves is the DMatrix
+        construction from the matrix; every process that loads the buffer
+        still sketches the hist bins on its first training, and its later
+        boosters reuse them while max_bin stays the same.
+        """
+        import xgboost as xgb
+
+        path = snapshot.xgboost_path
+        if not path.exists():
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            xgb.DMatrix(snapshot.matrix(), missing=np.nan).save_binary(str(tmp_path))
+            os.replace(tmp_path, path)
+            logger.info(f"Saved XGBoost buffer for dataset {snapshot.key}")
+        return path
@@ -0,0 +1,100 @@
+"""
+Versioned model configs
+Tuned hyperparameters saved as models/metadata/<model>_w<window>_v<N>.yaml;
+a new tuning run never overwrites an earlier version
+"""
+
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import yaml
+
+from ..utils.logger import setup_logger
+
+
+logger = setup_logger('model_config', log_file='logs/model_config.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+MODEL_CONFIG_DIR = PROJECT_ROOT / 'models' / 'metadata'
+
+
+def _versions(model: str, window_days: int, directory: Path, suffix: str = '.yaml') -> Dict[int, Path]:
+    """Existing versions of a model and window (files <model>_w<window>_v<N><suffix>)"""
+    pattern = re.compile(rf"^{re.escape(model)}_w{window_days}_v(\d+){re.escape(suffix)}$")
+    versions = {}
+    for path in directory.glob(f"{model}_w{window_days}_v*{suffix}"):
+        match = pattern.match(path.name)
+        if match:
+            versions[int(match.group(1))] = path
+    return versions
+
+
+def next_version(model: str, window_days: int, directory: Path, suffix: str) -> int:
+    """Next free version number of <model>_w<window>_v<N><suffix> files in a directory"""
+    return max(_versions(model, window_days, directory, suffix), default=0) + 1
+
+
+def save_model_config(
+    model: str,
+    window_days: int,
+    params: Dict[str, Any],
+    metadata: Optional[Dict[str, Any]] = None,
+    directory: Path = MODEL_CONFIG_DIR
+) -> Path:
+    """
+    Save params as the next config version
+
+    Args:
+        model: Model family (e.g. 'xgboost')
+        window_days: Target window
+        params: Model parameters
+        metadata: Extra fields (study, metric value, features, ...)
+        directory: Config directory
+
+    Returns:
+        Path of the written config
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    version = next_version(model, window_days, directory, '.yaml')
+    path = directory / f"{model}_w{window_days}_v{version}.yaml"
+
+    document = {
+        'model': model,
+        'window_days': window_days,
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'params': params,
+    }
+    document.update(metadata or {})
+
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(document, f, sort_keys=False, allow_unicode=True)
+
+    logger.info(f"Saved {model} config v{version} for window {window_days}d to {path}")
+    return path
+
+
+def load_model_config(
+    model: str,
+    window_days: int,
+    version: Optional[int] = None,
+    directory: Path = MODEL_CONFIG_DIR
+) -> Optional[Dict[str, Any]]:
+    """
+    Load a config version (default: the latest)
+
+    Returns:
+        Config document or None if the model has no saved configs
+    """
+    versions = _versions(model, window_days, directory)
+    if not versions:
+        return None
+
+    version = version if version is not None else max(versions)
+    if version not in versions:
+        raise ValueError(f"No config v{version} for {model} window {window_days}d")
+
+    with open(versions[version], 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
@@ -0,0 +1,551 @@
+"""
+Training pipeline
+Takes the training matrix from the dataset cache (a float32 .npy file) and
+runs cross-validation folds of several model families in a process pool;
+every worker maps the same file instead of receiving a copy of the data.
+Survival families are fitted on the counting-process intervals of
+ris.interval_hp instead, with folds grouped by user the same way, and
+their metrics go into the same report.
+"""
+
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from ..data_engineering.build_intervals import COVARIATES, IntervalBuilder
+from .dataset_cache import DatasetCache, DatasetSnapshot
+from .model_config import load_model_config, next_version
+
+
+logger = setup_logger('train', log_file='logs/train.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+REPORTS_DIR = PROJECT_ROOT / 'reports' / 'model_performance'
+MODELS_DIR = PROJECT_ROOT / 'models'
+
+
+# ---------------------------------------------------------------------
+# Models (built inside workers, one thread each)
+# ---------------------------------------------------------------------
+
+def _logistic_regression(params: Dict[str, Any]):
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    return make_pipeline(
+        SimpleImputer(strategy='median'),
+        StandardScaler(),
+        LogisticRegression(max_iter=1000, C=params.get('C', 1.0))
+    )
+
+
+def _xgboost(params: Dict[str, Any]):
+    from xgboost import XGBClassifier
+
+    params = {'max_depth': 6, 'learning_rate': 0.1, 'n_estimators': 300, **params}
+    return XGBClassifier(**params, eval_metric='auc', tree_method='hist', n_jobs=1)
+
+
+def _cox_ph(params: Dict[str, Any]):
+    from lifelines import CoxTimeVaryingFitter
+
+    return CoxTimeVaryingFitter(penalizer=params.get('penalizer', 0.1))
+
+
+MODEL_FACTORIES = {
+    'logistic_regression': _logistic_regression,
+    'xgboost': _xgboost,
+}
+
+# Fitted on ris.interval_hp rows (start_day, stop_day, event, COVARIATES), not on the matrix
+SURVIVAL_FACTORIES = {
+    'cox_ph': _cox_ph,
+}
+
+INTERVAL_COLUMNS = ['hp_period_id', 'user_id', 'start_day', 'stop_day', 'event'] + COVARIATES
+
+
+def model_params_from_config(
+    config: Dict[str, Any],
+    window_days: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Parameters of every model family
+
+    Base values come from the model section of config.yaml; for a given window
+    the latest tuned config in models/metadata (if any) overrides them.
+    """
+    model_config = config.get('model', {})
+    survival = dict(model_config.get('advanced', {}).get('survival', {}))
+    params = {
+        'logistic_regression': {},
+        'xgboost': dict(model_config.get('advanced', {}).get('xgboost', {})),
+        survival.pop('type', 'cox_ph'): survival,
+    }
+
+    if window_days is not None:
+        for model in params:
+            tuned = load_model_config(model, window_days)
+            if tuned:
+                params[model].update(tuned['params'])
+                logger.info(f"Using tuned {model} params v{tuned['version']} for window {window_days}d")
+    return params
+
+
+# ---------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------
+
+def fit_model(
+    model_name: str,
+    params: Dict[str, Any],
+    X: np.ndarray,
+    y: np.ndarray,
+    rows: np.ndarray,
+    groups: np.ndarray
+):
+    """
+    Fit a model family on the given rows
+
+    XGBoost with early_stopping_rounds holds out the rows of 10% of the users
+    as its evaluation set: each period is sampled at several decision offsets,
+    so a row-level split would stop on near-copies of fitted rows. Every
+    family is fitted on a copy of the rows only: XGBoost derives its hist
+    bin edges from the feature values it is given, so fitting on the whole
+    matrix would let test-fold values shape the bins.
+
+    Args:
+        model_name: Model family
+        params: Constructor parameters
+        X: Full feature matrix
+        y: Labels of all matrix rows
+        rows: Matrix rows to fit on
+        groups: user_id of each of the rows
+
+    Returns:
+        (fitted model, number of rows it was fitted on)
+    """
+    model = MODEL_FACTORIES[model_name](params)
+
+    fit_kwargs = {}
+    if model_name == 'xgboost' and params.get('early_stopping_rounds'):
+        from sklearn.model_selection import GroupShuffleSplit
+
+        splitter = GroupShuffleSplit(n_splits=1, test_size=0.1, random_state=42)
+        fit_idx, valid_idx = next(splitter.split(rows, groups=groups))
+        valid_rows, rows = rows[valid_idx], rows[fit_idx]
+        fit_kwargs = {'eval_set': [(X[valid_rows], y[valid_rows])], 'verbose': False}
+
+    model.fit(X[rows], y[rows], **fit_kwargs)
+    return model, len(rows)
+
+
+def task_memory_bytes(model_name: str, n_train: int, n_columns: int) -> int:
+    """
+    Rough peak memory of one fit outside the shared page cache
+
+    Every family holds the float32 training rows; logistic regression adds
+    the float64 imputed and scaled matrices, XGBoost one quantized byte per
+    value plus its gradient buffers.
+    """
+    if model_name == 'xgboost':
+        return n_train * n_columns * (4 + 1) + 16 * n_train
+    return n_train * n_columns * (4 + 8 + 8)
+
+
+def available_memory_bytes() -> Optional[int]:
+    """MemAvailable from /proc/meminfo (None where it cannot be read)"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _fit_fold(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fit and evaluate one (model, fold) pair inside a worker process
+
+    Only file paths and fold indices cross the process boundary; the matrix
+    is opened read-only as a memory map shared through the page cache.
+    """
+    from sklearn.metrics import average_precision_score, brier_score_loss, log_loss, roc_auc_score
+
+    X = np.load(task['matrix_path'], mmap_mode='r')
+    y = np.load(task['labels_path'], mmap_mode='r')
+    test_idx = task['test_idx']
+
+    started = time.monotonic()
+    # Early stopping holds out users of the training fold, never the test fold
+    model, n_train = fit_model(task['model'], task['params'], X, y, task['train_idx'], task['train_groups'])
+    proba = model.predict_proba(X[test_idx])[:, 1]
+    y_test = np.asarray(y[test_idx])
+
+    return {
+        'model': task['model'],
+        'fold': task['fold'],
+        'n_train': int(n_train),
+        'n_test': int(len(test_idx)),
+        'positive_rate': float(y_test.mean()),
+        'roc_auc': float(roc_auc_score(y_test, proba)) if len(np.unique(y_test)) > 1 else np.nan,
+        'pr_auc': float(average_precision_score(y_test, proba)),
+        'brier': float(brier_score_loss(y_test, proba)),
+        'log_loss': float(log_loss(y_test, proba, labels=[0, 1])),
+        'fit_seconds': round(time.monotonic() - started, 2),
+    }
+
+
+def fit_survival_fold(
+    model_name: str,
+    params: Dict[str, Any],
+    intervals: pd.DataFrame,
+    train_periods: np.ndarray,
+    test_periods: np.ndarray
+) -> Dict[str, Any]:
+    """
+    Fit a survival family on the intervals of the training periods and
+    evaluate it on the test periods
+
+    A test period is ranked by the partial hazard of its last interval;
+    higher hazard means an earlier renewal, so the concordance index is
+    taken on the negated hazard against (stop_day, event).
+
+    Args:
+        model_name: Survival family
+        params: Constructor parameters
+        intervals: INTERVAL_COLUMNS rows of all periods
+        train_periods: hp_period_id of the training periods
+        test_periods: hp_period_id of the test periods
+
+    Returns:
+        Metrics row of the fold (without model and fold)
+    """
+    from lifelines.utils import concordance_index
+
+    started = time.monotonic()
+    in_train = intervals['hp_period_id'].isin(train_periods).to_numpy()
+    train = intervals.loc[in_train, INTERVAL_COLUMNS].drop(columns='user_id')
+    train[COVARIATES] = train[COVARIATES].astype(np.float64)
+
+    model = SURVIVAL_FACTORIES[model_name](params)
+    model.fit(train, id_col='hp_period_id', event_col='event', start_col='start_day', stop_col='stop_day')
+
+    last = (
+        intervals[intervals['hp_period_id'].isin(test_periods).to_numpy()]
+        .sort_values(['hp_period_id', 'stop_day'])
+        .drop_duplicates('hp_period_id', keep='last')
+    )
+    hazard = np.asarray(model.predict_partial_hazard(last[COVARIATES].astype(np.float64)), dtype=np.float64)
+    events = last['event'].to_numpy(dtype=bool)
+
+    return {
+        'n_train': int(len(train_periods)),
+        'n_test': int(len(last)),
+        'positive_rate': float(events.mean()) if len(events) else np.nan,
+        'concordance': float(concordance_index(last['stop_day'].to_numpy(), -hazard, events)),
+        'fit_seconds': round(time.monotonic() - started, 2),
+    }
+
+
+# ---------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------
+
+class TrainingPipeline:
+    """Cross-validate model families on renewal labels of one target window"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        window_days: int,
+        features: Optional[List[str]] = None,
+        models: Optional[List[str]] = None,
+        config: Optional[Dict[str, Any]] = None,
+        max_workers: Optional[int] = None,
+        cache: Optional[DatasetCache] = None
+    ):
+        """
+        Initialize pipeline
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            window_days: Target window (one of model.target_windows)
+            features: Feature names (default: registered features listed in config.yaml)
+            models: Model families (default: all of MODEL_FACTORIES and SURVIVAL_FACTORIES)
+            config: Loaded config (default: config/config.yaml)
+            max_workers: Worker processes (default: number of CPUs, capped by available memory)
+            cache: Dataset cache shared between windows (default: a new one for the features)
+        """
+        self.pg = postgres_connector
+        self.config = config if config is not None else load_config()
+        self.window_days = window_days
+        self.cache = cache or DatasetCache(postgres_connector, features, self.config)
+        self.features = self.cache.features
+        self.models = models or list(MODEL_FACTORIES) + list(SURVIVAL_FACTORIES)
+        self.max_workers = max_workers
+        self.cv_folds = self.config.get('model', {}).get('baseline', {}).get('cv_folds', 5)
+        self.run_id = f"w{window_days}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+        available = list(MODEL_FACTORIES) + list(SURVIVAL_FACTORIES)
+        unknown = [m for m in self.models if m not in available]
+        if unknown:
+            raise ValueError(f"Unknown models: {unknown}. Available: {available}")
+
+    def load_dataset(self) -> Tuple[DatasetSnapshot, np.ndarray, Path]:
+        """
+        Cached feature snapshot and the labels of this window
+
+        Returns:
+            (snapshot, int8 labels with -1 for censored rows, labels .npy path)
+        """
+        snapshot = self.cache.get()
+        labels, labels_path = self.cache.labels(snapshot, self.window_days)
+        return snapshot, labels, labels_path
+
+    def _folds(self, snapshot: DatasetSnapshot, labels: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Stratified folds over labeled rows, grouped by user so periods of one
+        user never span train and test
+
+        Returns:
+            (train rows, test rows) pairs as snapshot row numbers
+        """
+        from sklearn.model_selection import StratifiedGroupKFold
+
+        rows = np.flatnonzero(labels >= 0)
+        splitter = StratifiedGroupKFold(n_splits=self.cv_folds, shuffle=True, random_state=42)
+        return [
+            (rows[train_idx], rows[test_idx])
+            for train_idx, test_idx in splitter.split(
+                np.zeros(len(rows)),
+                labels[rows],
+                groups=snapshot.keys['user_id'].to_numpy()[rows]
+            )
+        ]
+
+    def _max_workers(self, snapshot: DatasetSnapshot, folds: List[Tuple[np.ndarray, np.ndarray]]) -> int:
+        """
+        Worker count that fits the largest fits in available memory
+
+        An explicit max_workers is kept as the upper bound.
+        """
+        workers = self.max_workers or os.cpu_count() or 1
+        available = available_memory_bytes()
+        if available is None:
+            return workers
+
+        n_columns = len(snapshot.columns)
+        n_train = max(len(train_idx) for train_idx, _ in folds)
+        per_task = max(
+            task_memory_bytes(model, n_train, n_columns) for model in self.models if model in MODEL_FACTORIES
+        )
+        fit = max(1, int(available // max(per_task, 1)))
+        if fit < workers:
+            logger.info(f"Capping workers at {fit} by memory ({per_task / 2**30:.1f} GiB per fit, {available / 2**30:.1f} GiB available)")
+        return min(workers, fit)
+
+    def _survival_folds(self, intervals: pd.DataFrame) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Folds over HeroPass periods stratified by renewal and grouped by user,
+        like _folds
+
+        Returns:
+            (train hp_period_ids, test hp_period_ids) pairs
+        """
+        from sklearn.model_selection import StratifiedGroupKFold
+
+        periods = intervals.groupby('hp_period_id', sort=True).agg(
+            user_id=('user_id', 'first'),
+            event=('event', 'any')
+        )
+        period_ids = periods.index.to_numpy()
+        splitter = StratifiedGroupKFold(n_splits=self.cv_folds, shuffle=True, random_state=42)
+        return [
+            (period_ids[train_idx], period_ids[test_idx])
+            for train_idx, test_idx in splitter.split(
+                np.zeros(len(periods)),
+                periods['event'].to_numpy(dtype=int),
+                groups=periods['user_id'].to_numpy()
+            )
+        ]
+
+    def run_survival(self, params: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Cross-validate the survival families on ris.interval_hp
+
+        Intervals are built with the longest target window as follow-up (see
+        IntervalBuilder), so these metrics do not change between windows.
+        Folds run in this process: the interval frame is not shared with the
+        matrix workers.
+
+        Returns:
+            Metrics rows, one per (model, fold)
+        """
+        models = [model for model in self.models if model in SURVIVAL_FACTORIES]
+        if not models:
+            return []
+
+        intervals = IntervalBuilder(self.pg, config=self.config).load(INTERVAL_COLUMNS)
+        intervals['user_id'] = intervals['user_id'].astype(str)
+        folds = self._survival_folds(intervals)
+        logger.info(f"Running {len(models) * len(folds)} survival fits on {len(intervals)} intervals")
+
+        results = []
+        for model in models:
+            for fold, (train_periods, test_periods) in enumerate(folds):
+                try:
+                    result = fit_survival_fold(model, params.get(model, {}), intervals, train_periods, test_periods)
+                except Exception as e:
+                    logger.error(f"{model} fold {fold} failed: {e}")
+                    result = {'error': str(e)}
+                results.append({'model': model, 'fold': fold, **result})
+                logger.info(f"Finished {model} fold {fold}")
+        return results
+
+    def run(self) -> pd.DataFrame:
+        """
+        Run cross-validation of all models and write the metrics report
+
+        Returns:
+            DataFrame with one row per (model, fold)
+        """
+        snapshot, labels, labels_path = self.load_dataset()
+        folds = self._folds(snapshot, labels)
+        params = model_params_from_config(self.config, self.window_days)
+        user_ids = snapshot.keys['user_id'].astype(str).to_numpy()
+        matrix_models = [model for model in self.models if model in MODEL_FACTORIES]
+        tasks = [
+            {
+                'model': model,
+                'params': params.get(model, {}),
+                'fold': fold,
+                'train_idx': train_idx,
+                'train_groups': user_ids[train_idx],
+                'test_idx': test_idx,
+                'matrix_path': str(snapshot.matrix_path),
+                'labels_path': str(labels_path),
+            }
+            for model in matrix_models
+            for fold, (train_idx, test_idx) in enumerate(folds)
+        ]
+
+        results = []
+        if tasks:
+            results = self._run_tasks(tasks, self._max_workers(snapshot, folds), len(matrix_models), len(folds))
+        results += self.run_survival(params)
+
+        report = pd.DataFrame(results).sort_values(['model', 'fold']).reset_index(drop=True)
+        self._write_report(report, snapshot, int((labels >= 0).sum()))
+        return report
+
+    def _run_tasks(
+        self,
+        tasks: List[Dict[str, Any]],
+        max_workers: int,
+        n_models: int,
+        n_folds: int
+    ) -> List[Dict[str, Any]]:
+        """Fit the matrix folds in the process pool"""
+        logger.info(f"Running {len(tasks)} fits ({n_models} models x {n_folds} folds, {max_workers} workers)")
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_fit_fold, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"{task['model']} fold {task['fold']} failed: {e}")
+                    result = {'model': task['model'], 'fold': task['fold'], 'error': str(e)}
+                results.append(result)
+                logger.info(f"Finished {task['model']} fold {task['fold']}")
+        return results
+
+    def _write_report(self, report: pd.DataFrame, snapshot: DatasetSnapshot, n_rows: int):
+        """Save per-fold metrics (CSV) and the per-model summary (JSON)"""
+        REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+        report.to_csv(REPORTS_DIR / f"cv_{self.run_id}.csv", index=False)
+
+        metrics = [col for col in ('roc_auc', 'pr_auc', 'brier', 'log_loss', 'concordance') if col in report.columns]
+        summary = {
+            'run_id': self.run_id,
+            'window_days': self.window_days,
+            'n_rows': n_rows,
+            'features': snapshot.features,
+            'dataset': snapshot.key,
+            'n_columns': len(snapshot.columns),
+            'cv_folds': self.cv_folds,
+            'models': {
+                model: {
+                    metric: {'mean': float(group[metric].mean()), 'std': float(group[metric].std())}
+                    for metric in metrics
+                    if group[metric].notna().any()
+                }
+                for model, group in report.groupby('model')
+            },
+        }
+        with open(REPORTS_DIR / f"cv_{self.run_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        logger.info(f"Report saved to {REPORTS_DIR / f'cv_{self.run_id}.json'}")
+
+    def fit_final(self, model_name: str) -> Path:
+        """
+        Fit a model family on all labeled rows of the window and save it
+
+        The pickle goes to models/<model>_w<window>_v<N>.pkl with a .json
+        sidecar holding the matrix columns the model expects.
+
+        Args:
+            model_name: Model family (survival families are cross-validated only)
+
+        Returns:
+            Path of the pickle
+        """
+        if model_name not in MODEL_FACTORIES:
+            raise ValueError(f"{model_name} has no final fit for scoring. Available: {list(MODEL_FACTORIES)}")
+
+        snapshot, labels, _ = self.load_dataset()
+        rows = np.flatnonzero(labels >= 0)
+        params = model_params_from_config(self.config, self.window_days).get(model_name, {})
+        groups = snapshot.keys['user_id'].astype(str).to_numpy()[rows]
+        model, n_train = fit_model(model_name, params, snapshot.matrix(), labels, rows, groups)
+
+        MODELS_DIR.mkdir(parents=True, exist_ok=True)
+        version = next_version(model_name, self.window_days, MODELS_DIR, '.pkl')
+        path = MODELS_DIR / f"{model_name}_w{self.window_days}_v{version}.pkl"
+        with open(path, 'wb') as f:
+            pickle.dump(model, f)
+
+        with open(path.with_suffix('.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'model': model_name,
+                'window_days': self.window_days,
+                'version': path.stem,
+                'dataset': snapshot.key,
+                'n_train': int(n_train),
+                'params': params,
+                'features': snapshot.features,
+                'columns': snapshot.columns,
+                'decision_offsets_days': snapshot.decision_offsets,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+            }, f, indent=2, ensure_ascii=False)
+
+        logger.info(f"Saved {model_name} for window {self.window_days}d to {path}")
+        return path
@@ -0,0 +1,285 @@
+"""
+Hyperparameter tuning
+Optuna study shared by several local worker processes through file storage
+(journal file by default, SQLite URL optional). Every worker loads the
+cached XGBoost buffer of the dataset snapshot once and reuses it for all of
+its trials; trials that fall behind are pruned at intermediate boosting rounds.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from .model_config import save_model_config
+from .dataset_cache import DatasetCache, load_dmatrix
+
+
+logger = setup_logger('tuning', log_file='logs/tuning.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+TUNING_DIR = PROJECT_ROOT / 'models' / 'tuning'
+
+DEFAULT_TUNING = {
+    'n_trials': 100,
+    'n_workers': 4,
+    'report_every': 10,
+    'pruning_warmup_rounds': 50,
+    'validation_share': 0.2,
+}
+
+
+def suggest_params(trial) -> Dict[str, Any]:
+    """XGBoost search space (names accepted by both xgb.train and XGBClassifier)"""
+    return {
+        'max_depth': trial.suggest_int('max_depth', 3, 10),
+        'learning_rate': trial.suggest_float('learning_rate', 0.005, 0.3, log=True),
+        'min_child_weight': trial.suggest_float('min_child_weight', 1.0, 50.0, log=True),
+        'subsample': trial.suggest_float('subsample', 0.5, 1.0),
+        'colsample_bytree': trial.suggest_float('colsample_bytree', 0.4, 1.0),
+        'reg_lambda': trial.suggest_float('reg_lambda', 1e-3, 10.0, log=True),
+        'reg_alpha': trial.suggest_float('reg_alpha', 1e-3, 10.0, log=True),
+    }
+
+
+def open_storage(storage: str):
+    """Optuna storage: SQLite/RDB URL as is, any other value is a journal file path"""
+    import optuna
+
+    if '://' in storage:
+        return storage
+    return optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(storage))
+
+
+def _pruner(job: Dict[str, Any]):
+    """Pruners are not persisted in the storage, so every worker builds the same one"""
+    import optuna
+
+    return optuna.pruners.MedianPruner(
+        n_startup_trials=5,
+        n_warmup_steps=job['pruning_warmup_rounds'],
+        interval_steps=job['report_every']
+    )
+
+
+def _pruning_callback(trial, report_every: int):
+    """Report validation AUC every `report_every` rounds and stop trials the pruner rejects"""
+    import optuna
+    import xgboost as xgb
+
+    class PruningCallback(xgb.callback.TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log):
+            if (epoch + 1) % report_every:
+                return False
+            trial.report(evals_log['valid']['auc'][-1], epoch)
+            if trial.should_prune():
+                raise optuna.TrialPruned(f"Pruned at round {epoch + 1}")
+            return False
+
+    return PruningCallback()
+
+
+def _tuning_worker(job: Dict[str, Any]) -> int:
+    """
+    Run trials of a shared study until the study has n_trials finished trials
+
+    The snapshot buffer is loaded and split once per process and reused by
+    all trials of the process.
+
+    Returns:
+        Number of trials run by this worker
+    """
+    import optuna
+    import xgboost as xgb
+    from optuna.study import MaxTrialsCallback
+    from optuna.trial import TrialState
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(
+        study_name=job['study_name'],
+        storage=open_storage(job['storage']),
+        pruner=_pruner(job)
+    )
+    labels = np.load(job['labels_path'])
+    dtrain = load_dmatrix(job['buffer_path'], labels, np.load(job['train_rows_path']))
+    dvalid = load_dmatrix(job['buffer_path'], labels, np.load(job['valid_rows_path']))
+    base = job['base_params']
+
+    def objective(trial) -> float:
+        params = {
+            'objective': 'binary:logistic',
+            'eval_metric': 'auc',
+            'tree_method': 'hist',
+            'nthread': job['nthread'],
+            **suggest_params(trial),
+        }
+        booster = xgb.train(
+            params,
+            dtrain,
+            num_boost_round=base.get('n_estimators', 500),
+            evals=[(dvalid, 'valid')],
+            early_stopping_rounds=base.get('early_stopping_rounds', 50),
+            callbacks=[_pruning_callback(trial, job['report_every'])],
+            verbose_eval=False
+        )
+        trial.set_user_attr('best_iteration', int(booster.best_iteration))
+        return float(booster.best_score)
+
+    finished = (TrialState.COMPLETE, TrialState.PRUNED)
+    before = len(study.get_trials(deepcopy=False))
+    study.optimize(
+        objective,
+        n_trials=job['n_trials'],
+        timeout=job['timeout'],
+        callbacks=[MaxTrialsCallback(job['n_trials'], states=finished)]
+    )
+    return len(study.get_trials(deepcopy=False)) - before
+
+
+class XGBoostTuner:
+    """Tune XGBoost for one target window with parallel local workers"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        window_days: int,
+        features: Optional[List[str]] = None,
+        config: Optional[Dict[str, Any]] = None,
+        n_trials: Optional[int] = None,
+        n_workers: Optional[int] = None,
+        storage: Optional[str] = None,
+        study_name: Optional[str] = None,
+        cache: Optional[DatasetCache] = None
+    ):
+        """
+        Initialize tuner
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            window_days: Target window (one of model.target_windows)
+            features: Feature names (default: registered features listed in config.yaml)
+            config: Loaded config (default: config/config.yaml)
+            n_trials: Finished trials (complete or pruned) to run (default: model.tuning.n_trials)
+            n_workers: Worker processes (default: model.tuning.n_workers)
+            storage: Journal file path or SQLite URL (default: models/tuning/<study>.log)
+            study_name: Study to create or resume (default: xgboost_w<window>_<timestamp>)
+            cache: Dataset cache shared between windows (default: a new one for the features)
+        """
+        self.pg = postgres_connector
+        self.config = config if config is not None else load_config()
+        self.window_days = window_days
+        self.cache = cache or DatasetCache(postgres_connector, features, self.config)
+
+        model_config = self.config.get('model', {})
+        self.settings = {**DEFAULT_TUNING, **model_config.get('tuning', {})}
+        self.n_trials = n_trials or self.settings['n_trials']
+        self.n_workers = n_workers or self.settings['n_workers']
+        self.base_params = dict(model_config.get('advanced', {}).get('xgboost', {}))
+
+        self.study_name = study_name or f"xgboost_w{window_days}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.storage = storage or str(TUNING_DIR / f"{self.study_name}.log")
+
+    def prepare_datasets(self) -> Dict[str, Any]:
+        """
+        Cached snapshot buffer, window labels and a train / validation split
+
+        The split covers rows labeled in this window and is grouped by user,
+        as in cross-validation.
+
+        Returns:
+            Paths of the buffer, labels and split rows, and dataset metadata
+        """
+        from sklearn.model_selection import GroupShuffleSplit
+
+        snapshot = self.cache.get()
+        labels, labels_path = self.cache.labels(snapshot, self.window_days)
+        buffer_path = self.cache.xgboost_buffer(snapshot)
+
+        rows = np.flatnonzero(labels >= 0)
+        splitter = GroupShuffleSplit(n_splits=1, test_size=self.settings['validation_share'], random_state=42)
+        train_idx, valid_idx = next(splitter.split(rows, groups=snapshot.keys['user_id'].to_numpy()[rows]))
+
+        TUNING_DIR.mkdir(parents=True, exist_ok=True)
+        paths = {}
+        for part, idx in (('train', train_idx), ('valid', valid_idx)):
+            path = TUNING_DIR / f"{self.study_name}_{part}_rows.npy"
+            np.save(path, rows[idx])
+            paths[f"{part}_rows_path"] = str(path)
+
+        logger.info(f"Tuning on dataset {snapshot.key}: {len(train_idx)} train / {len(valid_idx)} valid rows")
+        return {
+            **paths,
+            'buffer_path': str(buffer_path),
+            'labels_path': str(labels_path),
+            'dataset': snapshot.key,
+            'features': snapshot.features,
+            'n_rows': int(len(rows)),
+        }
+
+    def run(self, timeout: Optional[int] = None) -> Path:
+        """
+        Run the study and save the best params as a new xgboost config version
+
+        Args:
+            timeout: Seconds per worker (default: no limit)
+
+        Returns:
+            Path of the written model config
+        """
+        import optuna
+
+        dataset = self.prepare_datasets()
+        study = optuna.create_study(
+            study_name=self.study_name,
+            storage=open_storage(self.storage),
+            direction='maximize',
+            load_if_exists=True
+        )
+
+        job = {
+            'study_name': self.study_name,
+            'storage': self.storage,
+            'buffer_path': dataset['buffer_path'],
+            'labels_path': dataset['labels_path'],
+            'train_rows_path': dataset['train_rows_path'],
+            'valid_rows_path': dataset['valid_rows_path'],
+            'base_params': self.base_params,
+            'n_trials': self.n_trials,
+            'timeout': timeout,
+            'nthread': max(1, (os.cpu_count() or 1) // self.n_workers),
+            'report_every': self.settings['report_every'],
+            'pruning_warmup_rounds': self.settings['pruning_warmup_rounds'],
+        }
+
+        logger.info(f"Study {self.study_name}: {self.n_trials} trials on {self.n_workers} workers")
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            runs = list(executor.map(_tuning_worker, [job] * self.n_workers))
+        logger.info(f"Workers ran {runs} trials")
+
+        study = optuna.load_study(study_name=self.study_name, storage=open_storage(self.storage))
+        best = study.best_trial
+        states = [trial.state.name for trial in study.get_trials(deepcopy=False)]
+
+        params = {**best.params, 'n_estimators': best.user_attrs['best_iteration'] + 1}
+        return save_model_config(
+            'xgboost',
+            self.window_days,
+            params,
+            metadata={
+                'study_name': self.study_name,
+                'storage': self.storage,
+                'best_trial': best.number,
+                'valid_auc': float(best.value),
+                'trials_complete': states.count('COMPLETE'),
+                'trials_pruned': states.count('PRUNED'),
+                'dataset': dataset['dataset'],
+                'n_rows': dataset['n_rows'],
+                'features': dataset['features'],
+            }
+        )
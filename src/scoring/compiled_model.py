@@ -0,0 +1,520 @@
+"""
+Compiled tree ensembles
+Trained XGBoost / LightGBM / CatBoost models flattened into one node table
+(feature, threshold, children, leaf value, cover) saved as a .npy file that scoring
+memory-maps. Prediction is a vectorized traversal of all trees for a block
+of rows at once, with no ML library import at scoring time.
+"""
+
+import json
+import pickle
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.logger import setup_logger
+
+
+logger = setup_logger('compiled_model', log_file='logs/compiled_model.log')
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+COMPILED_DIR = PROJECT_ROOT / 'models' / 'compiled'
+
+FORMAT_VERSION = 2
+
+# Version 1 tables have no cover column (prediction only, no explanations)
+SUPPORTED_FORMATS = (1, 2)
+
+NODE_DTYPE = np.dtype([
+    ('tree', np.int32),
+    ('feature', np.int32),         # -1 for leaves
+    ('threshold', np.float64),
+    ('left', np.int32),            # leaves point to themselves
+    ('right', np.int32),
+    ('default_left', np.bool_),    # direction of missing values
+    ('missing', np.int8),          # MISSING_* handling of the split
+    ('value', np.float64),         # leaf value (margin contribution)
+    ('cover', np.float64),         # training weight reaching the node (hessian sum / row count)
+])
+
+# NaN is compared as 0.0 / NaN and 0.0 take the default direction / NaN takes the default direction
+MISSING_AS_ZERO, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+
+# LightGBM treats |x| <= kZeroThreshold as zero in Zero-missing splits
+ZERO_THRESHOLD = 1e-35
+
+
+# ---------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------
+
+class _NodeTable:
+    """Accumulates nodes of consecutive trees"""
+
+    def __init__(self):
+        self.rows: List[Tuple] = []
+        self.max_depth = 0
+
+    def add_leaf(self, tree: int, value: float, cover: float) -> int:
+        index = len(self.rows)
+        self.rows.append((tree, -1, 0.0, index, index, True, MISSING_NAN, value, cover))
+        return index
+
+    def add_split(
+        self, tree: int, feature: int, threshold: float, default_left: bool, missing: int, cover: float
+    ) -> int:
+        index = len(self.rows)
+        self.rows.append((tree, feature, threshold, -1, -1, default_left, missing, 0.0, cover))
+        return index
+
+    def link(self, index: int, left: int, right: int):
+        row = list(self.rows[index])
+        row[3], row[4] = left, right
+        self.rows[index] = tuple(row)
+
+    def to_array(self) -> np.ndarray:
+        return np.array(self.rows, dtype=NODE_DTYPE)
+
+
+def _xgboost_nodes(booster) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Node table of an XGBoost Booster (gbtree, binary:logistic or regression)"""
+    model = json.loads(booster.save_raw('json'))['learner']
+    gbtree = model['gradient_booster']
+    if gbtree['name'] != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost booster: {gbtree['name']}")
+
+    trees = gbtree['model']['trees']
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        # Predictions of an early-stopped model use the trees up to the best iteration
+        indptr = gbtree['model'].get('iteration_indptr')
+        n_trees = indptr[int(best_iteration) + 1] if indptr else int(best_iteration) + 1
+        trees = trees[:n_trees]
+
+    table = _NodeTable()
+    for t, tree in enumerate(trees):
+        if any(tree.get('split_type', [])):
+            raise ValueError("Categorical XGBoost splits are not supported")
+        offset = len(table.rows)
+        left, right = tree['left_children'], tree['right_children']
+        cover = tree['sum_hessian']
+        depth = {0: 0}
+        for node in range(len(left)):
+            if left[node] == -1:
+                # Leaf values are stored in split_conditions
+                table.add_leaf(t, tree['split_conditions'][node], cover[node])
+            else:
+                table.add_split(
+                    t, tree['split_indices'][node], np.float32(tree['split_conditions'][node]),
+                    bool(tree['default_left'][node]), MISSING_NAN, cover[node]
+                )
+                table.link(offset + node, offset + left[node], offset + right[node])
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+        table.max_depth = max(table.max_depth, max(depth.values()))
+
+    base_score = float(str(model['learner_model_param']['base_score']).strip('[]'))
+    objective = model['objective']['name']
+    logistic = objective in ('binary:logistic', 'reg:logistic')
+    return table.to_array(), {
+        'library': 'xgboost',
+        'objective': objective,
+        'link': 'logistic' if logistic else 'identity',
+        'base_margin': float(np.log(base_score / (1 - base_score))) if logistic else base_score,
+        'comparison': '<',
+        'input_dtype': 'float32',
+        'max_depth': table.max_depth,
+        'n_trees': len(trees),
+        'feature_names': model.get('feature_names') or None,
+    }
+
+
+def _lightgbm_nodes(booster) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Node table of a LightGBM Booster (binary or regression)"""
+    model = booster.dump_model(num_iteration=booster.best_iteration or None)
+    if model.get('num_tree_per_iteration', 1) != 1:
+        raise ValueError("Multiclass LightGBM models are not supported")
+
+    missing_types = {'None': MISSING_AS_ZERO, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+    table = _NodeTable()
+
+    def add(tree: int, node: Dict[str, Any], depth: int) -> int:
+        if 'leaf_value' in node:
+            table.max_depth = max(table.max_depth, depth)
+            return table.add_leaf(tree, node['leaf_value'], node.get('leaf_count', 0))
+        if node['decision_type'] != '<=':
+            raise ValueError("Categorical LightGBM splits are not supported")
+        index = table.add_split(
+            tree, node['split_feature'], node['threshold'],
+            bool(node['default_left']), missing_types[node['missing_type']], node.get('internal_count', 0)
+        )
+        left = add(tree, node['left_child'], depth + 1)
+        right = add(tree, node['right_child'], depth + 1)
+        table.link(index, left, right)
+        return index
+
+    for t, tree in enumerate(model['tree_info']):
+        add(t, tree['tree_structure'], 0)
+
+    objective = model.get('objective', 'regression').split()
+    logistic = objective[0] in ('binary', 'cross_entropy')
+    sigmoid = 1.0
+    for option in objective[1:]:
+        if option.startswith('sigmoid:'):
+            sigmoid = float(option.split(':')[1])
+
+    return table.to_array(), {
+        'library': 'lightgbm',
+        'objective': objective[0],
+        'link': 'logistic' if logistic else 'identity',
+        'sigmoid': sigmoid,
+        'base_margin': 0.0,
+        'comparison': '<=',
+        'input_dtype': 'float64',
+        'max_depth': table.max_depth,
+        'n_trees': len(model['tree_info']),
+        'feature_names': model.get('feature_names'),
+    }
+
+
+def _catboost_nodes(model) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Node table of a CatBoost model with numeric features (oblivious trees unrolled)"""
+    import os
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.json')
+        model.save_model(path, format='json')
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+
+    features_info = document['features_info']
+    if features_info.get('categorical_features'):
+        raise ValueError("CatBoost models with categorical features are not supported")
+
+    float_features = {f['feature_index']: f for f in features_info['float_features']}
+    scale, bias = document.get('scale_and_bias', [1.0, [0.0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+
+    table = _NodeTable()
+    for t, tree in enumerate(document['oblivious_trees']):
+        splits = tree['splits']
+        values = tree['leaf_values']
+        weights = tree.get('leaf_weights', [0.0] * len(values))
+        depth = len(splits)
+        table.max_depth = max(table.max_depth, depth)
+
+        # Leaf index bit i is the result (x > border) of splits[i]; the unrolled
+        # tree tests the last split at the root so that leaves come out in order
+        def add(level: int, leaf: int) -> int:
+            if level < 0:
+                return table.add_leaf(t, scale * values[leaf], weights[leaf])
+            split = splits[level]
+            feature = float_features[split['float_feature_index']]
+            nan_goes_right = feature.get('nan_value_treatment') == 'AsTrue'
+            # Bits 0..level are still free below this node
+            cover = sum(weights[leaf:leaf + (2 << level)])
+            index = table.add_split(
+                t, feature['flat_feature_index'], np.float32(split['border']), not nan_goes_right, MISSING_NAN, cover
+            )
+            left = add(level - 1, leaf)
+            right = add(level - 1, leaf | (1 << level))
+            table.link(index, left, right)
+            return index
+
+        add(depth - 1, 0)
+
+    loss = model.get_all_params().get('loss_function', '')
+    logistic = loss in ('Logloss', 'CrossEntropy')
+    return table.to_array(), {
+        'library': 'catboost',
+        'objective': loss,
+        'link': 'logistic' if logistic else 'identity',
+        'base_margin': float(bias),
+        'comparison': '<=',
+        'input_dtype': 'float32',
+        'max_depth': table.max_depth,
+        'n_trees': len(document['oblivious_trees']),
+        'feature_names': model.feature_names_ or None,
+    }
+
+
+def flatten_model(model) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Node table and metadata of a trained tree ensemble
+
+    Args:
+        model: XGBoost Booster / XGBClassifier, LightGBM Booster / LGBMClassifier
+               or CatBoost model
+
+    Returns:
+        (nodes with NODE_DTYPE, metadata)
+    """
+    module = type(model).__module__.split('.')[0]
+    if module == 'xgboost':
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        return _xgboost_nodes(booster)
+    if module == 'lightgbm':
+        booster = model.booster_ if hasattr(model, 'booster_') else model
+        return _lightgbm_nodes(booster)
+    if module == 'catboost':
+        return _catboost_nodes(model)
+    raise ValueError(f"Unsupported model type: {type(model).__name__}")
+
+
+def export_model(
+    model,
+    name: str,
+    feature_names: Optional[List[str]] = None,
+    directory: Path = COMPILED_DIR,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Path:
+    """
+    Flatten a trained model and save it as <name>.npy (nodes) + <name>.json (metadata)
+
+    Args:
+        model: Trained tree ensemble
+        name: Model version name (e.g. 'xgboost_w30_v1')
+        feature_names: Matrix columns in model input order (default: names stored in the model)
+        directory: Output directory
+        metadata: Extra fields kept in the sidecar (window_days, dataset, ...)
+
+    Returns:
+        Path of the node file
+    """
+    nodes, meta = flatten_model(model)
+    meta.update(metadata or {})
+    meta.update({
+        'format_version': FORMAT_VERSION,
+        'model_version': name,
+        'feature_names': feature_names or meta.get('feature_names'),
+        'exported_at': datetime.now().isoformat(timespec='seconds'),
+    })
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.npy"
+    np.save(path, nodes)
+    with open(directory / f"{name}.json", 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+
+    logger.info(f"Exported {meta['library']} model {name}: {meta['n_trees']} trees, {len(nodes)} nodes")
+    return path
+
+
+def export_pickle(pickle_path: Path, directory: Path = COMPILED_DIR) -> Path:
+    """
+    Export a pickled model; columns come from the .json sidecar written by training
+
+    Args:
+        pickle_path: models/<model>_w<window>_v<N>.pkl
+
+    Returns:
+        Path of the node file
+    """
+    pickle_path = Path(pickle_path)
+    with open(pickle_path, 'rb') as f:
+        model = pickle.load(f)
+
+    training = {}
+    sidecar = pickle_path.with_suffix('.json')
+    if sidecar.exists():
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            training = json.load(f)
+
+    metadata = {
+        key: training[key]
+        for key in ('window_days', 'dataset', 'features', 'decision_offsets_days')
+        if key in training
+    }
+    return export_model(model, pickle_path.stem, training.get('columns'), directory, metadata)
+
+
+# ---------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------
+
+def row_hashes(matrix: np.ndarray) -> np.ndarray:
+    """
+    64-bit hash of every row of a numeric matrix
+
+    Columns are folded in one at a time through the splitmix64 finalizer, so
+    the whole matrix is hashed with a few vector ops per column. Float values
+    are hashed by their bits, with -0.0 and every NaN normalized first.
+
+    Returns:
+        int64 array (fits a BIGINT column)
+    """
+    matrix = np.asarray(matrix)
+    if matrix.dtype.kind == 'f':
+        words = np.where(np.isnan(matrix), np.nan, matrix.astype(np.float64) + 0.0)
+    else:
+        words = matrix.astype(np.int64)
+    words = np.ascontiguousarray(words).view(np.uint64)
+
+    h = np.full(len(words), 0x9E3779B97F4A7C15, dtype=np.uint64)
+    for column in words.T:
+        h = h ^ column
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        h = h ^ (h >> np.uint64(31))
+    return h.view(np.int64)
+
+
+@dataclass
+class CompiledModel:
+    """Flattened tree ensemble with vectorized prediction"""
+
+    nodes: np.ndarray
+    meta: Dict[str, Any]
+
+    def __post_init__(self):
+        # Column views of the node table (no copies for a memory-mapped file)
+        self.feature = np.maximum(self.nodes['feature'], 0)
+        self.is_leaf = self.nodes['feature'] < 0
+        self.threshold = self.nodes['threshold']
+        self.left = self.nodes['left']
+        self.right = self.nodes['right']
+        self.default_left = self.nodes['default_left']
+        self.missing = self.nodes['missing']
+        self.value = self.nodes['value']
+        self.roots = np.searchsorted(self.nodes['tree'], np.arange(self.meta['n_trees']))
+        self.input_dtype = np.dtype(self.meta['input_dtype'])
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> 'CompiledModel':
+        """
+        Load a compiled model
+
+        Args:
+            path: Node file (<name>.npy) or its name without suffix
+            mmap: Memory-map the node table
+        """
+        path = Path(path).with_suffix('.npy')
+        with open(path.with_suffix('.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported compiled model format: {meta.get('format_version')}")
+        return cls(np.load(path, mmap_mode='r' if mmap else None), meta)
+
+    @property
+    def version(self) -> str:
+        return self.meta['model_version']
+
+    @property
+    def feature_names(self) -> Optional[List[str]]:
+        return self.meta.get('feature_names')
+
+    def split_bins(self, X: np.ndarray) -> np.ndarray:
+        """
+        Position of every value among the split thresholds of its feature
+
+        Two rows with equal bins reach the same leaves in every tree, so the
+        bins are the part of a feature vector the prediction depends on.
+        Features the model never splits on always get bin 0. NaN gets bin -1,
+        and values LightGBM treats as zero get -2 on features with
+        zero-as-missing splits.
+
+        Args:
+            X: Feature matrix in model column order
+
+        Returns:
+            int32 array of the shape of X
+        """
+        X = np.asarray(X, dtype=self.input_dtype).astype(np.float64, copy=False)
+        splits = ~self.is_leaf
+        side = 'right' if self.meta['comparison'] == '<' else 'left'
+
+        bins = np.zeros(X.shape, dtype=np.int32)
+        for feature in np.unique(self.feature[splits]):
+            on_feature = splits & (self.feature == feature)
+            thresholds = np.unique(self.threshold[on_feature])
+            x = X[:, feature]
+            bins[:, feature] = np.searchsorted(thresholds, x, side=side)
+            if np.any(self.missing[on_feature] == MISSING_ZERO):
+                bins[np.abs(x) <= ZERO_THRESHOLD, feature] = -2
+            bins[np.isnan(x), feature] = -1
+        return bins
+
+    def fingerprints(self, X: np.ndarray) -> np.ndarray:
+        """
+        Per-row fingerprint of the split bins
+
+        Rows with equal fingerprints get the same prediction from this model.
+
+        Returns:
+            int64 hash per row
+        """
+        return row_hashes(self.split_bins(X))
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """
+        Leaf node reached in every tree
+
+        Args:
+            X: Feature matrix (n_rows, n_features) in model column order
+
+        Returns:
+            int array (n_rows, n_trees) of node indices
+        """
+        # Thresholds are compared at the precision the library reads inputs with
+        X = np.asarray(X, dtype=self.input_dtype).astype(np.float64, copy=False)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+
+        for _ in range(self.meta['max_depth']):
+            go_left = self.go_left(node, X[rows, self.feature[node]])
+            # Leaves link to themselves, so finished trees stay in place
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        return node
+
+    def go_left(self, node, x: np.ndarray) -> np.ndarray:
+        """
+        Split decisions, including the missing-value rules of the library
+
+        Args:
+            node: Split node index (scalar or array broadcast with x)
+            x: float64 values of the split feature
+
+        Returns:
+            bool array, True where the value goes to the left child
+        """
+        missing = self.missing[node]
+        nan = np.isnan(x)
+
+        x = np.where(nan & (missing == MISSING_AS_ZERO), 0.0, x)
+        use_default = (nan & (missing == MISSING_NAN)) | (
+            (missing == MISSING_ZERO) & (nan | (np.abs(x) <= ZERO_THRESHOLD))
+        )
+        if self.meta['comparison'] == '<':
+            go_left = x < self.threshold[node]
+        else:
+            go_left = x <= self.threshold[node]
+        return np.where(use_default, self.default_left[node], go_left)
+
+    def predict_margin(self, X: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """Raw ensemble output, computed in row blocks to bound the (rows x trees) state"""
+        X = np.asarray(X)
+        margin = np.empty(len(X))
+        for start in range(0, len(X), chunk_size):
+            leaves = self.leaves(X[start:start + chunk_size])
+            margin[start:start + chunk_size] = self.value[leaves].sum(axis=1)
+        return margin + self.meta['base_margin']
+
+    def predict(self, X: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """
+        Predictions in the output space of the original model
+
+        Args:
+            X: Feature matrix in model column order
+            chunk_size: Rows per traversal block
+
+        Returns:
+            Probabilities of the positive class (logistic models) or raw values
+        """
+        margin = self.predict_margin(X, chunk_size)
+        if self.meta['link'] == 'logistic':
+            return 1.0 / (1.0 + np.exp(-self.meta.get('sigmoid', 1.0) * margin))
+        return margin
@@ -0,0 +1,288 @@
+"""
+Score explanations
+TreeSHAP contributions of compiled tree models, computed for a whole chunk
+of users at once, reduced to the top-k features per user and cached in
+ris.model_explanations under (model_version, feature_fingerprint). Users
+with a fingerprint already explained by the same model reuse the cached rows.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from ..data_engineering.postgres_loader import PostgresLoader
+from .compiled_model import CompiledModel
+
+
+logger = setup_logger('explanations', log_file='logs/explanations.log')
+
+DEFAULT_EXPLANATIONS = {
+    'top_k': 5,
+    'at_risk_only': True,
+}
+
+CACHED_FINGERPRINTS_QUERY = """
+    select distinct feature_fingerprint
+    from ris.model_explanations
+    where model_version = %(model_version)s
+"""
+
+EXPLANATION_COLUMNS = ['model_version', 'feature_fingerprint', 'rank', 'feature', 'contribution']
+
+
+# ---------------------------------------------------------------------
+# TreeSHAP
+# ---------------------------------------------------------------------
+
+class _TreeShap:
+    """
+    Path-dependent TreeSHAP (Lundberg et al., Algorithm 2) over all rows at once
+
+    The recursion walks every tree once; the per-row state (one fractions and
+    path weights) is kept as arrays, so the Python cost does not grow with
+    the number of rows.
+    """
+
+    def __init__(self, model: CompiledModel, X: np.ndarray):
+        self.model = model
+        self.X = np.asarray(X, dtype=model.input_dtype).astype(np.float64, copy=False)
+        self.n = len(self.X)
+        self.phi = np.zeros(self.X.shape)
+
+        nodes = model.nodes
+        self.feature = nodes['feature'].tolist()
+        self.left = nodes['left'].tolist()
+        self.right = nodes['right'].tolist()
+        self.value = nodes['value'].tolist()
+        self.cover = nodes['cover'].tolist()
+
+    def _extend(self, path: List[list], zero: float, one: np.ndarray, feature: int):
+        features, zeros, ones, weights = path
+        depth = len(features)
+        features.append(feature)
+        zeros.append(zero)
+        ones.append(one)
+        weights.append(np.ones(self.n) if depth == 0 else np.zeros(self.n))
+        for i in range(depth - 1, -1, -1):
+            weights[i + 1] = weights[i + 1] + one * weights[i] * (i + 1) / (depth + 1)
+            weights[i] = zero * weights[i] * (depth - i) / (depth + 1)
+
+    @staticmethod
+    def _unwind(path: List[list], i: int) -> List[list]:
+        features, zeros, ones, weights = path
+        depth = len(features) - 1
+        one, zero = ones[i], zeros[i]
+        hot = one != 0
+        safe_one = np.where(hot, one, 1.0)
+
+        weights = list(weights)
+        next_weight = weights[depth]
+        for j in range(depth - 1, -1, -1):
+            hot_weight = next_weight * (depth + 1) / ((j + 1) * safe_one)
+            # Rows off the path keep zero weight through a zero-cover step
+            cold_weight = weights[j] * (depth + 1) / (zero * (depth - j)) if zero > 0 else 0.0
+            next_weight = np.where(hot, weights[j] - hot_weight * zero * (depth - j) / (depth + 1), next_weight)
+            weights[j] = np.where(hot, hot_weight, cold_weight)
+
+        return [
+            features[:i] + features[i + 1:],
+            zeros[:i] + zeros[i + 1:],
+            ones[:i] + ones[i + 1:],
+            weights[:depth],
+        ]
+
+    @staticmethod
+    def _unwound_sum(path: List[list], i: int) -> np.ndarray:
+        _, zeros, ones, weights = path
+        depth = len(weights) - 1
+        one, zero = ones[i], zeros[i]
+        hot = one != 0
+        safe_one = np.where(hot, one, 1.0)
+
+        total = np.zeros_like(one)
+        next_weight = weights[depth]
+        for j in range(depth - 1, -1, -1):
+            hot_weight = next_weight * (depth + 1) / ((j + 1) * safe_one)
+            cold_weight = weights[j] * (depth + 1) / (zero * (depth - j)) if zero > 0 else 0.0
+            total = total + np.where(hot, hot_weight, cold_weight)
+            next_weight = weights[j] - hot_weight * zero * (depth - j) / (depth + 1)
+        return total
+
+    def _recurse(self, node: int, path: List[list], zero: float, one: np.ndarray, feature: int):
+        path = [list(part) for part in path]
+        self._extend(path, zero, one, feature)
+
+        if self.feature[node] < 0:
+            for i in range(1, len(path[0])):
+                weight = self._unwound_sum(path, i)
+                self.phi[:, path[0][i]] += weight * (path[2][i] - path[1][i]) * self.value[node]
+            return
+
+        split = self.feature[node]
+        go_left = self.model.go_left(node, self.X[:, split])
+
+        # A feature already on the path is merged into the new step
+        incoming_zero, incoming_one = 1.0, np.ones(self.n)
+        if split in path[0][1:]:
+            k = path[0].index(split, 1)
+            incoming_zero, incoming_one = path[1][k], path[2][k]
+            path = self._unwind(path, k)
+
+        cover = self.cover[node]
+        for child, goes in ((self.left[node], go_left), (self.right[node], ~go_left)):
+            # Subtrees no training row reached (empty CatBoost leaves) carry no weight
+            fraction = self.cover[child] / cover if cover > 0 else 0.0
+            self._recurse(child, path, incoming_zero * fraction, incoming_one * goes, split)
+
+    def run(self) -> Tuple[np.ndarray, float]:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for root in self.model.roots.tolist():
+                self._recurse(root, [[], [], [], []], 1.0, np.ones(self.n), -1)
+
+        leaves = self.model.is_leaf
+        tree_cover = np.bincount(self.model.nodes['tree'][leaves], weights=self.model.nodes['cover'][leaves])
+        tree_value = np.bincount(
+            self.model.nodes['tree'][leaves],
+            weights=self.model.nodes['cover'][leaves] * self.model.nodes['value'][leaves]
+        )
+        expected = self.model.meta['base_margin'] + float(np.sum(tree_value / tree_cover))
+        return self.phi, expected
+
+
+def tree_shap(model: CompiledModel, X: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Exact TreeSHAP contributions of a compiled model
+
+    Contributions are in margin (log-odds) units: for every row they sum to
+    predict_margin(X) minus the expected margin.
+
+    Args:
+        model: Compiled model with node covers (format version 2)
+        X: Feature matrix in model column order
+
+    Returns:
+        (contributions (n_rows, n_features), expected margin)
+    """
+    if 'cover' not in model.nodes.dtype.names:
+        raise ValueError(f"Model {model.version} was compiled without node covers; re-export it")
+    return _TreeShap(model, X).run()
+
+
+def group_columns(columns: List[str], features: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Map matrix columns to the features they were encoded from
+
+    One-hot columns (<feature>_<category>) are assigned to the longest
+    matching feature name, so their contributions add up to one reason.
+
+    Returns:
+        (group names, group index of every column)
+    """
+    by_length = sorted(features, key=len, reverse=True)
+    groups: List[str] = []
+    index = np.empty(len(columns), dtype=np.int64)
+    for i, column in enumerate(columns):
+        name = next((f for f in by_length if column == f or column.startswith(f + '_')), column)
+        if name not in groups:
+            groups.append(name)
+        index[i] = groups.index(name)
+    return groups, index
+
+
+# ---------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------
+
+class ExplanationCache:
+    """Top-k contributors per (model_version, feature_fingerprint)"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        model: CompiledModel,
+        features: Optional[List[str]] = None,
+        config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize cache
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            model: Compiled model the scores come from
+            features: Feature names the columns were encoded from (default: model metadata)
+            config: Loaded config; scoring.explanations overrides DEFAULT_EXPLANATIONS
+        """
+        self.pg = postgres_connector
+        self.model = model
+        settings = {**DEFAULT_EXPLANATIONS, **(config or {}).get('scoring', {}).get('explanations', {})}
+        self.top_k = settings['top_k']
+        self.at_risk_only = settings['at_risk_only']
+        self.group_names, self.group_index = group_columns(
+            model.feature_names, features or model.meta.get('features') or []
+        )
+        self.cached: Optional[set] = None
+
+    def load(self):
+        """Fingerprints already explained by this model version"""
+        cached = pd.read_sql(CACHED_FINGERPRINTS_QUERY, self.pg.engine, params={'model_version': self.model.version})
+        self.cached = set(cached['feature_fingerprint'].tolist())
+        logger.info(f"{len(self.cached)} cached explanations for {self.model.version}")
+
+    def top_contributors(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k features by absolute contribution
+
+        Returns:
+            (group indices (n_rows, k), contributions (n_rows, k)), strongest first
+        """
+        contributions, _ = tree_shap(self.model, X)
+        grouping = np.zeros((len(self.group_index), len(self.group_names)))
+        grouping[np.arange(len(self.group_index)), self.group_index] = 1.0
+        grouped = contributions @ grouping
+
+        k = min(self.top_k, grouped.shape[1])
+        top = np.argsort(-np.abs(grouped), axis=1, kind='stable')[:, :k]
+        return top, np.take_along_axis(grouped, top, axis=1)
+
+    def explain_chunk(self, X: np.ndarray, scores: pd.DataFrame, cursor) -> int:
+        """
+        Explain users of a scored chunk whose fingerprint is not cached yet
+
+        Args:
+            X: Feature matrix of the chunk
+            scores: Scores of the chunk (feature_fingerprint, intervention)
+            cursor: Cursor of the scoring transaction
+
+        Returns:
+            Number of fingerprints explained
+        """
+        if self.cached is None:
+            self.load()
+
+        fingerprints = scores['feature_fingerprint'].to_numpy()
+        wanted = ~pd.Series(fingerprints).isin(self.cached).to_numpy()
+        if self.at_risk_only:
+            wanted &= scores['intervention'].notna().to_numpy()
+
+        # Users sharing a fingerprint share the explanation
+        new, rows = np.unique(fingerprints[wanted], return_index=True)
+        if not len(new):
+            return 0
+        rows = np.flatnonzero(wanted)[rows]
+
+        top, contributions = self.top_contributors(X[rows])
+        k = top.shape[1]
+        explanations = pd.DataFrame({
+            'model_version': self.model.version,
+            'feature_fingerprint': np.repeat(new, k),
+            'rank': np.tile(np.arange(1, k + 1), len(new)),
+            'feature': np.array(self.group_names, dtype=object)[top.ravel()],
+            'contribution': contributions.ravel().astype(np.float32),
+        })
+        PostgresLoader.copy_dataframe(explanations[EXPLANATION_COLUMNS], 'ris.model_explanations', cursor)
+
+        self.cached.update(new.tolist())
+        return len(new)
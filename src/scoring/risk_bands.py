@@ -0,0 +1,139 @@
+"""
+Risk bands
+scoring.risk_bands and scoring.intervention_thresholds of config.yaml
+compiled once into sorted edge arrays; whole probability arrays are mapped
+to band / intervention codes with one binary search and returned as
+categoricals
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+
+
+class RiskBands:
+    """
+    Band and intervention lookup for renewal probabilities
+
+    Bands are half-open [lo, hi) intervals that must tile [0, 1] without
+    overlaps or gaps; the last band also includes 1.0. A probability gets the
+    intervention of the lowest threshold it is below (none above all of them).
+    """
+
+    def __init__(self, risk_bands: Dict[str, List[float]], intervention_thresholds: Dict[str, float]):
+        """
+        Compile and validate bands
+
+        Args:
+            risk_bands: Band name -> [lo, hi] of renewal probability
+            intervention_thresholds: Intervention name -> probability threshold
+
+        Raises:
+            ValueError: Bands overlap, leave gaps or do not cover [0, 1];
+                        thresholds are not distinct or outside (0, 1]
+        """
+        bands = sorted(risk_bands.items(), key=lambda item: item[1][0])
+        self.band_names = [name for name, _ in bands]
+        self.edges = self._validate_bands(bands)
+
+        thresholds = sorted(intervention_thresholds.items(), key=lambda item: item[1])
+        self.intervention_names = [name for name, _ in thresholds]
+        self.thresholds = np.array([value for _, value in thresholds], dtype=np.float64)
+        if len(self.thresholds) and (
+            np.any(np.diff(self.thresholds) <= 0) or self.thresholds[0] <= 0 or self.thresholds[-1] > 1
+        ):
+            raise ValueError(f"Intervention thresholds must be distinct values in (0, 1]: {intervention_thresholds}")
+
+        # Inner edges only: searchsorted over them gives the band index directly
+        self._inner_edges = self.edges[1:-1]
+        self._band_dtype = pd.CategoricalDtype(self.band_names, ordered=True)
+        self._intervention_dtype = pd.CategoricalDtype(self.intervention_names, ordered=True)
+
+    @staticmethod
+    def _validate_bands(bands: List[Tuple[str, List[float]]]) -> np.ndarray:
+        """Edges [lo_0, lo_1, ..., hi_last] of sorted bands"""
+        if not bands:
+            raise ValueError("No risk bands configured")
+
+        for name, (lo, hi) in bands:
+            if not lo < hi:
+                raise ValueError(f"Risk band {name} is empty: [{lo}, {hi})")
+
+        for (name, (_, hi)), (next_name, (next_lo, _)) in zip(bands, bands[1:]):
+            if hi > next_lo:
+                raise ValueError(f"Risk bands {name} and {next_name} overlap: {hi} > {next_lo}")
+            if hi < next_lo:
+                raise ValueError(f"Gap between risk bands {name} and {next_name}: [{hi}, {next_lo})")
+
+        if bands[0][1][0] != 0.0 or bands[-1][1][1] != 1.0:
+            raise ValueError(f"Risk bands must cover [0, 1], got [{bands[0][1][0]}, {bands[-1][1][1]}]")
+
+        return np.array([lo for _, (lo, _) in bands] + [bands[-1][1][1]], dtype=np.float64)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> 'RiskBands':
+        """
+        Create from the scoring section of config.yaml
+
+        Args:
+            config: Loaded config (default: config/config.yaml)
+        """
+        config = config if config is not None else load_config()
+        scoring = config['scoring']
+        return cls(scoring['risk_bands'], scoring.get('intervention_thresholds', {}))
+
+    def band_codes(self, probabilities) -> np.ndarray:
+        """
+        Band index per probability (-1 for NaN or values outside [0, 1])
+
+        Args:
+            probabilities: Scalar or array of renewal probabilities
+
+        Returns:
+            int8 array (at least 1-d) of indices into band_names
+        """
+        p = np.atleast_1d(np.asarray(probabilities, dtype=np.float64))
+        codes = np.searchsorted(self._inner_edges, p, side='right').astype(np.int8)
+        codes[np.isnan(p) | (p < self.edges[0]) | (p > self.edges[-1])] = -1
+        return codes
+
+    def intervention_codes(self, probabilities) -> np.ndarray:
+        """
+        Intervention index per probability (-1 for none or NaN)
+
+        Args:
+            probabilities: Scalar or array of renewal probabilities
+
+        Returns:
+            int8 array of indices into intervention_names
+        """
+        p = np.atleast_1d(np.asarray(probabilities, dtype=np.float64))
+        codes = np.searchsorted(self.thresholds, p, side='right').astype(np.int8)
+        codes[(codes >= len(self.thresholds)) | np.isnan(p)] = -1
+        return codes
+
+    def bands(self, probabilities) -> pd.Categorical:
+        """Risk bands as an ordered categorical (very_high first)"""
+        return pd.Categorical.from_codes(self.band_codes(probabilities), dtype=self._band_dtype)
+
+    def interventions(self, probabilities) -> pd.Categorical:
+        """Intervention levels as an ordered categorical (most urgent first, NaN for none)"""
+        return pd.Categorical.from_codes(self.intervention_codes(probabilities), dtype=self._intervention_dtype)
+
+    def assign(self, probabilities) -> pd.DataFrame:
+        """
+        Risk band and intervention of each probability
+
+        Args:
+            probabilities: Array of renewal probabilities
+
+        Returns:
+            DataFrame with categorical risk_band and intervention
+        """
+        return pd.DataFrame({
+            'risk_band': self.bands(probabilities),
+            'intervention': self.interventions(probabilities),
+        })
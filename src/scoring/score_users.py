@@ -0,0 +1,666 @@
+"""
+Batch scoring of active users
+Streams active HeroPass holders in fixed-size chunks, computes their
+features as of the score date, scores them with a model loaded once per run
+and COPYs each chunk into ris.model_scores_daily. Users whose feature
+fingerprint, model and HeroPass period are the same as on the previous
+scored day keep their previous probability without running the model.
+Top contributors of new fingerprints are added to ris.model_explanations.
+
+Feature vectors of every run are kept on disk (FeatureVectors). A user
+whose marts rows have not been reloaded since the vector was computed, in
+the same fact week and HeroPass period, reuses it: only the daily features (days_to_hp_end,
+freezes as of the date, seasonality) are recomputed, the weekly fact,
+snapshot and profile features are not read at all.
+
+Models are trained on every period sampled 0..N days before its end
+(model.decision_offsets_days), so only holders whose HeroPass ends within
+the largest offset of the score date are scored; the others have no
+training rows at their distance from the end date and get no row. The
+online service refuses the same users (active_users).
+"""
+
+import json
+import os
+import pickle
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from ..data_engineering.postgres_loader import PostgresLoader
+from ..features.external_factors import week_index
+from ..features.feature_store import DEFAULT_STORE_PATH, PROJECT_ROOT
+from ..features.registry import registry
+from ..models.dataset_cache import encode_features
+from .compiled_model import CompiledModel, COMPILED_DIR, row_hashes
+from .explanations import ExplanationCache, group_columns
+from .risk_bands import RiskBands
+
+
+logger = setup_logger('score_users', log_file='logs/score_users.log')
+
+# Current period of every user (or of the given users) holding a HeroPass on
+# the score date, ending within the decision horizon (NULL = no limit)
+ACTIVE_USERS_QUERY = """
+    select user_id, hp_period_id, hp_end_corrected
+    from (
+        select distinct on (user_id)
+            user_id,
+            hp_period_id,
+            hp_end_corrected
+        from ris.core_hp_period
+        where user_id is not null
+          and (%(user_ids)s::text[] is null or user_id = any(%(user_ids)s::text[]))
+          and hp_start <= %(score_date)s
+          and hp_end_corrected >= %(score_date)s
+        order by user_id, hp_start desc
+    ) current_period
+    where %(horizon_days)s::int is null
+       or hp_end_corrected <= %(score_date)s::date + %(horizon_days)s::int
+"""
+
+# Scores of the latest earlier day of the window, carried forward when unchanged
+PREVIOUS_SCORES_QUERY = """
+    select
+        user_id,
+        hp_period_id,
+        model_version,
+        feature_fingerprint,
+        renewal_probability,
+        scored_date
+    from ris.model_scores_daily
+    where window_days = %(window_days)s
+      and feature_fingerprint is not null
+      and score_date = (
+          select max(score_date)
+          from ris.model_scores_daily
+          where window_days = %(window_days)s
+            and score_date < %(score_date)s
+      )
+"""
+
+# Users of a chunk with rows (re)loaded into the marts the features read since a date.
+# Loads delete and re-insert rows, so updated_at is the load time of every current row;
+# a fact week disappears without a trace only if all its sessions are deleted at the source.
+CHANGED_USERS_QUERY = """
+    select user_id from ris.core_user
+    where user_id = any(%(user_ids)s::text[]) and updated_at >= %(since)s
+    union
+    select user_id from ris.core_hp_period
+    where user_id = any(%(user_ids)s::text[]) and updated_at >= %(since)s
+    union
+    select user_id from ris.fact_user_week
+    where user_id = any(%(user_ids)s::text[]) and updated_at >= %(since)s
+"""
+
+SCORE_COLUMNS = [
+    'score_date', 'window_days', 'user_id', 'hp_period_id', 'hp_end_corrected',
+    'days_to_hp_end', 'model_version', 'renewal_probability', 'risk_band', 'intervention',
+    'feature_fingerprint', 'scored_date',
+]
+
+
+class PickledModel:
+    """Pickled scikit-learn compatible model with the interface of CompiledModel"""
+
+    def __init__(self, path: Path):
+        """
+        Load model and its training sidecar
+
+        Args:
+            path: models/<model>_w<window>_v<N>.pkl
+        """
+        with open(path, 'rb') as f:
+            self.model = pickle.load(f)
+        sidecar = path.with_suffix('.json')
+        self.meta: Dict[str, Any] = {'model_version': path.stem}
+        if sidecar.exists():
+            with open(sidecar, 'r', encoding='utf-8') as f:
+                self.meta.update(json.load(f))
+
+    @property
+    def version(self) -> str:
+        return self.meta['model_version']
+
+    @property
+    def feature_names(self) -> Optional[List[str]]:
+        return self.meta.get('columns')
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(X)[:, 1]
+
+    def fingerprints(self, X: np.ndarray) -> np.ndarray:
+        """Hash of the raw feature vector (split thresholds are not known)"""
+        return row_hashes(np.asarray(X, dtype=np.float32))
+
+
+def load_model(path: Optional[Path] = None, window_days: Optional[int] = None):
+    """
+    Load a scoring model
+
+    Args:
+        path: Compiled model (.npy) or pickle (.pkl); default: the latest
+              compiled model of the window in models/compiled
+        window_days: Window used to pick the default model
+
+    Returns:
+        CompiledModel or PickledModel
+    """
+    if path is None:
+        if window_days is None:
+            raise ValueError("Either a model path or a window is required")
+        candidates = sorted(COMPILED_DIR.glob(f"*_w{window_days}_v*.npy"), key=lambda p: p.stat().st_mtime)
+        if not candidates:
+            raise FileNotFoundError(f"No compiled models for window {window_days}d in {COMPILED_DIR}")
+        path = candidates[-1]
+
+    path = Path(path)
+    if path.suffix == '.pkl':
+        return PickledModel(path)
+    return CompiledModel.load(path)
+
+
+def align_features(features: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Encode a feature chunk into the model matrix layout
+
+    Categories absent from the chunk get all-zero dummy columns, as in training.
+
+    Args:
+        features: Feature columns of a chunk
+        columns: Matrix columns the model was trained on
+
+    Returns:
+        float32 matrix (n_rows, len(columns))
+    """
+    encoded = encode_features(features)
+    unknown = [col for col in encoded.columns if col not in columns]
+    if unknown:
+        logger.debug(f"Categories unseen in training are ignored: {unknown}")
+    return encoded.reindex(columns=columns, fill_value=0.0).to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def daily_columns(columns: List[str], features: List[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Features that change every day and their model matrix columns
+
+    Args:
+        columns: Matrix columns the model was trained on
+        features: Feature names the model was trained on
+
+    Returns:
+        (daily feature names, indices of their columns)
+    """
+    daily_features = [name for name in features if registry.is_daily(name)]
+    groups, group_index = group_columns(columns, features)
+    return daily_features, np.flatnonzero(np.isin(np.array(groups, dtype=object)[group_index], daily_features))
+
+
+def feature_vectors_path(config: Dict[str, Any], model_version: str) -> Path:
+    """Vectors the daily batch stores for a model: <store_path>/scoring/<model_version>.npz"""
+    store_path = config.get('features', {}).get('store_path')
+    store_root = PROJECT_ROOT / store_path if store_path else DEFAULT_STORE_PATH
+    return store_root / 'scoring' / f"{model_version}.npz"
+
+
+def decision_horizon(meta: Dict[str, Any], config: Optional[Dict[str, Any]] = None) -> Optional[int]:
+    """
+    Largest days_to_hp_end the model was trained on
+
+    Args:
+        meta: Model metadata (decision_offsets_days written by training)
+        config: Loaded config, used for models trained before offsets were recorded
+
+    Returns:
+        Horizon in days (None when neither records offsets: no limit)
+    """
+    offsets = meta.get('decision_offsets_days') or (config or {}).get('model', {}).get('decision_offsets_days')
+    return int(max(offsets)) if offsets else None
+
+
+def iter_active_users(
+    postgres_connector: PostgresConnector,
+    score_date: date,
+    chunk_size: int = 5000,
+    horizon_days: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream active HeroPass holders in chunks through a server-side cursor
+
+    Args:
+        postgres_connector: PostgreSQL connector instance
+        score_date: Date the HeroPass must be active on
+        chunk_size: Users per chunk
+        horizon_days: Only holders whose HeroPass ends within this many days (None = all)
+
+    Yields:
+        DataFrame with user_id, hp_period_id, hp_end_corrected
+    """
+    columns = ['user_id', 'hp_period_id', 'hp_end_corrected']
+    with postgres_connector.get_connection(cursor_factory=None) as conn:
+        with conn.cursor(name='active_users_stream') as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(
+                ACTIVE_USERS_QUERY,
+                {'score_date': score_date, 'horizon_days': horizon_days, 'user_ids': None}
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+
+
+def active_users(
+    postgres_connector: PostgresConnector,
+    user_ids: List[str],
+    score_date: date,
+    horizon_days: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    The given users that the batch scores on score_date
+
+    Args:
+        postgres_connector: PostgreSQL connector instance
+        user_ids: Users to check
+        score_date: Date the HeroPass must be active on
+        horizon_days: Only holders whose HeroPass ends within this many days (None = all)
+
+    Returns:
+        DataFrame with user_id, hp_period_id, hp_end_corrected
+    """
+    users = pd.read_sql(
+        ACTIVE_USERS_QUERY,
+        postgres_connector.engine,
+        params={'score_date': score_date, 'horizon_days': horizon_days, 'user_ids': list(user_ids)}
+    )
+    users['user_id'] = users['user_id'].astype(str)
+    return users
+
+
+class FeatureVectors:
+    """
+    Model matrix rows of the latest run of a model, with the HeroPass period
+    and the date they were computed for
+
+    One .npz file per model version (user ids sorted), replaced as a whole at
+    the end of every run; it holds the users of that run only.
+    """
+
+    def __init__(self, path: Path, n_columns: int):
+        """
+        Load stored vectors (none if the file does not exist)
+
+        Args:
+            path: <store_path>/scoring/<model_version>.npz
+            n_columns: Model matrix width
+        """
+        self.path = Path(path)
+        self.user_ids = pd.Index(np.array([], dtype=str))
+        self.hp_period_ids = np.array([], dtype=str)
+        self.computed_on = np.array([], dtype='datetime64[D]')
+        self.values = np.empty((0, n_columns), dtype=np.float32)
+        if self.path.exists():
+            with np.load(self.path) as arrays:
+                # Files of earlier layouts are ignored and replaced at the end of the run
+                if 'hp_period_id' in arrays.files and arrays['values'].shape[1] == n_columns:
+                    self.user_ids = pd.Index(arrays['user_id'])
+                    self.hp_period_ids = arrays['hp_period_id']
+                    self.computed_on = arrays['computed_on']
+                    self.values = arrays['values']
+        logger.info(f"Loaded {len(self.user_ids)} stored feature vectors from {self.path}")
+
+    def lookup(self, user_ids: np.ndarray, hp_period_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stored vectors of users for their current HeroPass period
+
+        Args:
+            user_ids: Users to look up
+            hp_period_ids: Current period of each user
+
+        Returns:
+            (positions in the store, -1 for users without a vector of that period;
+             computed_on per user, NaT where missing)
+        """
+        position = self.user_ids.get_indexer(user_ids)
+        stored = position >= 0
+        stored[stored] = self.hp_period_ids[position[stored]] == hp_period_ids[stored]
+        position[~stored] = -1
+        computed_on = np.full(len(user_ids), np.datetime64('NaT'), dtype='datetime64[D]')
+        found = position >= 0
+        computed_on[found] = self.computed_on[position[found]]
+        return position, computed_on
+
+    def save(
+        self,
+        user_ids: List[np.ndarray],
+        hp_period_ids: List[np.ndarray],
+        computed_on: List[np.ndarray],
+        values: List[np.ndarray]
+    ):
+        """Replace the stored vectors with the chunks of a run"""
+        user_ids = np.concatenate(user_ids) if user_ids else np.array([], dtype=str)
+        hp_period_ids = np.concatenate(hp_period_ids) if hp_period_ids else np.array([], dtype=str)
+        order = np.argsort(user_ids, kind='stable')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written through a file object: np.savez would append .npz to the name
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                user_id=user_ids[order].astype(str),
+                hp_period_id=hp_period_ids[order].astype(str),
+                computed_on=np.concatenate(computed_on)[order] if computed_on else self.computed_on[:0],
+                values=np.vstack(values)[order] if values else self.values[:0]
+            )
+        os.replace(tmp_path, self.path)
+        logger.info(f"Stored {len(user_ids)} feature vectors in {self.path}")
+
+
+class BatchScorer:
+    """Daily scoring of all active HeroPass holders for one target window"""
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        model_path: Optional[Path] = None,
+        window_days: Optional[int] = None,
+        config: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 5000,
+        incremental: bool = True,
+        explain: bool = True
+    ):
+        """
+        Initialize scorer
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            model_path: Compiled model or pickle (default: latest compiled model of the window)
+            window_days: Target window (default: window_days of the model metadata)
+            config: Loaded config (default: config/config.yaml)
+            chunk_size: Users per chunk
+            incremental: Reuse stored features and carry forward scores of unchanged users
+            explain: Store top contributors of new fingerprints (compiled models only)
+        """
+        self.pg = postgres_connector
+        self.config = config if config is not None else load_config()
+        self.model = load_model(model_path, window_days)
+        self.window_days = window_days or self.model.meta.get('window_days')
+        if self.window_days is None:
+            raise ValueError(f"Model {self.model.version} has no window_days; pass it explicitly")
+        self.columns = self.model.feature_names
+        self.features = self.model.meta.get('features') or registry.configured_features(self.config)
+        self.chunk_size = chunk_size
+        self.incremental = incremental
+        self.risk_bands = RiskBands.from_config(self.config)
+        self.horizon_days = decision_horizon(self.model.meta, self.config)
+
+        if not self.columns:
+            raise ValueError(f"Model {self.model.version} has no feature columns in its metadata")
+
+        # Matrix columns of features that change every day and are recomputed for reused vectors
+        self.daily_features, self.daily_columns = daily_columns(self.columns, self.features)
+        self.vectors_path = feature_vectors_path(self.config, self.model.version)
+
+        self.explainer = None
+        if explain:
+            if isinstance(self.model, CompiledModel) and 'cover' in self.model.nodes.dtype.names:
+                self.explainer = ExplanationCache(self.pg, self.model, self.features, self.config)
+            else:
+                logger.warning(f"Model {self.model.version} is not compiled with node covers; explanations are skipped")
+
+        logger.info(
+            f"Loaded model {self.model.version} for window {self.window_days}d "
+            f"(holders up to {self.horizon_days}d before HeroPass end)"
+        )
+
+    def iter_active_users(self, score_date: date) -> Iterator[pd.DataFrame]:
+        """Active HeroPass holders of score_date within the horizon, in chunks of chunk_size"""
+        return iter_active_users(self.pg, score_date, self.chunk_size, self.horizon_days)
+
+    def previous_scores(self, score_date: date) -> pd.DataFrame:
+        """
+        Scores of the latest day before score_date for this window
+
+        Returns:
+            DataFrame indexed by user_id (empty if the window was never scored)
+        """
+        previous = pd.read_sql(
+            PREVIOUS_SCORES_QUERY,
+            self.pg.engine,
+            params={'window_days': self.window_days, 'score_date': score_date}
+        )
+        previous['user_id'] = previous['user_id'].astype(str)
+        logger.info(f"Loaded {len(previous)} previous scores")
+        return previous.set_index('user_id')
+
+    def feature_matrix(
+        self,
+        users: pd.DataFrame,
+        score_date: date,
+        features: Optional[List[str]] = None
+    ) -> np.ndarray:
+        """Model matrix of a chunk of users as of score_date (only the given features filled)"""
+        keys = pd.DataFrame({'user_id': users['user_id'].astype(str), 'as_of_date': score_date})
+        features = registry.run(keys, self.pg, self.config).compute(features or self.features)
+        return align_features(features.drop(columns=['user_id', 'as_of_date']), self.columns)
+
+    def changed_users(self, user_ids: np.ndarray, since: date) -> np.ndarray:
+        """Mask of users with marts rows loaded on or after since"""
+        changed = pd.read_sql(
+            CHANGED_USERS_QUERY,
+            self.pg.engine,
+            params={'user_ids': user_ids.tolist(), 'since': datetime.combine(since, datetime.min.time())}
+        )
+        return np.isin(user_ids, changed['user_id'].astype(str).to_numpy())
+
+    def chunk_features(
+        self,
+        users: pd.DataFrame,
+        score_date: date,
+        vectors: Optional[FeatureVectors] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Model matrix of a chunk, reusing stored vectors of unchanged users
+
+        A stored vector is reused when it was computed for the user's current
+        HeroPass period, on or before score_date in the same fact week (weekly
+        windows end with the last finished week), and none of the user's marts
+        rows were loaded since the day it was computed. Daily features of reused vectors are recomputed for
+        score_date; all features are computed for the other users.
+
+        Args:
+            users: Chunk from iter_active_users
+            score_date: Date the features are computed at
+            vectors: Stored vectors of the model (None = compute everything)
+
+        Returns:
+            (matrix, date every row's non-daily features were computed on)
+        """
+        user_ids = users['user_id'].astype(str).to_numpy()
+        hp_period_ids = users['hp_period_id'].astype(str).to_numpy()
+        score_day = np.datetime64(score_date, 'D')
+        computed_on = np.full(len(users), score_day, dtype='datetime64[D]')
+        reuse = np.zeros(len(users), dtype=bool)
+
+        if vectors is not None:
+            position, stored_on = vectors.lookup(user_ids, hp_period_ids)
+            candidate = ~np.isnat(stored_on) & (stored_on <= score_day)
+            candidate[candidate] = (
+                week_index(pd.Series(stored_on[candidate])) == week_index(pd.Series([score_day]))[0]
+            )
+            if candidate.any():
+                reuse[candidate] = ~self.changed_users(
+                    user_ids[candidate], pd.Timestamp(stored_on[candidate].min()).date()
+                )
+
+        X = np.empty((len(users), len(self.columns)), dtype=np.float32)
+        if (~reuse).any():
+            X[~reuse] = self.feature_matrix(users[~reuse], score_date)
+        if reuse.any():
+            X[reuse] = vectors.values[position[reuse]]
+            computed_on[reuse] = stored_on[reuse]
+            if self.daily_features:
+                daily = self.feature_matrix(users[reuse], score_date, self.daily_features)
+                X[np.ix_(reuse, self.daily_columns)] = daily[:, self.daily_columns]
+        return X, computed_on
+
+    def score_chunk(
+        self,
+        users: pd.DataFrame,
+        score_date: date,
+        previous: Optional[pd.DataFrame] = None,
+        X: Optional[np.ndarray] = None
+    ) -> pd.DataFrame:
+        """
+        Features, probabilities and bands of one chunk
+
+        The model runs only for users without a previous score of the same
+        model version, HeroPass period and feature fingerprint; the others
+        keep their previous probability and scored_date.
+
+        Args:
+            users: Chunk from iter_active_users
+            score_date: Date the features are computed at
+            previous: Output of previous_scores (None = rescore everyone)
+            X: Feature matrix of the chunk (default: computed with feature_matrix)
+
+        Returns:
+            DataFrame with SCORE_COLUMNS
+        """
+        user_ids = users['user_id'].astype(str).to_numpy()
+        if X is None:
+            X = self.feature_matrix(users, score_date)
+        fingerprints = self.model.fingerprints(X)
+
+        probabilities = np.full(len(X), np.nan, dtype=np.float32)
+        scored_dates = np.full(len(X), score_date, dtype=object)
+        unchanged = np.zeros(len(X), dtype=bool)
+        if previous is not None and len(previous):
+            # Positional lookup keeps the int64 fingerprints exact (reindex would cast to float)
+            position = previous.index.get_indexer(user_ids)
+            found = np.flatnonzero(position >= 0)
+            before = previous.iloc[position[found]]
+            same = (
+                (before['model_version'].to_numpy() == self.model.version) &
+                (before['feature_fingerprint'].to_numpy() == fingerprints[found]) &
+                (before['hp_period_id'].astype(str).to_numpy() == users['hp_period_id'].astype(str).to_numpy()[found])
+            )
+            carried = found[same]
+            unchanged[carried] = True
+            probabilities[carried] = before['renewal_probability'].to_numpy(dtype=np.float32)[same]
+            scored_dates[carried] = before['scored_date'].to_numpy()[same]
+
+        if not unchanged.all():
+            probabilities[~unchanged] = self.model.predict(X[~unchanged])
+
+        scores = pd.DataFrame({
+            'score_date': score_date,
+            'window_days': self.window_days,
+            'user_id': user_ids,
+            'hp_period_id': users['hp_period_id'].to_numpy(),
+            'hp_end_corrected': users['hp_end_corrected'].to_numpy(),
+            'days_to_hp_end': (pd.to_datetime(users['hp_end_corrected']) - pd.Timestamp(score_date)).dt.days.to_numpy(),
+            'model_version': self.model.version,
+            'renewal_probability': probabilities,
+        })
+        scores['risk_band'] = self.risk_bands.bands(probabilities)
+        scores['intervention'] = self.risk_bands.interventions(probabilities)
+        scores['feature_fingerprint'] = fingerprints
+        scores['scored_date'] = scored_dates
+        return scores[SCORE_COLUMNS]
+
+    def ensure_partition(self, score_date: date, cursor):
+        """Create the monthly partition of score_date if it does not exist"""
+        start = date(score_date.year, score_date.month, 1)
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        name = f"model_scores_daily_{start.year}_{start.month:02d}"
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS ris.{name} PARTITION OF ris.model_scores_daily "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');"
+        )
+
+    def run(self, score_date: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Score all active users and replace the day's scores of this window
+
+        Chunks are written with COPY as they are scored, in one transaction,
+        so memory holds a single chunk (plus the float32 feature vectors
+        kept for the next run) and readers never see a partial day.
+        In incremental mode features of unchanged users are reused
+        (see chunk_features) and unchanged scores are carried forward from
+        the latest earlier day (see score_chunk).
+
+        Args:
+            score_date: Date to score (default: today)
+
+        Returns:
+            Run statistics
+        """
+        score_date = score_date or date.today()
+        started = time.monotonic()
+        n_users = 0
+        n_rescored = 0
+        n_computed = 0
+        n_explained = 0
+        band_counts: Dict[str, int] = {}
+        previous = self.previous_scores(score_date) if self.incremental else None
+        vectors = FeatureVectors(self.vectors_path, len(self.columns)) if self.incremental else None
+        kept: Tuple[List[np.ndarray], ...] = ([], [], [], [])
+
+        with self.pg.get_connection() as conn:
+            with conn.cursor() as cursor:
+                self.ensure_partition(score_date, cursor)
+                cursor.execute(
+                    "DELETE FROM ris.model_scores_daily WHERE score_date = %s AND window_days = %s;",
+                    (score_date, self.window_days)
+                )
+                for users in self.iter_active_users(score_date):
+                    X, computed_on = self.chunk_features(users, score_date, vectors)
+                    scores = self.score_chunk(users, score_date, previous, X)
+                    PostgresLoader.copy_dataframe(scores, 'ris.model_scores_daily', cursor)
+                    if self.explainer is not None:
+                        n_explained += self.explainer.explain_chunk(X, scores, cursor)
+
+                    if vectors is not None:
+                        columns = (scores['user_id'].to_numpy(), scores['hp_period_id'].to_numpy(), computed_on, X)
+                        for part, values in zip(kept, columns):
+                            part.append(values)
+
+                    n_users += len(scores)
+                    n_rescored += int((scores['scored_date'] == score_date).sum())
+                    n_computed += int((computed_on == np.datetime64(score_date, 'D')).sum())
+                    for band, count in scores['risk_band'].value_counts(sort=False).items():
+                        band_counts[band] = band_counts.get(band, 0) + int(count)
+                    logger.info(f"Scored {n_users} users")
+
+                # Before the commit: a failed save leaves the day unscored, never scores without vectors
+                if vectors is not None:
+                    vectors.save(*kept)
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Scored {n_users} users for {score_date} in {elapsed:.1f}s with {self.model.version} "
+            f"({n_rescored} rescored, {n_users - n_rescored} carried forward, "
+            f"features computed for {n_computed})"
+        )
+        return {
+            'score_date': score_date,
+            'window_days': self.window_days,
+            'model_version': self.model.version,
+            'users': n_users,
+            'rescored': n_rescored,
+            'carried_forward': n_users - n_rescored,
+            'features_computed': n_computed,
+            'explained': n_explained,
+            'risk_bands': band_counts,
+            'seconds': round(elapsed, 1),
+        }
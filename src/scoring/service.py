@@ -0,0 +1,656 @@
+"""
+Online scoring service
+FastAPI app that keeps the model and a hot feature cache in-process.
+Requests arriving together are coalesced into one micro-batch, so the
+feature lookup and the model run once per batch instead of once per user.
+Features are computed as of today, like the daily batch, and for the same
+users: active HeroPass holders inside the model's decision horizon. Users
+further from their HeroPass end (outside what the model saw in training)
+or without an active HeroPass get no score, as in ris.model_scores_daily.
+Entry lifetimes are jittered and the snapshot is re-read in the background
+before they run out, so the cache never expires all at once. The snapshot
+starts from the feature vectors the daily batch stored for the model and
+recomputes only the daily features, so a refresh does not rebuild every
+holder's features from the marts. Entries are
+also bound to the date their features were computed as of: days_to_hp_end,
+freezes and seasonality move every day, so vectors of an earlier day are
+never served after midnight.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from datetime import date
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+from ..utils.config_loader import load_config
+from ..utils.db_connectors import PostgresConnector
+from ..utils.logger import setup_logger
+from ..features.registry import registry
+from .risk_bands import RiskBands
+from ..features.external_factors import week_index
+from .score_users import (
+    FeatureVectors,
+    active_users,
+    align_features,
+    daily_columns,
+    decision_horizon,
+    feature_vectors_path,
+    iter_active_users,
+    load_model,
+)
+
+
+logger = setup_logger('scoring_service', log_file='logs/scoring_service.log')
+
+DEFAULT_SERVICE = {
+    'cache_size': 200000,
+    'cache_ttl_seconds': 3600,
+    'cache_ttl_jitter': 0.2,
+    'negative_ttl_seconds': 60,
+    'refresh_seconds': 1800,
+    'max_batch_size': 256,
+    'max_wait_ms': 5,
+    'max_request_users': 1000,
+}
+
+
+# ---------------------------------------------------------------------
+# Feature sources
+# ---------------------------------------------------------------------
+
+class RegistryFeatureSource:
+    """Features computed from the marts through the feature registry"""
+
+    @classmethod
+    def for_model(
+        cls,
+        postgres_connector: PostgresConnector,
+        meta: Dict[str, Any],
+        config: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 5000
+    ) -> 'RegistryFeatureSource':
+        """
+        Source of the features, decision horizon and stored vectors of a model
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            meta: Model metadata (features default to the config.yaml lists)
+            config: Loaded config (default: config/config.yaml)
+            chunk_size: Users per chunk when warming the cache
+        """
+        config = config if config is not None else load_config()
+        features = meta.get('features') or registry.configured_features(config)
+        return cls(
+            postgres_connector, features, config, chunk_size, decision_horizon(meta, config),
+            feature_vectors_path(config, meta['model_version'])
+        )
+
+    def __init__(
+        self,
+        postgres_connector: PostgresConnector,
+        features: List[str],
+        config: Optional[Dict[str, Any]] = None,
+        chunk_size: int = 5000,
+        horizon_days: Optional[int] = None,
+        vectors_path: Optional[Path] = None
+    ):
+        """
+        Initialize source
+
+        Args:
+            postgres_connector: PostgreSQL connector instance
+            features: Feature names the model was trained on
+            config: Loaded config (default: config/config.yaml)
+            chunk_size: Users per chunk when warming the cache
+            horizon_days: Only holders whose HeroPass ends within this many days
+            vectors_path: Vectors stored by the daily batch (None = compute everything)
+        """
+        self.pg = postgres_connector
+        self.features = features
+        self.config = config if config is not None else load_config()
+        self.chunk_size = chunk_size
+        self.horizon_days = horizon_days
+        self.vectors_path = vectors_path
+
+    def fetch(self, user_ids: List[str], as_of: date) -> pd.DataFrame:
+        """
+        Features of users as of a date
+
+        Users the daily batch would not score on that date are left out.
+
+        Returns:
+            DataFrame with user_id and one column per feature
+        """
+        users = active_users(self.pg, [str(user_id) for user_id in user_ids], as_of, self.horizon_days)
+        keys = pd.DataFrame({'user_id': users['user_id'], 'as_of_date': as_of})
+        features = registry.run(keys, self.pg, self.config).compute(self.features)
+        return features.drop(columns=['as_of_date'])
+
+    def snapshot(self, as_of: date, columns: List[str]) -> Iterator[Tuple[List[str], np.ndarray]]:
+        """
+        Model matrices of active HeroPass holders within the horizon, chunk by chunk
+
+        Vectors the daily batch stored for a holder's current HeroPass period
+        in the fact week of as_of are reused with only the daily features
+        recomputed, as in BatchScorer.chunk_features; holders without one get
+        all features computed.
+
+        Args:
+            as_of: Date the features are computed as of
+            columns: Matrix columns of the model
+
+        Returns:
+            Iterator of (user ids, matrix)
+        """
+        vectors = FeatureVectors(self.vectors_path, len(columns)) if self.vectors_path else None
+        daily_features, daily_cols = daily_columns(columns, self.features)
+        as_of_week = week_index(pd.Series([np.datetime64(as_of, 'D')]))[0]
+        n_reused = 0
+
+        for users in iter_active_users(self.pg, as_of, self.chunk_size, self.horizon_days):
+            user_ids = users['user_id'].astype(str).to_numpy()
+            stored = np.zeros(len(users), dtype=bool)
+            if vectors is not None:
+                position, stored_on = vectors.lookup(user_ids, users['hp_period_id'].astype(str).to_numpy())
+                stored = ~np.isnat(stored_on) & (stored_on <= np.datetime64(as_of, 'D'))
+                # Weekly windows end with the last finished week
+                stored[stored] = week_index(pd.Series(stored_on[stored])) == as_of_week
+
+            X = np.empty((len(users), len(columns)), dtype=np.float32)
+            if (~stored).any():
+                X[~stored] = self._matrix(user_ids[~stored], as_of, self.features, columns)
+            if stored.any():
+                X[stored] = vectors.values[position[stored]]
+                if daily_features:
+                    daily = self._matrix(user_ids[stored], as_of, daily_features, columns)
+                    X[np.ix_(stored, daily_cols)] = daily[:, daily_cols]
+            n_reused += int(stored.sum())
+            yield user_ids.tolist(), X
+
+        logger.info(f"Snapshot of {as_of} reused {n_reused} stored feature vectors")
+
+    def _matrix(self, user_ids: np.ndarray, as_of: date, features: List[str], columns: List[str]) -> np.ndarray:
+        """Model matrix of users as of a date (only the given features filled)"""
+        keys = pd.DataFrame({'user_id': user_ids, 'as_of_date': as_of})
+        computed = registry.run(keys, self.pg, self.config).compute(features)
+        return align_features(computed.drop(columns=['user_id', 'as_of_date']), columns)
+
+
+class StubFeatureSource:
+    """Fixed feature table for running the service locally without PostgreSQL"""
+
+    def __init__(self, features: pd.DataFrame, delay_ms: float = 0.0):
+        """
+        Initialize source
+
+        Args:
+            features: DataFrame with user_id and feature columns
+            delay_ms: Simulated latency of every fetch
+        """
+        self.features = features.assign(user_id=features['user_id'].astype(str)).set_index('user_id')
+        self.delay_ms = delay_ms
+
+    @classmethod
+    def from_file(cls, path: Path, delay_ms: float = 0.0) -> 'StubFeatureSource':
+        """Load the table from .csv or .parquet"""
+        path = Path(path)
+        if path.suffix == '.parquet':
+            features = pd.read_parquet(path)
+        else:
+            features = pd.read_csv(path, dtype={'user_id': str})
+        return cls(features, delay_ms)
+
+    def fetch(self, user_ids: List[str], as_of: date) -> pd.DataFrame:
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        return self.features[self.features.index.isin(user_ids)].reset_index()
+
+    def snapshot(self, as_of: date, columns: List[str]) -> Iterator[Tuple[List[str], np.ndarray]]:
+        yield self.features.index.tolist(), align_features(self.features, columns)
+
+
+# ---------------------------------------------------------------------
+# Feature cache
+# ---------------------------------------------------------------------
+
+class FeatureCache:
+    """
+    Encoded feature vectors of users with TTL expiry and LRU eviction
+
+    Vectors are stored already aligned to the model columns, so a cache hit
+    goes straight into the prediction matrix. Every entry keeps the date its
+    features were computed as of and is a miss on any other date. Users the
+    source does not know are stored without a vector for a short negative TTL.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: float,
+        ttl_jitter: float = 0.0,
+        negative_ttl_seconds: float = 0.0
+    ):
+        """
+        Initialize cache
+
+        Args:
+            max_size: Maximum number of users kept
+            ttl_seconds: Lifetime of an entry
+            ttl_jitter: Fraction of the lifetime an entry may expire early, drawn per entry
+            negative_ttl_seconds: Lifetime of an unknown-user entry (0 disables it)
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.ttl_jitter = ttl_jitter
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[float, date, Optional[np.ndarray]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(
+        self,
+        user_ids: List[str],
+        as_of: Optional[date] = None
+    ) -> Tuple[Dict[str, Optional[np.ndarray]], List[str]]:
+        """
+        Look up users
+
+        Args:
+            user_ids: Users to look up
+            as_of: Date the features are needed as of (default: today)
+
+        Returns:
+            (user_id -> vector of fresh entries, None for users known to be
+            unknown; users missing, expired or cached for another date)
+        """
+        as_of = as_of or date.today()
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is None or entry[0] < now or entry[1] != as_of:
+                    if entry is not None:
+                        del self._entries[user_id]
+                    missing.append(user_id)
+                    continue
+                self._entries.move_to_end(user_id)
+                found[user_id] = entry[2]
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, user_ids: List[str], vectors: np.ndarray, as_of: Optional[date] = None):
+        """Store rows of a matrix computed as of a date (default: today), evicting the least recently used"""
+        # Spread expiries so a warmed cache does not go cold in one instant
+        lifetimes = self.ttl_seconds * (1 - self.ttl_jitter * self._rng.random(len(user_ids)))
+        self._put(user_ids, (time.monotonic() + lifetimes).tolist(), as_of or date.today(), vectors)
+
+    def put_unknown(self, user_ids: List[str], as_of: Optional[date] = None):
+        """Remember users the source has no features for as of a date (default: today)"""
+        if self.negative_ttl_seconds > 0 and user_ids:
+            expires = time.monotonic() + self.negative_ttl_seconds
+            self._put(user_ids, [expires] * len(user_ids), as_of or date.today(), [None] * len(user_ids))
+
+    def _put(self, user_ids: List[str], expires: List[float], as_of: date, vectors):
+        with self._lock:
+            for user_id, expiry, vector in zip(user_ids, expires, vectors):
+                self._entries[user_id] = (expiry, as_of, vector)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# ---------------------------------------------------------------------
+# Micro-batching and metrics
+# ---------------------------------------------------------------------
+
+class LatencyTracker:
+    """Percentiles over the most recent observations"""
+
+    def __init__(self, window: int = 10000):
+        self._values: deque = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, value: float):
+        self._values.append(value)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        if not self._values:
+            return {'count': self.count, 'p50': None, 'p99': None}
+        p50, p99 = np.percentile(np.fromiter(self._values, dtype=np.float64), [50, 99])
+        return {'count': self.count, 'p50': round(float(p50), 3), 'p99': round(float(p99), 3)}
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests into batches
+
+    The first waiting request opens a batch; requests arriving within
+    max_wait_ms join it until max_batch_size users are collected. Batches run
+    one at a time, so the next batch fills while the current one is scored.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[str]], Awaitable[pd.DataFrame]],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        """
+        Initialize batcher
+
+        Args:
+            handler: Scores a list of distinct user ids; returns a frame indexed by user_id
+            max_batch_size: Users per batch (a larger single request is not split)
+            max_wait_ms: Time a batch waits for more requests
+        """
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = LatencyTracker()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, user_ids: List[str]) -> pd.DataFrame:
+        """Score users as part of the next batch; rows in request order"""
+        if self._worker is None:
+            raise RuntimeError("Batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((user_ids, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[List[str], asyncio.Future]]:
+        """Wait for the first request, then gather more until full or timed out"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        n_users = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+        while n_users < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(request)
+            n_users += len(request[0])
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            user_ids = list(dict.fromkeys(user_id for ids, _ in batch for user_id in ids))
+            self.batch_sizes.observe(len(user_ids))
+            try:
+                scores = await self.handler(user_ids)
+            except Exception as e:
+                logger.error(f"Batch of {len(user_ids)} users failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for ids, future in batch:
+                if not future.done():
+                    future.set_result(scores.reindex(ids))
+
+
+# ---------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------
+
+class ScoringService:
+    """Model, feature cache and batcher of one target window"""
+
+    def __init__(
+        self,
+        source,
+        model_path: Optional[Path] = None,
+        window_days: Optional[int] = None,
+        config: Optional[Dict[str, Any]] = None,
+        model=None
+    ):
+        """
+        Initialize service
+
+        Args:
+            source: Feature source with fetch(user_ids, as_of) and snapshot(as_of, columns)
+            model_path: Compiled model or pickle (default: latest compiled model of the window)
+            window_days: Target window (default: window_days of the model metadata)
+            config: Loaded config (default: config/config.yaml)
+            model: Already loaded model (default: loaded from model_path)
+        """
+        self.config = config if config is not None else load_config()
+        self.settings = {**DEFAULT_SERVICE, **self.config.get('scoring', {}).get('service', {})}
+        self.model = model if model is not None else load_model(model_path, window_days)
+        self.window_days = window_days or self.model.meta.get('window_days')
+        self.columns = self.model.feature_names
+        if not self.columns:
+            raise ValueError(f"Model {self.model.version} has no feature columns in its metadata")
+
+        self.source = source
+        self.risk_bands = RiskBands.from_config(self.config)
+        self.cache = FeatureCache(
+            self.settings['cache_size'],
+            self.settings['cache_ttl_seconds'],
+            self.settings['cache_ttl_jitter'],
+            self.settings['negative_ttl_seconds']
+        )
+        self.batcher = MicroBatcher(self._score_batch, self.settings['max_batch_size'], self.settings['max_wait_ms'])
+        self.request_latency = LatencyTracker()
+        self.batch_latency = LatencyTracker()
+
+        logger.info(f"Loaded model {self.model.version} for window {self.window_days}d")
+
+    def _encode(self, features: pd.DataFrame) -> Tuple[List[str], np.ndarray]:
+        """User ids and model matrix of a source frame"""
+        user_ids = features['user_id'].astype(str).tolist()
+        return user_ids, align_features(features.drop(columns=['user_id']), self.columns)
+
+    def warm(self, as_of: Optional[date] = None) -> int:
+        """
+        Fill the cache from the source snapshot
+
+        Returns:
+            Number of users cached
+        """
+        as_of = as_of or date.today()
+        started = time.monotonic()
+        n_users = 0
+        for user_ids, X in self.source.snapshot(as_of, self.columns):
+            self.cache.put_many(user_ids, X, as_of)
+            n_users += len(user_ids)
+        logger.info(f"Warmed feature cache with {n_users} users in {time.monotonic() - started:.1f}s")
+        return n_users
+
+    async def keep_warm(self):
+        """Re-warm the cache every refresh_seconds, before warmed entries expire"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.settings['refresh_seconds'])
+            try:
+                await loop.run_in_executor(None, self.warm)
+            except Exception as e:
+                logger.error(f"Cache refresh failed: {e}")
+
+    def predict(self, user_ids: List[str]) -> pd.DataFrame:
+        """
+        Score distinct users synchronously (cache first, source for misses)
+
+        Returns:
+            DataFrame indexed by user_id with renewal_probability, risk_band,
+            intervention; users unknown to the source are absent
+        """
+        as_of = date.today()
+        found, missing = self.cache.get_many(user_ids, as_of)
+        if missing:
+            fetched_ids, X = self._encode(self.source.fetch(missing, as_of))
+            self.cache.put_many(fetched_ids, X, as_of)
+            found.update(zip(fetched_ids, X))
+            self.cache.put_unknown(list(set(missing) - set(fetched_ids)), as_of)
+
+        known = [user_id for user_id in user_ids if found.get(user_id) is not None]
+        if not known:
+            return pd.DataFrame(columns=['renewal_probability', 'risk_band', 'intervention'])
+
+        probabilities = self.model.predict(np.vstack([found[user_id] for user_id in known]))
+        return pd.DataFrame({
+            'renewal_probability': probabilities.astype(np.float64),
+            'risk_band': self.risk_bands.bands(probabilities).astype(object),
+            'intervention': self.risk_bands.interventions(probabilities).astype(object),
+        }, index=pd.Index(known, name='user_id'))
+
+    async def _score_batch(self, user_ids: List[str]) -> pd.DataFrame:
+        """Run predict off the event loop so new requests keep queueing"""
+        started = time.perf_counter()
+        scores = await asyncio.get_running_loop().run_in_executor(None, self.predict, user_ids)
+        self.batch_latency.observe((time.perf_counter() - started) * 1000)
+        return scores
+
+    async def score(self, user_ids: List[str]) -> pd.DataFrame:
+        """Score users through the micro-batcher; rows in request order"""
+        started = time.perf_counter()
+        scores = await self.batcher.submit([str(user_id) for user_id in user_ids])
+        self.request_latency.observe((time.perf_counter() - started) * 1000)
+        return scores
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            'model_version': self.model.version,
+            'window_days': self.window_days,
+            'request_latency_ms': self.request_latency.summary(),
+            'batch_latency_ms': self.batch_latency.summary(),
+            'batch_size': self.batcher.batch_sizes.summary(),
+            'feature_cache': self.cache.stats(),
+        }
+
+
+# ---------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------
+
+class ScoreRequest(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1)
+
+
+class UserScore(BaseModel):
+    user_id: str
+    renewal_probability: Optional[float] = None
+    risk_band: Optional[str] = None
+    intervention: Optional[str] = None
+
+
+class ScoreResponse(BaseModel):
+    model_version: str
+    window_days: Optional[int]
+    scores: List[UserScore]
+
+
+def create_app(service: ScoringService, warm: bool = True) -> FastAPI:
+    """
+    FastAPI app around a scoring service
+
+    Endpoints:
+        POST /scores        - batch of user ids
+        GET  /scores/{id}   - single user
+        GET  /metrics       - p50/p99 latencies, batch sizes, cache hit rate
+        GET  /health
+
+    Args:
+        service: Scoring service
+        warm: Fill the feature cache on startup and refresh it in the background
+    """
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        refresh = None
+        if warm:
+            await asyncio.get_running_loop().run_in_executor(None, service.warm)
+            refresh = asyncio.create_task(service.keep_warm())
+        await service.batcher.start()
+        yield
+        await service.batcher.stop()
+        if refresh is not None:
+            refresh.cancel()
+            try:
+                await refresh
+            except asyncio.CancelledError:
+                pass
+
+    app = FastAPI(title='Retention scoring', lifespan=lifespan)
+
+    def response(user_ids: List[str], scores: pd.DataFrame) -> ScoreResponse:
+        rows = []
+        for user_id, row in zip(user_ids, scores.itertuples(index=False)):
+            if pd.isna(row.renewal_probability):
+                rows.append(UserScore(user_id=user_id))
+                continue
+            rows.append(UserScore(
+                user_id=user_id,
+                renewal_probability=round(float(row.renewal_probability), 6),
+                risk_band=None if pd.isna(row.risk_band) else row.risk_band,
+                intervention=None if pd.isna(row.intervention) else row.intervention,
+            ))
+        return ScoreResponse(model_version=service.model.version, window_days=service.window_days, scores=rows)
+
+    @app.post('/scores', response_model=ScoreResponse)
+    async def score_users(request: ScoreRequest):
+        if len(request.user_ids) > service.settings['max_request_users']:
+            raise HTTPException(413, f"At most {service.settings['max_request_users']} users per request")
+        return response(request.user_ids, await service.score(request.user_ids))
+
+    @app.get('/scores/{user_id}', response_model=UserScore)
+    async def score_user(user_id: str):
+        result = response([user_id], await service.score([user_id])).scores[0]
+        if result.renewal_probability is None:
+            raise HTTPException(404, f"User {user_id} is not scored: no active HeroPass within the model horizon")
+        return result
+
+    @app.get('/metrics')
+    async def metrics():
+        return service.metrics()
+
+    @app.get('/health')
+    async def health():
+        return {'status': 'ok', 'model_version': service.model.version}
+
+    return app
@@ -0,0 +1,50 @@
+"""
+Configuration loader
+Reads config/config.yaml, substituting ${VAR} references from the environment
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+import yaml
+from dotenv import load_dotenv
+
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+DEFAULT_CONFIG_PATH = PROJECT_ROOT / 'config' / 'config.yaml'
+
+load_dotenv(dotenv_path=PROJECT_ROOT / 'config' / '.env')
+
+_ENV_REFERENCE = re.compile(r'\$\{(\w+)\}')
+
+
+def _substitute_env(value: Any) -> Any:
+    """Replace ${VAR} references in strings of a parsed YAML tree"""
+    if isinstance(value, dict):
+        return {key: _substitute_env(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute_env(item) for item in value]
+    if isinstance(value, str):
+        match = _ENV_REFERENCE.fullmatch(value)
+        if match:
+            return os.getenv(match.group(1))
+        return _ENV_REFERENCE.sub(lambda m: os.getenv(m.group(1), ''), value)
+    return value
+
+
+def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load YAML config
+
+    Args:
+        config_path: Path to config YAML file (default: config/config.yaml)
+
+    Returns:
+        Config dictionary (unset environment variables become None)
+    """
+    path = Path(config_path) if config_path else DEFAULT_CONFIG_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    return _substitute_env(config)
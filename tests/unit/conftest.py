@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+
+def _make_data(n_rows: int, n_features: int = 12, seed: int = 0):
+    """Features with NaNs, an integer-valued column and a column with many exact zeros"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    X[:, 3] = np.round(X[:, 3])
+    X[rng.random(n_rows) < 0.2, 5] = 0.0
+    signal = np.nan_to_num(X[:, 0]) + 0.5 * np.nan_to_num(X[:, 1]) + 0.3 * np.nan_to_num(X[:, 5])
+    y = (signal + 0.5 * rng.normal(size=n_rows) > 0).astype(int)
+    return X, y
+
+
+@pytest.fixture(scope='session')
+def make_data():
+    """Factory of binary classification data exercising missing-value handling"""
+    return _make_data
+
+
+@pytest.fixture
+def compile_model(tmp_path):
+    """Export a trained model into tmp_path and load it back as a CompiledModel"""
+    from src.scoring.compiled_model import CompiledModel, export_model
+
+    def compile_(model):
+        return CompiledModel.load(export_model(model, 'model', directory=tmp_path))
+    return compile_
+
+
+@pytest.fixture(scope='session')
+def hand_model():
+    """
+    Two-tree logistic model built node by node (no ML library needed)
+
+    Tree 0: x0 < 0.5, NaN goes left; leaves +1.0 / -1.0
+    Tree 1: x1 < -1.0, zero and NaN go right (LightGBM zero-as-missing); leaves +0.5 / -0.5
+    """
+    from src.scoring.compiled_model import CompiledModel, MISSING_NAN, MISSING_ZERO, _NodeTable
+
+    table = _NodeTable()
+    root = table.add_split(0, 0, 0.5, True, MISSING_NAN, cover=10.0)
+    table.link(root, table.add_leaf(0, 1.0, cover=6.0), table.add_leaf(0, -1.0, cover=4.0))
+    root = table.add_split(1, 1, -1.0, False, MISSING_ZERO, cover=10.0)
+    table.link(root, table.add_leaf(1, 0.5, cover=3.0), table.add_leaf(1, -0.5, cover=7.0))
+
+    meta = {
+        'format_version': 2, 'model_version': 'hand', 'library': 'test', 'n_trees': 2, 'max_depth': 1,
+        'input_dtype': 'float32', 'comparison': '<', 'base_margin': 0.25, 'link': 'logistic',
+    }
+    return CompiledModel(table.to_array(), meta)
@@ -0,0 +1,91 @@
+"""
+Counting-process intervals against a day-by-day expansion of the weekly facts
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_engineering.build_intervals import COVARIATES, build_intervals
+
+
+AS_OF = date(2026, 6, 1)
+FOLLOWUP_DAYS = 30
+
+
+@pytest.fixture(scope='module')
+def periods():
+    return pd.DataFrame([
+        # Renewed within the follow-up (event)
+        ('p1', 'u1', date(2026, 1, 7), date(2026, 3, 7), date(2026, 3, 20)),
+        # Renewed after the follow-up: censored at hp_end + 30 days
+        ('p2', 'u2', date(2026, 1, 1), date(2026, 2, 1), date(2026, 4, 1)),
+        # Still running on as_of: censored at as_of
+        ('p3', 'u1', date(2026, 4, 2), date(2026, 7, 2), None),
+        # Starts on as_of: no follow-up yet
+        ('p4', 'u3', AS_OF, date(2026, 7, 1), None),
+    ], columns=['hp_period_id', 'user_id', 'hp_start', 'hp_end_corrected', 'next_hp_purchase_dt'])
+
+
+@pytest.fixture(scope='module')
+def weekly():
+    rng = np.random.default_rng(0)
+    weeks = pd.date_range('2025-12-29', '2026-05-25', freq='7D')
+    rows = []
+    for user in ['u1', 'u2', 'u3']:
+        for week_start in weeks[rng.random(len(weeks)) < 0.6]:
+            # Few distinct values, so some consecutive weeks repeat and get merged
+            values = rng.integers(0, 2, len(COVARIATES))
+            rows.append({'user_id': user, 'week_start': week_start.date(), **dict(zip(COVARIATES, values))})
+    return pd.DataFrame(rows)
+
+
+def daily_covariates(period, weekly, duration):
+    """Covariates of each day [d, d + 1): the facts of the calendar week before the day's week"""
+    facts = weekly[weekly['user_id'] == period.user_id].set_index('week_start')
+    days = []
+    for d in range(duration):
+        day = period.hp_start + timedelta(days=d)
+        previous_week = day - timedelta(days=day.weekday() + 7)
+        if previous_week in facts.index:
+            days.append(facts.loc[previous_week, COVARIATES].tolist())
+        else:
+            days.append([0] * len(COVARIATES))
+    return np.array(days, dtype=np.int64).reshape(-1, len(COVARIATES))
+
+
+def test_intervals_match_daily_expansion(periods, weekly):
+    intervals = build_intervals(periods, weekly, FOLLOWUP_DAYS, AS_OF)
+
+    expected_stop = {'p1': 72, 'p2': 61, 'p3': 60}
+    expected_event = {'p1': True, 'p2': False, 'p3': False}
+    assert set(intervals['hp_period_id']) == set(expected_stop)
+
+    for period in periods.itertuples(index=False):
+        if period.hp_period_id not in expected_stop:
+            continue
+        rows = intervals[intervals['hp_period_id'] == period.hp_period_id]
+        duration = expected_stop[period.hp_period_id]
+
+        # Contiguous cover of (0, duration], event only on the last interval
+        assert rows['start_day'].iloc[0] == 0 and rows['stop_day'].iloc[-1] == duration
+        assert (rows['start_day'].to_numpy()[1:] == rows['stop_day'].to_numpy()[:-1]).all()
+        assert rows['event'].tolist() == [False] * (len(rows) - 1) + [expected_event[period.hp_period_id]]
+
+        # Expanding the intervals back to days gives the daily covariates
+        lengths = (rows['stop_day'] - rows['start_day']).to_numpy()
+        expanded = np.repeat(rows[COVARIATES].to_numpy(dtype=np.int64), lengths, axis=0)
+        np.testing.assert_array_equal(expanded, daily_covariates(period, weekly, duration))
+
+        # Run-length compression leaves no two neighbours with equal covariates
+        covariates = rows[COVARIATES].to_numpy()
+        assert (covariates[1:] != covariates[:-1]).any(axis=1).all()
+
+
+def test_compact_dtypes(periods, weekly):
+    intervals = build_intervals(periods, weekly, FOLLOWUP_DAYS, AS_OF)
+    assert intervals['start_day'].dtype == np.int16
+    assert intervals['event'].dtype == np.bool_
+    assert (intervals[COVARIATES].dtypes == np.int16).all()
@@ -0,0 +1,66 @@
+"""
+Multi-window renewal labels: renewal, closed windows and right-censoring
+"""
+
+from datetime import date
+
+import pandas as pd
+
+from src.data_engineering.build_labels import LABEL_COLUMNS, build_label_matrix
+
+
+AS_OF = date(2026, 6, 30)
+
+
+def periods():
+    return pd.DataFrame([
+        # Renewed 10 days after the end, long before as_of
+        ('p1', 'u1', date(2026, 3, 1), date(2026, 3, 11), 10),
+        # Renewed 45 days after the end
+        ('p2', 'u2', date(2026, 3, 1), date(2026, 4, 15), 45),
+        # Ended 20 days before as_of without a purchase yet
+        ('p3', 'u3', date(2026, 6, 10), None, None),
+        # Purchase after as_of is not known yet when labeling
+        ('p4', 'u4', date(2026, 6, 20), date(2026, 7, 5), 15),
+        # Long closed without a renewal
+        ('p5', 'u5', date(2026, 1, 1), None, None),
+        # No end date: skipped
+        ('p6', 'u6', None, None, None),
+    ], columns=['hp_period_id', 'user_id', 'hp_end_corrected', 'next_hp_purchase_dt', 'days_to_next_hp'])
+
+
+def label(labels, period, window):
+    row = labels[(labels['hp_period_id'] == period) & (labels['window_days'] == window)].iloc[0]
+    return None if pd.isna(row['renewed']) else bool(row['renewed']), bool(row['is_censored'])
+
+
+def test_labels_for_every_window():
+    labels = build_label_matrix(periods(), [30, 60], AS_OF)
+
+    assert list(labels.columns) == LABEL_COLUMNS
+    assert len(labels) == 5 * 2
+    assert 'p6' not in set(labels['hp_period_id'])
+
+    assert label(labels, 'p1', 30) == (True, False)
+    assert label(labels, 'p2', 30) == (False, False)
+    assert label(labels, 'p2', 60) == (True, False)
+    assert label(labels, 'p3', 30) == (None, True)
+    assert label(labels, 'p3', 60) == (None, True)
+    assert label(labels, 'p4', 30) == (None, True)
+    assert label(labels, 'p5', 60) == (False, False)
+
+
+def test_window_closes_the_day_after_window_end():
+    labels = build_label_matrix(periods(), [20], AS_OF)
+    # p3 ended exactly 20 days before as_of: its window ends on as_of and is still open
+    assert label(labels, 'p3', 20) == (None, True)
+    labels = build_label_matrix(periods(), [20], date(2026, 7, 1))
+    assert label(labels, 'p3', 20) == (False, False)
+
+
+def test_relabeling_later_sees_the_purchase():
+    labels = build_label_matrix(periods(), [30], date(2026, 7, 10))
+    assert label(labels, 'p4', 30) == (True, False)
+    row = labels[labels['hp_period_id'] == 'p4'].iloc[0]
+    assert row['window_end'] == date(2026, 7, 20)
+    assert row['label_as_of'] == date(2026, 7, 10)
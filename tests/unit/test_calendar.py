@@ -0,0 +1,98 @@
+"""
+Calendar lookup arrays against per-date loops over the calendar frame
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import calendar as calendar_module
+from src.features.calendar import CalendarLookup, get_calendar
+
+
+@pytest.fixture(scope='module')
+def calendar():
+    dates = pd.date_range('2026-01-01', '2026-03-31')
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        'dt': dates,
+        'dow': dates.dayofweek + 1,
+        'is_weekend': dates.dayofweek >= 5,
+        'is_holiday_kz': rng.random(len(dates)) < 0.1,
+        'is_school_break': rng.random(len(dates)) < 0.2,
+        'month': dates.month,
+        'season_label': np.where(dates.month < 3, 'winter', 'spring'),
+    })
+    return frame, CalendarLookup(frame)
+
+
+def test_count_between_matches_loop(calendar):
+    frame, lookup = calendar
+    starts = pd.to_datetime(['2025-12-20', '2026-01-10', '2026-02-01', '2026-03-20', '2026-02-10'])
+    ends = pd.to_datetime(['2026-01-05', '2026-01-10', '2026-02-28', '2026-04-15', '2026-02-01'])
+
+    expected = [
+        int(frame.loc[(frame['dt'] >= start) & (frame['dt'] <= end), 'is_holiday_kz'].sum())
+        for start, end in zip(starts, ends)
+    ]
+    assert lookup.count_between(starts, ends, 'is_holiday_kz').tolist() == expected
+
+
+def test_share_per_group_skips_dates_without_group(calendar):
+    frame, lookup = calendar
+    dates = frame['dt'].iloc[:10]
+    groups = ['a', 'b', None, 'a', 'b', np.nan, 'a', 'a', 'b', None]
+
+    share = lookup.share(dates, 'is_weekend', groups)
+
+    flags = frame['is_weekend'].iloc[:10].to_numpy()
+    expected = pd.Series(flags).groupby(pd.Series(groups)).mean()
+    assert share.index.tolist() == ['a', 'b']
+    np.testing.assert_allclose(share.to_numpy(), expected.loc[['a', 'b']].to_numpy())
+
+
+def test_get_calendar_reloads_after_max_age(calendar, monkeypatch):
+    frame, _ = calendar
+    loads = []
+
+    def from_db(connector):
+        loads.append(connector)
+        return CalendarLookup(frame.iloc[:len(loads) * 10])
+
+    clock = [1000.0]
+    monkeypatch.setattr(CalendarLookup, 'from_db', staticmethod(from_db))
+    monkeypatch.setattr(calendar_module.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(calendar_module, '_calendar_cache', {})
+    connector = SimpleNamespace(host='h', port=5432, database='d', schema='ris')
+
+    assert get_calendar(connector, max_age_seconds=60).n_days == 10
+    clock[0] += 60
+    assert get_calendar(connector, max_age_seconds=60).n_days == 10
+    # Another connector to the same database shares the entry
+    assert get_calendar(SimpleNamespace(**vars(connector)), max_age_seconds=60).n_days == 10
+    clock[0] += 1
+    assert get_calendar(connector, max_age_seconds=60).n_days == 20
+    assert len(loads) == 2
+
+
+def test_seasonality_internal_share_since_period_start(calendar):
+    from src.features.registry import registry
+
+    frame, lookup = calendar
+    keys = pd.DataFrame({'user_id': ['a', 'b', 'c'], 'as_of_date': pd.to_datetime(['2026-02-10'] * 3).date})
+    periods = pd.DataFrame({
+        'hp_start': pd.to_datetime(['2026-01-01', '2026-02-10', None]),
+        'as_of_ts': pd.to_datetime(['2026-02-10'] * 3),
+    })
+    sources = {'calendar': lookup, 'hp_period_as_of': periods}
+    run = SimpleNamespace(keys=keys, get=sources.__getitem__)
+
+    share = registry.specs['seasonality_internal'].compute(run)
+
+    for i, start in enumerate(periods['hp_start'][:2]):
+        window = frame[(frame['dt'] >= start) & (frame['dt'] <= '2026-02-10')]
+        expected = (window['is_holiday_kz'].sum() + window['is_school_break'].sum()) / len(window)
+        assert share.iloc[i] == pytest.approx(expected)
+    assert np.isnan(share.iloc[2])
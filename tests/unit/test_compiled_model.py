@@ -0,0 +1,93 @@
+"""
+Parity of compiled tree ensembles with the native predict_proba
+Each library is optional: its tests are skipped when it is not installed.
+"""
+
+import numpy as np
+import pytest
+
+from src.scoring.compiled_model import row_hashes
+
+
+@pytest.fixture(scope='module')
+def data(make_data):
+    X, y = make_data(4000)
+    X_test, _ = make_data(1500, seed=1)
+    return X, y, X_test
+
+
+def test_hand_built_model_follows_missing_value_rules(hand_model):
+    X = np.array([
+        [0.0, -2.0],        # left, left
+        [1.0, 3.0],         # right, right
+        [np.nan, -2.0],     # NaN takes tree 0 default (left)
+        [1.0, 0.0],         # zero takes tree 1 default (right)
+        [0.0, np.nan],      # NaN takes tree 1 default (right)
+    ])
+    margin = 0.25 + np.array([1.0 + 0.5, -1.0 - 0.5, 1.0 + 0.5, -1.0 - 0.5, 1.0 - 0.5])
+
+    np.testing.assert_allclose(hand_model.predict_margin(X), margin)
+    np.testing.assert_allclose(hand_model.predict(X), 1.0 / (1.0 + np.exp(-margin)))
+
+
+def test_fingerprints_depend_only_on_split_bins(hand_model):
+    X = np.array([
+        [0.1, -3.0],
+        [0.4, -2.0],        # same bins as row 0
+        [0.6, -2.0],        # crosses the tree 0 threshold
+        [0.1, 0.0],         # zero-as-missing bin on x1
+        [np.nan, -2.0],     # NaN bin on x0
+    ])
+    bins = hand_model.split_bins(X)
+    assert bins.tolist() == [[0, 0], [0, 0], [1, 0], [0, -2], [-1, 0]]
+
+    fingerprints = hand_model.fingerprints(X)
+    assert fingerprints[0] == fingerprints[1]
+    assert len(set(fingerprints.tolist())) == 4
+    np.testing.assert_array_equal(fingerprints, row_hashes(bins))
+
+
+def test_xgboost_matches_predict_proba(data, compile_model):
+    xgb = pytest.importorskip('xgboost')
+    X, y, X_test = data
+    model = xgb.XGBClassifier(n_estimators=80, max_depth=5, learning_rate=0.1).fit(X, y)
+
+    compiled = compile_model(model)
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict_proba(X_test)[:, 1], atol=1e-6)
+
+
+def test_xgboost_early_stopping_keeps_best_iteration(data, compile_model):
+    xgb = pytest.importorskip('xgboost')
+    X, y, X_test = data
+    model = xgb.XGBClassifier(
+        n_estimators=400, max_depth=6, learning_rate=0.3, early_stopping_rounds=5
+    ).fit(X[:3000], y[:3000], eval_set=[(X[3000:], y[3000:])], verbose=False)
+    assert model.best_iteration < model.get_booster().num_boosted_rounds() - 1
+
+    compiled = compile_model(model)
+    assert compiled.meta['n_trees'] == model.best_iteration + 1
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict_proba(X_test)[:, 1], atol=1e-6)
+
+
+@pytest.mark.parametrize('zero_as_missing', [False, True])
+def test_lightgbm_matches_predict_proba(data, compile_model, zero_as_missing):
+    lgb = pytest.importorskip('lightgbm')
+    X, y, X_test = data
+    model = lgb.LGBMClassifier(
+        n_estimators=60, num_leaves=31, zero_as_missing=zero_as_missing, verbose=-1
+    ).fit(X, y)
+
+    compiled = compile_model(model)
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict_proba(X_test)[:, 1], atol=1e-9)
+
+
+@pytest.mark.parametrize('nan_mode', ['Min', 'Max'])
+def test_catboost_matches_predict_proba(data, compile_model, nan_mode):
+    catboost = pytest.importorskip('catboost')
+    X, y, X_test = data
+    model = catboost.CatBoostClassifier(
+        iterations=60, depth=6, nan_mode=nan_mode, verbose=0, allow_writing_files=False
+    ).fit(X, y)
+
+    compiled = compile_model(model)
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict_proba(X_test)[:, 1], atol=1e-9)
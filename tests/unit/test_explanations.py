@@ -0,0 +1,91 @@
+"""
+Parity of TreeSHAP on compiled models with the native SHAP of each library
+Each library is optional: its tests are skipped when it is not installed.
+"""
+
+import numpy as np
+import pytest
+
+from src.scoring.compiled_model import CompiledModel
+from src.scoring.explanations import group_columns, tree_shap
+
+
+@pytest.fixture(scope='module')
+def data(make_data):
+    X, y = make_data(2000, n_features=8)
+    return X, y, X[:400]
+
+
+def assert_additive(compiled: CompiledModel, X: np.ndarray, contributions: np.ndarray, expected: float):
+    """Contributions and the expected margin add up to the model margin"""
+    np.testing.assert_allclose(contributions.sum(axis=1) + expected, compiled.predict_margin(X), atol=1e-8)
+
+
+def test_hand_built_model_contributions(hand_model):
+    X = np.array([[0.0, -2.0], [1.0, 3.0], [np.nan, 0.0]])
+    contributions, expected = tree_shap(hand_model, X)
+
+    # One split per tree: a feature's contribution is its leaf minus the tree's cover-weighted mean
+    mean_0, mean_1 = 0.6 * 1.0 + 0.4 * -1.0, 0.3 * 0.5 + 0.7 * -0.5
+    np.testing.assert_allclose(contributions, [
+        [1.0 - mean_0, 0.5 - mean_1],
+        [-1.0 - mean_0, -0.5 - mean_1],
+        [1.0 - mean_0, -0.5 - mean_1],
+    ])
+    assert expected == pytest.approx(0.25 + mean_0 + mean_1)
+    assert_additive(hand_model, X, contributions, expected)
+
+
+def test_xgboost_matches_pred_contribs(data, compile_model):
+    xgb = pytest.importorskip('xgboost')
+    X, y, X_test = data
+    model = xgb.XGBClassifier(n_estimators=40, max_depth=5, learning_rate=0.1).fit(X, y)
+    compiled = compile_model(model)
+
+    contributions, expected = tree_shap(compiled, X_test)
+    native = model.get_booster().predict(xgb.DMatrix(X_test, missing=np.nan), pred_contribs=True)
+
+    # XGBoost accumulates its contributions in float32
+    np.testing.assert_allclose(contributions, native[:, :-1], atol=1e-5)
+    assert expected == pytest.approx(native[0, -1], abs=1e-5)
+    assert_additive(compiled, X_test, contributions, expected)
+
+
+@pytest.mark.parametrize('zero_as_missing', [False, True])
+def test_lightgbm_matches_pred_contrib(data, compile_model, zero_as_missing):
+    lgb = pytest.importorskip('lightgbm')
+    X, y, X_test = data
+    model = lgb.LGBMClassifier(
+        n_estimators=30, num_leaves=15, zero_as_missing=zero_as_missing, verbose=-1
+    ).fit(X, y)
+    compiled = compile_model(model)
+
+    contributions, expected = tree_shap(compiled, X_test)
+    native = model.predict(X_test, pred_contrib=True)
+
+    np.testing.assert_allclose(contributions, native[:, :-1], atol=1e-9)
+    assert expected == pytest.approx(native[0, -1], abs=1e-9)
+    assert_additive(compiled, X_test, contributions, expected)
+
+
+def test_catboost_matches_shap_values(data, compile_model):
+    catboost = pytest.importorskip('catboost')
+    X, y, X_test = data
+    model = catboost.CatBoostClassifier(iterations=30, depth=4, verbose=0, allow_writing_files=False).fit(X, y)
+    compiled = compile_model(model)
+
+    contributions, expected = tree_shap(compiled, X_test)
+    native = model.get_feature_importance(catboost.Pool(X_test), type='ShapValues')
+
+    np.testing.assert_allclose(contributions, native[:, :-1], atol=1e-9)
+    assert expected == pytest.approx(native[0, -1], abs=1e-9)
+    assert_additive(compiled, X_test, contributions, expected)
+
+
+def test_group_columns_assigns_one_hot_columns_to_longest_feature():
+    names, index = group_columns(
+        ['age', 'club_a', 'club_zone_b', 'club_zone'],
+        ['age', 'club', 'club_zone']
+    )
+    assert names == ['age', 'club', 'club_zone']
+    assert index.tolist() == [0, 1, 2, 2]
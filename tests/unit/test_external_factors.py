@@ -0,0 +1,202 @@
+"""
+Rolling-window delta features and booking-hour shifts against per-key loops
+over the weekly facts
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.external_factors import (
+    DeltaFeatureEngine,
+    booking_pattern_shift,
+    hour_histograms,
+    jensen_shannon,
+    week_index,
+)
+
+
+METRICS = {'engagement': 'sessions_attended', 'missed': 'sessions_missed'}
+
+
+@pytest.fixture(scope='module')
+def weekly():
+    """Weekly facts of three users with gaps between fact weeks"""
+    rng = np.random.default_rng(0)
+    rows = []
+    for user, first, n_weeks in [('a', '2026-01-05', 30), ('b', '2026-03-02', 8), ('c', '2026-05-04', 3)]:
+        weeks = pd.date_range(first, periods=n_weeks, freq='7D')
+        kept = weeks[rng.random(n_weeks) < 0.7].union(weeks[:1])
+        for week_start in kept:
+            rows.append({
+                'user_id': user,
+                'week_start': week_start.date(),
+                'sessions_attended': int(rng.integers(0, 6)),
+                'sessions_missed': int(rng.integers(0, 3)),
+            })
+    return pd.DataFrame(rows)
+
+
+def naive_features(weekly, user, as_of_date, engine):
+    """Windows ending with the last week finished before as_of_date; missing weeks count as zeros"""
+    facts = weekly[weekly['user_id'] == user]
+    if facts.empty:
+        return None
+    fact_week = week_index(facts['week_start'])
+    first = fact_week.min()
+    last = week_index(pd.Series([as_of_date]))[0] - 1
+
+    def mean(lo, hi, column):
+        weeks = list(range(max(lo, first), hi + 1))
+        if not weeks:
+            return np.nan, 0
+        values = dict(zip(fact_week, facts[column]))
+        return np.mean([values.get(w, 0) for w in weeks]), len(weeks)
+
+    row = {'weeks_observed': max(last - first + 1, 0)}
+    longest = engine.recent_weeks[-1]
+    for prefix, column in engine.metrics.items():
+        baseline, count = mean(last - longest - engine.baseline_weeks + 1, last - longest, column)
+        if count < engine.min_baseline_weeks:
+            baseline = np.nan
+        for w in engine.recent_weeks:
+            row[f"{prefix}_recent_{w}w"] = mean(last - w + 1, last, column)[0]
+            row[f"{prefix}_delta_{w}w"] = row[f"{prefix}_recent_{w}w"] - baseline
+        row[f"{prefix}_baseline"] = baseline
+    return row
+
+
+def test_deltas_match_loop(weekly):
+    engine = DeltaFeatureEngine(METRICS, recent_weeks=(1, 4), baseline_weeks=8, min_baseline_weeks=3)
+    dates = pd.date_range('2025-12-31', '2026-09-01', freq='5D').date
+    keys = pd.DataFrame([(user, d) for user in ['a', 'b', 'c', 'unknown'] for d in dates],
+                        columns=['user_id', 'as_of_date'])
+
+    matrix = engine.compute(weekly, as_of=keys)
+    assert matrix.feature_names == engine.feature_names
+
+    for i, (user, as_of_date) in enumerate(keys.itertuples(index=False)):
+        expected = naive_features(weekly, user, as_of_date, engine)
+        if expected is None:
+            assert matrix.values[i, 0] == 0
+            assert np.isnan(matrix.values[i, 1:]).all()
+            continue
+        got = dict(zip(matrix.feature_names, matrix.values[i]))
+        for name in engine.feature_names:
+            np.testing.assert_allclose(got[name], expected[name], rtol=1e-6, err_msg=f"{user} {as_of_date} {name}")
+
+
+def test_default_keys_end_with_each_fact_week(weekly):
+    engine = DeltaFeatureEngine(METRICS, recent_weeks=(1,), baseline_weeks=4, min_baseline_weeks=1)
+    matrix = engine.compute(weekly)
+
+    # As of the Monday after a fact week, the 1-week window is that week
+    np.testing.assert_allclose(matrix.values[:, matrix.feature_names.index('engagement_recent_1w')],
+                               weekly['sessions_attended'].to_numpy())
+
+
+# ---------------------------------------------------------------------
+# Booking hour histograms
+# ---------------------------------------------------------------------
+
+def test_hour_histograms_parse_lists_and_literals():
+    full = list(range(24))
+    values = pd.Series([
+        full,
+        '{' + ','.join(str(2 * h) for h in range(24)) + '}',
+        None,
+        [1, 2, 3],              # incomplete list
+        '{1,2,3}',              # incomplete literal
+        '{}',
+        [],
+    ], index=[10, 11, 12, 13, 14, 15, 16])
+
+    hist = hour_histograms(values)
+
+    assert hist.shape == (7, 24)
+    np.testing.assert_array_equal(hist[0], full)
+    np.testing.assert_array_equal(hist[1], [2 * h for h in range(24)])
+    assert not hist[2:].any()
+
+
+def naive_js(p, q):
+    """Jensen-Shannon divergence (base 2) of two count vectors, NaN without mass"""
+    if sum(p) == 0 or sum(q) == 0:
+        return np.nan
+    p = [v / sum(p) for v in p]
+    q = [v / sum(q) for v in q]
+    m = [(a + b) / 2 for a, b in zip(p, q)]
+
+    def kl(a, b):
+        return sum(x * math.log2(x / y) for x, y in zip(a, b) if x > 0)
+    return 0.5 * kl(p, m) + 0.5 * kl(q, m)
+
+
+def test_jensen_shannon_matches_loop_and_is_bounded():
+    rng = np.random.default_rng(1)
+    p = rng.integers(0, 5, size=(200, 24)).astype(float)
+    q = rng.integers(0, 5, size=(200, 24)).astype(float)
+    # Disjoint supports (maximum divergence), identical rows and rows without mass
+    p[0], q[0] = np.eye(24)[3] * 4, np.eye(24)[20] * 2
+    q[1] = p[1] * 3
+    p[2] = 0
+    q[3] = 0
+    q[4] = np.nan
+
+    js = jensen_shannon(p, q)
+
+    assert np.isnan(js[[2, 3, 4]]).all()
+    assert js[0] == pytest.approx(1.0)
+    assert js[1] == pytest.approx(0.0, abs=1e-12)
+    finite = ~np.isnan(js)
+    assert ((js[finite] >= 0) & (js[finite] <= 1)).all()
+    for i in np.flatnonzero(finite):
+        assert js[i] == pytest.approx(naive_js(p[i].tolist(), q[i].tolist()), abs=1e-9)
+
+
+def test_booking_pattern_shift_matches_loop():
+    rng = np.random.default_rng(2)
+    weeks = pd.date_range('2026-01-05', periods=20, freq='7D')
+    rows = []
+    for user, shift in [('a', 0), ('b', 6)]:
+        for i, week_start in enumerate(weeks):
+            if rng.random() < 0.2:
+                continue
+            hours = np.zeros(24, dtype=int)
+            # User b moves from morning to evening bookings in the last weeks
+            peak = 8 + (shift if i >= 16 else 0)
+            hours[rng.integers(peak - 1, peak + 2, size=4)] += 1
+            rows.append({'user_id': user, 'week_start': week_start.date(), 'booking_hours': hours.tolist()})
+    weekly = pd.DataFrame(rows)
+    after_last = (weeks[-1] + pd.Timedelta(days=7)).date()
+    keys = pd.DataFrame({
+        'user_id': ['a', 'b', 'b', 'x'],
+        'as_of_date': [after_last, after_last, weeks[3].date(), after_last],
+    })
+
+    shift = booking_pattern_shift(weekly, keys, recent_weeks=4, baseline_weeks=8, min_baseline_weeks=4)
+
+    hist = {
+        (row.user_id, week): np.array(row.booking_hours)
+        for row, week in zip(weekly.itertuples(), week_index(weekly['week_start']))
+    }
+    for i, key in enumerate(keys.itertuples(index=False)):
+        facts = weekly[weekly['user_id'] == key.user_id]
+        if facts.empty:
+            assert np.isnan(shift.values[i, 0])
+            continue
+        first = week_index(facts['week_start']).min()
+        last = week_index(pd.Series([key.as_of_date]))[0] - 1
+
+        def total(lo, hi):
+            weeks_in = range(max(lo, first), hi + 1)
+            return sum((hist.get((key.user_id, w), np.zeros(24)) for w in weeks_in), np.zeros(24)), len(weeks_in)
+
+        recent, _ = total(last - 3, last)
+        baseline, n_baseline = total(last - 11, last - 4)
+        expected = naive_js(recent.tolist(), baseline.tolist()) if n_baseline >= 4 else np.nan
+        np.testing.assert_allclose(shift.values[i, 0], expected, atol=1e-6, err_msg=str(key))
+
+    assert shift.values[1, 0] > shift.values[0, 0]
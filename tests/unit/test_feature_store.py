@@ -0,0 +1,106 @@
+"""
+Point-in-time lookups of the feature store against hand-written version
+histories, with and without the compacted base partition
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.feature_store import FeatureStore
+
+
+# u1 changes every month, u2 only appears in February, u3 only in January
+VERSIONS = pd.DataFrame([
+    ('u1', '2026-01-05', 1.0, 10.0),
+    ('u3', '2026-01-20', 3.0, 30.0),
+    ('u1', '2026-02-10', 2.0, 20.0),
+    ('u2', '2026-02-15', 5.0, 50.0),
+    ('u1', '2026-03-01', 4.0, 40.0),
+], columns=['user_id', 'valid_from', 'a', 'b'])
+
+KEYS = pd.DataFrame([
+    ('u1', '2026-01-04'),  # before the first version
+    ('u1', '2026-01-05'),  # exactly at valid_from
+    ('u1', '2026-02-09'),
+    ('u1', '2026-02-10'),
+    ('u1', '2026-03-15'),
+    ('u2', '2026-01-31'),  # before u2 exists
+    ('u2', '2026-03-15'),  # only a February version
+    ('u3', '2026-03-15'),  # only a January version
+    ('u4', '2026-03-15'),  # never stored
+], columns=['user_id', 'as_of_date'])
+
+EXPECTED_A = [np.nan, 1.0, 1.0, 2.0, 4.0, np.nan, 5.0, 3.0, np.nan]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FeatureStore(tmp_path)
+    store.write('test', VERSIONS)
+    return store
+
+
+def test_as_of_takes_latest_version_on_or_before_date(store):
+    assert store.list_partitions('test') == ['2026-01', '2026-02', '2026-03']
+
+    matrix = store.as_of('test', KEYS)
+
+    assert matrix.feature_names == ['a', 'b']
+    np.testing.assert_array_equal(matrix.values[:, 0], EXPECTED_A)
+    np.testing.assert_array_equal(matrix.values[:, 1], np.array(EXPECTED_A) * 10)
+
+
+def test_write_replaces_same_user_and_valid_from(store):
+    store.write('test', pd.DataFrame({'user_id': ['u1'], 'valid_from': ['2026-02-10'], 'a': [7.0], 'b': [70.0]}))
+
+    matrix = store.as_of('test', KEYS.iloc[[3]], ['a'])
+
+    assert matrix.values[0, 0] == 7.0
+    stored = store._partition_frame(store._load_partition('test', '2026-02'))
+    assert len(stored) == 2
+
+
+def test_half_written_partitions_are_ignored(store, tmp_path):
+    (tmp_path / 'test' / '2026-04.npz.tmp').write_bytes(b'partial')
+
+    assert store.list_partitions('test') == ['2026-01', '2026-02', '2026-03']
+    np.testing.assert_array_equal(store.as_of('test', KEYS, ['a']).values[:, 0], EXPECTED_A)
+
+
+def test_compacted_base_answers_recent_keys(store):
+    assert store.compact('test') == '2026-02'
+    assert store.list_partitions('test') == ['2026-01', '2026-02', '2026-03']
+
+    # Keys dated after the base read it and March only
+    recent = KEYS[KEYS['as_of_date'] >= '2026-03-01']
+    misses = store.cache_misses
+    store._cache.clear()
+    matrix = store.as_of('test', recent, ['a'])
+    np.testing.assert_array_equal(matrix.values[:, 0], [4.0, 5.0, 3.0, np.nan])
+    assert sorted(partition for _, partition in store._cache) == ['2026-03', 'base']
+    assert store.cache_misses == misses + 2
+
+    # Older keys still get their exact versions from the monthly partitions
+    np.testing.assert_array_equal(store.as_of('test', KEYS, ['a']).values[:, 0], EXPECTED_A)
+
+
+def test_write_into_compacted_months_drops_base(store):
+    store.compact('test')
+    store.write('test', pd.DataFrame({'user_id': ['u2'], 'valid_from': ['2026-02-20'], 'a': [6.0], 'b': [60.0]}))
+
+    assert store.base_through('test') is None
+    matrix = store.as_of('test', KEYS[KEYS['user_id'] == 'u2'], ['a'])
+    np.testing.assert_array_equal(matrix.values[:, 0], [np.nan, 6.0])
+
+
+def test_lookup_wider_than_cache_keeps_its_partitions(tmp_path):
+    store = FeatureStore(tmp_path, cache_size=2)
+    store.write('test', VERSIONS)
+
+    store.as_of('test', KEYS)
+    misses = store.cache_misses
+    np.testing.assert_array_equal(store.as_of('test', KEYS, ['a']).values[:, 0], EXPECTED_A)
+
+    assert store.cache_size == 3
+    assert store.cache_misses == misses
@@ -0,0 +1,75 @@
+"""
+Point-in-time freezes against a day-by-day count of the raw intervals
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.features.freezes import freezes_as_of
+
+
+FREEZES = pd.DataFrame([
+    # Overlapping and duplicated freezes of one period
+    ('u1', 'p1', date(2026, 2, 1), date(2026, 2, 10)),
+    ('u1', 'p1', date(2026, 2, 5), date(2026, 2, 14)),
+    ('u1', 'p1', date(2026, 2, 5), date(2026, 2, 14)),
+    ('u1', 'p1', date(2026, 3, 1), date(2026, 3, 1)),
+    # Next period of the same user
+    ('u1', 'p2', date(2026, 8, 1), date(2026, 8, 20)),
+    ('u2', 'p3', date(2026, 1, 10), date(2026, 1, 31)),
+], columns=['user_id', 'hp_period_id', 'freezing_start', 'freezing_end'])
+
+HP_END = {'p1': date(2026, 6, 30), 'p2': date(2026, 12, 31), 'p3': date(2026, 3, 31)}
+
+
+def naive(user_id, hp_period_id, as_of):
+    """Frozen days of the period and the user's freezes started before as_of"""
+    freezes = FREEZES.drop_duplicates()
+    days = set()
+    for row in freezes[freezes['hp_period_id'] == hp_period_id].itertuples():
+        day = row.freezing_start
+        while day <= row.freezing_end and day < as_of:
+            days.add(day)
+            day += timedelta(days=1)
+    attempts = int(((freezes['user_id'] == user_id) & (freezes['freezing_start'] < as_of)).sum())
+    return len(days), attempts, HP_END[hp_period_id] + timedelta(days=len(days))
+
+
+def test_freezes_match_daily_count():
+    rows = [
+        (user, period, date(2026, 1, 1) + timedelta(days=d))
+        for user, period in [('u1', 'p1'), ('u1', 'p2'), ('u2', 'p3')]
+        for d in range(0, 260, 3)
+    ]
+    periods = pd.DataFrame(rows, columns=['user_id', 'hp_period_id', 'as_of'])
+    periods['as_of_ts'] = pd.to_datetime(periods['as_of'])
+    periods['hp_end'] = periods['hp_period_id'].map(HP_END)
+
+    result = freezes_as_of(periods, FREEZES)
+    for i, (user, period, as_of) in enumerate(rows):
+        days, attempts, hp_end = naive(user, period, as_of)
+        assert result['freeze_days_used'].iloc[i] == days, (period, as_of)
+        assert result['freeze_attempt_number'].iloc[i] == attempts, (period, as_of)
+        assert result['hp_end_corrected'].iloc[i] == pd.Timestamp(hp_end), (period, as_of)
+
+    # After the last freeze: the final values of core_hp_period
+    final = result[(periods['hp_period_id'] == 'p1') & (periods['as_of'] > date(2026, 3, 1))]
+    assert (final['freeze_days_used'] == 15).all()
+
+
+def test_keys_without_period_or_freezes():
+    periods = pd.DataFrame({
+        'user_id': ['u1', 'u3'],
+        'hp_period_id': [np.nan, 'p9'],
+        'hp_end': [pd.NaT, pd.Timestamp('2026-05-01')],
+        'as_of_ts': pd.to_datetime(['2026-03-01', '2026-03-01']),
+    })
+    result = freezes_as_of(periods, FREEZES)
+    assert result.iloc[0].isna().all()
+    assert result['freeze_days_used'].iloc[1] == 0 and result['freeze_attempt_number'].iloc[1] == 0
+    assert result['hp_end_corrected'].iloc[1] == pd.Timestamp('2026-05-01')
+
+    empty = freezes_as_of(periods, FREEZES.iloc[:0])
+    assert empty['freeze_days_used'].iloc[1] == 0
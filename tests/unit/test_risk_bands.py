@@ -0,0 +1,75 @@
+"""
+Risk band and intervention lookup: validation, edges and missing probabilities
+"""
+
+import numpy as np
+import pytest
+
+from src.scoring.risk_bands import RiskBands
+
+
+BANDS = {
+    'very_high': [0.0, 0.3],
+    'high': [0.3, 0.5],
+    'medium': [0.5, 0.7],
+    'low': [0.7, 0.85],
+    'very_low': [0.85, 1.0],
+}
+THRESHOLDS = {'critical': 0.3, 'warning': 0.5, 'watch': 0.7}
+
+
+@pytest.fixture(scope='module')
+def risk_bands():
+    return RiskBands(BANDS, THRESHOLDS)
+
+
+@pytest.mark.parametrize('bands, message', [
+    ({'a': [0.0, 0.6], 'b': [0.5, 1.0]}, 'overlap'),
+    ({'a': [0.0, 0.4], 'b': [0.5, 1.0]}, 'Gap'),
+    ({'a': [0.1, 0.5], 'b': [0.5, 1.0]}, 'cover'),
+    ({'a': [0.0, 0.5], 'b': [0.5, 0.9]}, 'cover'),
+    ({'a': [0.0, 0.5], 'b': [0.5, 0.5], 'c': [0.5, 1.0]}, 'empty'),
+    ({}, 'No risk bands'),
+])
+def test_invalid_bands_are_rejected(bands, message):
+    with pytest.raises(ValueError, match=message):
+        RiskBands(bands, THRESHOLDS)
+
+
+@pytest.mark.parametrize('thresholds', [
+    {'critical': 0.3, 'warning': 0.3},
+    {'critical': 0.0},
+    {'critical': 1.2},
+])
+def test_invalid_thresholds_are_rejected(thresholds):
+    with pytest.raises(ValueError, match='Intervention thresholds'):
+        RiskBands(BANDS, thresholds)
+
+
+def test_band_edges(risk_bands):
+    p = np.array([0.0, 0.2999, 0.3, 0.5, 0.85, 0.99, 1.0, np.nan, -0.1, 1.1])
+    assert risk_bands.bands(p).tolist()[:7] == [
+        'very_high', 'very_high', 'high', 'medium', 'very_low', 'very_low', 'very_low'
+    ]
+    assert risk_bands.band_codes(p)[7:].tolist() == [-1, -1, -1]
+
+
+def test_bands_match_loop_over_config(risk_bands):
+    p = np.random.default_rng(0).random(1000)
+    expected = [
+        next(name for name, (lo, hi) in BANDS.items() if lo <= value < hi or (hi == 1.0 and value == 1.0))
+        for value in p
+    ]
+    assert risk_bands.bands(p).tolist() == expected
+
+
+def test_intervention_thresholds(risk_bands):
+    p = np.array([0.1, 0.3, 0.49, 0.5, 0.69, 0.7, 0.95, np.nan])
+    interventions = risk_bands.assign(p)['intervention']
+    assert interventions.tolist()[:5] == ['critical', 'warning', 'warning', 'watch', 'watch']
+    assert interventions.isna().tolist()[5:] == [True, True, True]
+
+
+def test_scalar_probability(risk_bands):
+    assert risk_bands.band_codes(0.4).tolist() == [1]
+    assert risk_bands.intervention_codes(0.4).tolist() == [1]
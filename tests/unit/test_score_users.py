@@ -0,0 +1,131 @@
+"""
+Reuse of stored feature vectors and carry-forward of unchanged scores in
+incremental scoring
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.freezes import freezes_as_of
+from src.features.registry import registry
+from src.scoring.explanations import group_columns
+from src.scoring.risk_bands import RiskBands
+from src.scoring.score_users import BatchScorer, FeatureVectors
+
+
+FEATURES = ['engagement_delta', 'freeze_days_used', 'freeze_attempt_number']
+
+# u1 is frozen from Tuesday on; u2 has a freeze scheduled for Thursday
+FREEZES = pd.DataFrame([
+    ('u1', 'p1', date(2026, 3, 3), date(2026, 3, 20)),
+    ('u2', 'p2', date(2026, 3, 5), date(2026, 3, 12)),
+], columns=['user_id', 'hp_period_id', 'freezing_start', 'freezing_end'])
+
+USERS = pd.DataFrame({'user_id': ['u1', 'u2'], 'hp_period_id': ['p1', 'p2']})
+
+
+class StubScorer(BatchScorer):
+    """BatchScorer computing freezes from FREEZES, with marts rows never reloaded"""
+
+    def __init__(self):
+        self.columns = FEATURES
+        self.features = FEATURES
+        self.daily_features = [name for name in self.features if registry.is_daily(name)]
+        groups, group_index = group_columns(self.columns, self.features)
+        self.daily_columns = np.flatnonzero(
+            np.isin(np.array(groups, dtype=object)[group_index], self.daily_features)
+        )
+        self.computed = []
+
+    def feature_matrix(self, users, score_date, features=None):
+        features = features or self.features
+        self.computed.append(list(features))
+        periods = users.assign(as_of_ts=pd.Timestamp(score_date), hp_end=pd.Timestamp('2026-06-30'))
+        frame = freezes_as_of(periods.reset_index(drop=True), FREEZES)
+        # Non-daily features differ per day, so a reused value is visible
+        frame['engagement_delta'] = score_date.day
+        return frame.reindex(columns=self.columns).to_numpy(dtype=np.float32)
+
+    def changed_users(self, user_ids, since):
+        return np.zeros(len(user_ids), dtype=bool)
+
+
+def test_freeze_features_are_daily():
+    assert registry.is_daily('freeze_days_used')
+    assert registry.is_daily('freeze_attempt_number')
+
+
+def test_reused_vectors_follow_running_and_starting_freezes(tmp_path):
+    scorer = StubScorer()
+    monday, friday = date(2026, 3, 2), date(2026, 3, 6)
+
+    X_monday, _ = scorer.chunk_features(USERS, monday)
+    vectors = FeatureVectors(tmp_path / 'model.npz', len(FEATURES))
+    vectors.save(
+        [USERS['user_id'].to_numpy()], [USERS['hp_period_id'].to_numpy()],
+        [np.full(len(USERS), np.datetime64(monday, 'D'))], [X_monday]
+    )
+    vectors = FeatureVectors(tmp_path / 'model.npz', len(FEATURES))
+
+    X, computed_on = scorer.chunk_features(USERS, friday, vectors)
+    fresh, _ = scorer.chunk_features(USERS, friday)
+
+    # Both vectors are reused from Monday, with only the daily features recomputed
+    assert (computed_on == np.datetime64(monday, 'D')).all()
+    assert scorer.computed[1] == scorer.daily_features
+    assert (X[:, 0] == monday.day).all()
+    # Freeze features match a full computation on Friday
+    np.testing.assert_array_equal(X[:, 1:], fresh[:, 1:])
+    np.testing.assert_array_equal(X[:, 1], [3, 1])
+    np.testing.assert_array_equal(X[:, 2], [1, 1])
+
+
+BANDS = RiskBands(
+    {'very_high': [0.0, 0.3], 'high': [0.3, 0.5], 'medium': [0.5, 0.7], 'low': [0.7, 0.85], 'very_low': [0.85, 1.0]},
+    {'critical': 0.3, 'warning': 0.5, 'watch': 0.7}
+)
+
+
+def test_score_chunk_carries_forward_unchanged_users(hand_model):
+    scorer = BatchScorer.__new__(BatchScorer)
+    scorer.model = hand_model
+    scorer.window_days = 60
+    scorer.risk_bands = BANDS
+
+    score_date = date(2026, 3, 6)
+    users = pd.DataFrame({
+        'user_id': ['same', 'features', 'model', 'period', 'new'],
+        'hp_period_id': ['p1', 'p2', 'p3', 'p4-next', 'p5'],
+        'hp_end_corrected': [date(2026, 4, 30)] * 5,
+    })
+    X = np.array([[0.0, -2.0], [1.0, 3.0], [0.0, 0.0], [1.0, -2.0], [0.0, 1.0]], dtype=np.float32)
+    fingerprints = hand_model.fingerprints(X)
+
+    # Probabilities the model cannot produce, so carried values are recognizable
+    previous = pd.DataFrame({
+        'user_id': ['same', 'features', 'model', 'period'],
+        'hp_period_id': ['p1', 'p2', 'p3', 'p4'],
+        'model_version': ['hand', 'hand', 'older', 'hand'],
+        'feature_fingerprint': [fingerprints[0], ~fingerprints[1], fingerprints[2], fingerprints[3]],
+        'renewal_probability': [0.123, 0.123, 0.123, 0.123],
+        'scored_date': [date(2026, 3, 1)] * 4,
+    }).set_index('user_id')
+
+    scores = scorer.score_chunk(users, score_date, previous, X).set_index('user_id')
+
+    assert scores.loc['same', 'renewal_probability'] == pytest.approx(0.123)
+    assert scores.loc['same', 'scored_date'] == date(2026, 3, 1)
+    predicted = hand_model.predict(X)
+    for i, user in enumerate(['features', 'model', 'period', 'new'], start=1):
+        assert scores.loc[user, 'renewal_probability'] == pytest.approx(predicted[i], abs=1e-6)
+        assert scores.loc[user, 'scored_date'] == score_date
+
+    # Bands, interventions and days_to_hp_end are recomputed for carried rows too
+    assert scores.loc['same', 'risk_band'] == 'very_high'
+    assert scores.loc['same', 'intervention'] == 'critical'
+    assert (scores['days_to_hp_end'] == 55).all()
+    assert (scores['score_date'] == score_date).all()
+    np.testing.assert_array_equal(scores['feature_fingerprint'].to_numpy(), fingerprints)
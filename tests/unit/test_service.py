@@ -0,0 +1,271 @@
+"""
+Online scoring service: feature cache, warming from stored vectors,
+micro-batching and the API over a stub feature source
+"""
+
+import asyncio
+import json
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('fastapi')
+
+from src.scoring import service as service_module
+from src.scoring.score_users import FeatureVectors
+from src.scoring.service import (
+    FeatureCache,
+    MicroBatcher,
+    RegistryFeatureSource,
+    ScoringService,
+    StubFeatureSource,
+    create_app,
+)
+
+
+CONFIG = {
+    'scoring': {
+        'risk_bands': {
+            'very_high': [0.0, 0.3], 'high': [0.3, 0.5], 'medium': [0.5, 0.7],
+            'low': [0.7, 0.85], 'very_low': [0.85, 1.0],
+        },
+        'intervention_thresholds': {'critical': 0.3, 'warning': 0.5, 'watch': 0.7},
+        'service': {'cache_size': 100, 'max_request_users': 5},
+    },
+}
+
+
+# ---------------------------------------------------------------------
+# Feature cache
+# ---------------------------------------------------------------------
+
+def test_cache_entries_expire_after_ttl():
+    cache = FeatureCache(max_size=10, ttl_seconds=0.05)
+    cache.put_many(['a', 'b'], np.eye(2))
+
+    found, missing = cache.get_many(['a', 'b', 'c'])
+    assert sorted(found) == ['a', 'b'] and missing == ['c']
+    np.testing.assert_array_equal(found['b'], [0.0, 1.0])
+
+    time.sleep(0.06)
+    found, missing = cache.get_many(['a', 'b'])
+    assert found == {} and missing == ['a', 'b']
+    assert len(cache) == 0
+
+
+def test_cache_lifetimes_are_jittered_within_ttl():
+    cache = FeatureCache(max_size=1000, ttl_seconds=100, ttl_jitter=0.2)
+    before = time.monotonic()
+    cache.put_many([str(i) for i in range(500)], np.zeros((500, 2)))
+
+    lifetimes = np.array([expires for expires, _, _ in cache._entries.values()]) - before
+    assert lifetimes.min() >= 80 - 1e-6
+    assert lifetimes.max() <= 100 + 1.0
+    assert lifetimes.max() - lifetimes.min() > 10
+
+
+def test_cache_entries_are_misses_on_another_date():
+    cache = FeatureCache(max_size=10, ttl_seconds=3600, negative_ttl_seconds=3600)
+    monday, tuesday = date(2026, 3, 2), date(2026, 3, 3)
+    cache.put_many(['a'], np.eye(1), monday)
+    cache.put_unknown(['ghost'], monday)
+
+    assert cache.get_many(['a', 'ghost'], monday)[1] == []
+    # Daily features of Monday's vectors are stale on Tuesday
+    found, missing = cache.get_many(['a', 'ghost'], tuesday)
+    assert found == {} and missing == ['a', 'ghost']
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = FeatureCache(max_size=2, ttl_seconds=60)
+    cache.put_many(['a', 'b'], np.eye(2))
+    cache.get_many(['a'])
+    cache.put_many(['c'], np.ones((1, 2)))
+
+    found, missing = cache.get_many(['a', 'b', 'c'])
+    assert sorted(found) == ['a', 'c'] and missing == ['b']
+
+
+def test_cache_remembers_unknown_users_for_negative_ttl():
+    cache = FeatureCache(max_size=10, ttl_seconds=60, negative_ttl_seconds=0.05)
+    cache.put_unknown(['ghost'])
+
+    found, missing = cache.get_many(['ghost'])
+    assert found == {'ghost': None} and missing == []
+
+    time.sleep(0.06)
+    assert cache.get_many(['ghost'])[1] == ['ghost']
+
+
+def test_cache_without_negative_ttl_keeps_no_unknown_users():
+    cache = FeatureCache(max_size=10, ttl_seconds=60)
+    cache.put_unknown(['ghost'])
+    assert len(cache) == 0
+
+
+# ---------------------------------------------------------------------
+# Feature sources
+# ---------------------------------------------------------------------
+
+class CountingSource(RegistryFeatureSource):
+    """Registry source whose computed features are constants, recording every computation"""
+
+    def __init__(self, vectors_path):
+        super().__init__(None, ['engagement_delta', 'days_to_hp_end'], config={}, vectors_path=vectors_path)
+        self.computed = []
+
+    def _matrix(self, user_ids, as_of, features, columns):
+        self.computed.append((list(user_ids), list(features)))
+        values = {'engagement_delta': 1.0, 'days_to_hp_end': float(as_of.day)}
+        row = [values[col] if col in features else np.nan for col in columns]
+        return np.tile(np.array(row, dtype=np.float32), (len(user_ids), 1))
+
+
+def test_snapshot_reuses_stored_vectors_and_recomputes_daily_features(tmp_path, monkeypatch):
+    columns = ['engagement_delta', 'days_to_hp_end']
+    monday, friday = date(2026, 3, 2), date(2026, 3, 6)
+    users = pd.DataFrame({
+        'user_id': ['stored', 'old_period', 'last_week', 'new'],
+        'hp_period_id': ['p1', 'p2-next', 'p3', 'p4'],
+    })
+    monkeypatch.setattr(service_module, 'iter_active_users', lambda *args: iter([users]))
+
+    vectors = FeatureVectors(tmp_path / 'hand.npz', len(columns))
+    vectors.save(
+        [np.array(['stored', 'old_period', 'last_week'])], [np.array(['p1', 'p2', 'p3'])],
+        [np.array([monday, monday, date(2026, 2, 27)], dtype='datetime64[D]')],
+        [np.full((3, 2), 9.0, dtype=np.float32)]
+    )
+    source = CountingSource(tmp_path / 'hand.npz')
+
+    (user_ids, X), = source.snapshot(friday, columns)
+
+    assert user_ids == ['stored', 'old_period', 'last_week', 'new']
+    # Only the vector of the current period and fact week is reused, with days_to_hp_end of Friday
+    np.testing.assert_array_equal(X, [[9.0, 6.0], [1.0, 6.0], [1.0, 6.0], [1.0, 6.0]])
+    assert source.computed == [
+        (['old_period', 'last_week', 'new'], columns),
+        (['stored'], ['days_to_hp_end']),
+    ]
+
+
+def test_snapshot_without_stored_vectors_computes_everything(tmp_path, monkeypatch):
+    users = pd.DataFrame({'user_id': ['a', 'b'], 'hp_period_id': ['p1', 'p2']})
+    monkeypatch.setattr(service_module, 'iter_active_users', lambda *args: iter([users]))
+    source = CountingSource(tmp_path / 'missing.npz')
+
+    (user_ids, X), = source.snapshot(date(2026, 3, 6), ['engagement_delta', 'days_to_hp_end'])
+
+    np.testing.assert_array_equal(X, [[1.0, 6.0], [1.0, 6.0]])
+    assert source.computed == [(['a', 'b'], ['engagement_delta', 'days_to_hp_end'])]
+
+
+# ---------------------------------------------------------------------
+# Micro-batching
+# ---------------------------------------------------------------------
+
+def test_batcher_coalesces_concurrent_requests():
+    batches = []
+
+    async def handler(user_ids):
+        batches.append(list(user_ids))
+        return pd.DataFrame({'renewal_probability': [float(u) for u in user_ids]}, index=user_ids)
+
+    async def main():
+        batcher = MicroBatcher(handler, max_batch_size=100, max_wait_ms=50)
+        await batcher.start()
+        try:
+            return await asyncio.gather(*[batcher.submit(ids) for ids in (['1', '2'], ['2', '3'], ['4'])])
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(main())
+    assert batches == [['1', '2', '3', '4']]
+    assert [r['renewal_probability'].tolist() for r in results] == [[1.0, 2.0], [2.0, 3.0], [4.0]]
+
+
+def test_batcher_fans_errors_out_to_every_request():
+    async def handler(user_ids):
+        raise RuntimeError('source down')
+
+    async def main():
+        batcher = MicroBatcher(handler, max_batch_size=100, max_wait_ms=20)
+        await batcher.start()
+        try:
+            return await asyncio.gather(batcher.submit(['1']), batcher.submit(['2']), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) and str(r) == 'source down' for r in results)
+
+
+# ---------------------------------------------------------------------
+# API
+# ---------------------------------------------------------------------
+
+@pytest.fixture
+def model_path(hand_model, tmp_path):
+    """The hand-built model saved as a compiled model with two feature columns"""
+    path = tmp_path / 'hand.npy'
+    np.save(path, hand_model.nodes)
+    with open(tmp_path / 'hand.json', 'w', encoding='utf-8') as f:
+        json.dump({**hand_model.meta, 'feature_names': ['x0', 'x1'], 'window_days': 60}, f)
+    return path
+
+
+@pytest.fixture
+def features():
+    return pd.DataFrame({'user_id': ['1', '2', '3'], 'x0': [0.0, 1.0, np.nan], 'x1': [-2.0, 3.0, 0.0]})
+
+
+@pytest.fixture
+def client(model_path, features):
+    testclient = pytest.importorskip('fastapi.testclient')
+    service = ScoringService(StubFeatureSource(features), model_path=model_path, config=CONFIG)
+    with testclient.TestClient(create_app(service)) as client:
+        yield client, service
+
+
+def test_scores_match_model_in_request_order(client, hand_model, features):
+    client, _ = client
+    response = client.post('/scores', json={'user_ids': ['3', 'nope', '1']})
+    assert response.status_code == 200
+
+    body = response.json()
+    assert body['model_version'] == 'hand' and body['window_days'] == 60
+    assert [s['user_id'] for s in body['scores']] == ['3', 'nope', '1']
+    assert body['scores'][1]['renewal_probability'] is None
+
+    expected = hand_model.predict(features.set_index('user_id').loc[['3', '1']].to_numpy())
+    got = [body['scores'][0]['renewal_probability'], body['scores'][2]['renewal_probability']]
+    np.testing.assert_allclose(got, expected, atol=1e-6)
+
+
+def test_single_user_and_unknown_user(client):
+    client, service = client
+    assert client.get('/scores/2').json()['risk_band'] is not None
+    assert client.get('/scores/nope').status_code == 404
+    # Answered from the negative cache the second time
+    assert client.get('/scores/nope').status_code == 404
+    assert service.cache.get_many(['nope'])[0] == {'nope': None}
+
+
+def test_request_limits(client):
+    client, _ = client
+    assert client.post('/scores', json={'user_ids': []}).status_code == 422
+    assert client.post('/scores', json={'user_ids': [str(i) for i in range(6)]}).status_code == 413
+
+
+def test_startup_warms_cache_and_metrics_report_hits(client):
+    client, _ = client
+    client.post('/scores', json={'user_ids': ['1', '2']})
+
+    metrics = client.get('/metrics').json()
+    assert metrics['feature_cache']['size'] == 3
+    assert metrics['feature_cache']['hits'] >= 2
+    assert metrics['request_latency_ms']['count'] == 1
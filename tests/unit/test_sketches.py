@@ -0,0 +1,67 @@
+"""
+HyperLogLog sketches: error bounds, mergeability and windows against exact counts
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.features.sketches import (
+    DEFAULT_PRECISION, build_registers, estimate, exact_window_distinct, from_bytea, to_bytea, window_distinct
+)
+
+
+def test_estimate_within_error_bounds():
+    # 1.04 / sqrt(256) = 6.5% standard error; 4 sigma per estimate
+    cardinalities = [1, 5, 20, 100, 1000, 10000, 50000]
+    codes = np.repeat(np.arange(len(cardinalities)), cardinalities)
+    values = np.concatenate([np.arange(n) + 10 ** 6 * i for i, n in enumerate(cardinalities)])
+
+    estimates = estimate(build_registers(codes, len(cardinalities), values))
+    relative_error = np.abs(estimates - cardinalities) / np.array(cardinalities)
+    assert (relative_error < 4 * 1.04 / np.sqrt(1 << DEFAULT_PRECISION)).all()
+    # Small counts are linear counting: nearly exact
+    np.testing.assert_allclose(estimates[:3], cardinalities[:3], rtol=0.05)
+
+
+def test_duplicates_and_missing_values_are_ignored():
+    registers = build_registers(np.zeros(7, dtype=int), 1, ['a', 'b', 'a', None, np.nan, 'b', 'c'])
+    assert round(float(estimate(registers)[0])) == 3
+    assert estimate(build_registers(np.array([-1]), 1, ['a']))[0] == 0.0
+
+
+def test_merged_sketch_equals_sketch_of_union():
+    rng = np.random.default_rng(0)
+    first, second = rng.integers(0, 3000, 2000), rng.integers(2000, 5000, 2000)
+    merged = np.maximum(build_registers(np.zeros(2000, int), 1, first),
+                        build_registers(np.zeros(2000, int), 1, second))
+    union = build_registers(np.zeros(4000, int), 1, np.concatenate([first, second]))
+    np.testing.assert_array_equal(merged, union)
+
+
+def test_bytea_round_trip():
+    registers = build_registers(np.array([0, 0, 1]), 3, ['a', 'b', 'c'])
+    np.testing.assert_array_equal(from_bytea(to_bytea(registers)), registers)
+    np.testing.assert_array_equal(from_bytea([None]), np.zeros((1, 1 << DEFAULT_PRECISION), dtype=np.uint8))
+
+
+def test_window_distinct_matches_exact_counts():
+    rng = np.random.default_rng(1)
+    sessions = pd.DataFrame({
+        'user_id': rng.choice(['a', 'b'], 600),
+        'week_start': pd.Timestamp('2026-01-05') + pd.to_timedelta(7 * rng.integers(0, 10, 600), unit='D'),
+        'trainer_id': rng.integers(0, 40, 600),
+    })
+    user_weeks = sessions.groupby(['user_id', 'week_start'])
+    week_codes = user_weeks.ngroup().to_numpy()
+    weekly = user_weeks.size().reset_index()[['user_id', 'week_start']]
+    weekly['trainers_hll'] = to_bytea(build_registers(week_codes, len(weekly), sessions['trainer_id']))
+
+    keys = pd.DataFrame({
+        'user_id': ['a', 'a', 'b', 'b', 'c'],
+        'as_of_date': pd.to_datetime(['2026-02-04', '2026-03-16', '2026-01-05', '2026-02-11', '2026-02-11']),
+    })
+    estimates = window_distinct(weekly, 'trainers_hll', keys, weeks=4)
+    exact = exact_window_distinct(sessions, 'trainer_id', keys, weeks=4)
+
+    assert exact[2] == 0 and exact[4] == 0
+    np.testing.assert_allclose(estimates, exact, rtol=0.1, atol=0.5)